@@ -5,11 +5,64 @@ Implements the "from scratch" tool calling system using Llama 3.1 8B
 
 import json
 import os
-import requests
-from typing import Dict, List, Any, Optional
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
 from .tool_definitions import tools
-from . import tool_functions
+from .llm_batcher import get_batcher
+from .rendering import response_renderer
+from .llm_resilience import CircuitBreaker, call_with_deadline, hedged_call, retry_with_backoff
+from .booking_context import BOOKING_SLOTS, BookingState
+from .idempotency import IDEMPOTENT_TOOLS, IdempotencyInProgress, derive_key, idempotency_store, still_confirmed
+from .speculation import Speculation, SpeculativeExecutor
+from .structured_output import ToolCallParser
+from .tool_registry import ToolValidationError, tool_registry
+
+# LLM call budget: overall deadline per turn, per-attempt timeout and retries
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Start the base model in parallel if the fine-tuned endpoint is slower than this (unset = no hedging)
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS")) if os.getenv("LLM_HEDGE_AFTER_SECONDS") else None
+
+# Local OpenAI-compatible server; when set it is used instead of Vertex AI
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "llama-3.1-8b-instruct")
+
+# Constrain local decoding to the tool-call JSON schema. The request field carrying
+# the schema differs per server: "guided_json" (vLLM) or "json_schema" (llama.cpp)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "false").lower() == "true"
+LOCAL_LLM_GRAMMAR_FIELD = os.getenv("LOCAL_LLM_GRAMMAR_FIELD", "guided_json")
+
+# Micro-batching: concurrent turns share one multi-instance predict call
+LLM_BATCHING = os.getenv("LLM_BATCHING", "false").lower() == "true"
+LLM_BATCH_OPTIONS = {
+    "max_batch_size": int(os.getenv("LLM_BATCH_MAX_SIZE", "16")),
+    "max_wait_ms": float(os.getenv("LLM_BATCH_WAIT_MS", "10")),
+    "max_in_flight": int(os.getenv("LLM_BATCH_MAX_IN_FLIGHT", "4")),
+}
+
+# Request formats accepted by different serving containers, tried in order until one works
+INSTANCE_KEY_CANDIDATES = ["prompt", "input_text"]
+BASE_MODEL_CANDIDATES = ["gemini-1.5-flash", "gemini-1.5-pro", "gemini-1.0-pro"]
+
+# Clients, credentials and the working instance key are shared by all agent instances
+_llm_clients: Dict[str, Any] = {}
+_llm_clients_lock = threading.RLock()
+
+# Parses and repairs tool calls in model output; its schema drives guided decoding
+tool_call_parser = ToolCallParser(tools)
+
+# Runs likely read-only tool calls in parallel with the model call
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "true").lower() == "true"
+speculative_executor = SpeculativeExecutor(tool_registry)
+
+# Stops hammering the fine-tuned endpoint while it is failing
+fine_tuned_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+)
 
 class GoodFoodsAgent:
     def __init__(self):
@@ -22,9 +75,17 @@ class GoodFoodsAgent:
         # For now, let's try to find it automatically, but you can also set it manually
         self.endpoint_id = "2841211713452244992"  # Your endpoint ID
         
+        # Tools exposed to the model
+        self.tools = tools
+        
         # Initialize conversation state
         self.conversation_history = []
-        self.current_booking_context = {}
+        # Set by the session serving this conversation; scopes its idempotent tool calls
+        self.session_id: Optional[str] = None
+        self.current_booking_context = BookingState()
+        
+        # Optional callback(event, data) told about tool calls as a turn runs
+        self.event_listener: Optional[Callable[[str, Dict[str, Any]], None]] = None
         
         # Development mode flag
         self.dev_mode = os.getenv("DEV_MODE", "true").lower() == "true"
@@ -39,7 +100,7 @@ class GoodFoodsAgent:
     
     def build_system_prompt(self) -> str:
         """Build the system prompt for the LLM"""
-        return """You are 'Samvaad', a helpful and friendly AI assistant for the GoodFoods restaurant chain.
+        system_prompt = """You are 'Samvaad', a helpful and friendly AI assistant for the GoodFoods restaurant chain.
 Your primary goal is to help users find restaurants and book tables.
 
 You have access to a set of tools to perform these actions. When a user asks a question, first decide if you need to call a tool.
@@ -55,6 +116,7 @@ CONVERSATION FLOW RULES:
 4. For booking, collect: date, time, party size, name, and phone number
 5. Use check_availability tool to verify slots before creating booking
 6. Use create_booking tool to finalize the reservation
+7. If the requested time is full and the user would rather wait for it than take an alternative, use join_waitlist
 
 IMPORTANT RULES:
 1. Always use the provided tools for restaurant operations - never make up information
@@ -70,248 +132,329 @@ Available tools:
 - check_availability: Check if tables are available at a specific time
 - create_booking: Create a new reservation
 - cancel_booking: Cancel an existing booking
-- get_booking_details: Get details of an existing booking"""
+- get_booking_details: Get details of an existing booking
+- join_waitlist: Wait for a table at a fully booked time; booked automatically if one frees up
+- leave_waitlist: Leave a waitlist
+- get_waitlist_status: Place in the queue, or the booking a waitlist entry became"""
+        
+        if LOCAL_LLM_BASE_URL and STRUCTURED_OUTPUT:
+            # Decoding is constrained to the tool-call schema, which wraps plain replies
+            system_prompt += """
 
-    def invoke_llm(self, messages: List[Dict], tools: List[Dict]) -> Dict:
-        """Invoke the Llama 3.1 8B model via Google Cloud Vertex AI"""
+If you do not need to call a tool, respond ONLY with a JSON object: {"message": "your reply"}"""
+        
+        return system_prompt
+
+    def _build_prompt(self, messages: List[Dict]) -> str:
+        """Flatten the system prompt and recent turns into a single text prompt"""
+        system_prompt = self.build_system_prompt()
+        conversation_messages = [{"role": "system", "content": system_prompt}] + messages[-5:]
+        
+        # Convert to Vertex AI format
+        vertex_messages = []
+        for msg in conversation_messages:
+            if msg["role"] == "system":
+                vertex_messages.append(f"System: {msg['content']}")
+            elif msg["role"] == "user":
+                vertex_messages.append(f"User: {msg['content']}")
+            elif msg["role"] == "assistant":
+                vertex_messages.append(f"Assistant: {msg['content']}")
+        
+        # Join messages
+        return "\n".join(vertex_messages)
+    
+    def _load_credentials(self):
+        """Load (once) the service account credentials from GOOGLE_APPLICATION_CREDENTIALS"""
+        if "credentials" in _llm_clients:
+            return _llm_clients["credentials"]
+        
+        from google.oauth2 import service_account
+        
+        # Get credentials from environment variable
+        credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        if not credentials_json:
+            return None
+        
+        # Parse the JSON credentials
         try:
+            # Try to parse as JSON first
+            creds_data = json.loads(credentials_json)
+            credentials = service_account.Credentials.from_service_account_info(creds_data)
+            print("Successfully loaded credentials from JSON string")
+        except json.JSONDecodeError:
+            # If it's not valid JSON, treat as file path
+            credentials = service_account.Credentials.from_service_account_file(credentials_json)
+            print("Successfully loaded credentials from file path")
+        
+        _llm_clients["credentials"] = credentials
+        return credentials
+    
+    def _get_prediction_client(self):
+        """Build (once) the Vertex AI prediction client and resolve the endpoint path"""
+        with _llm_clients_lock:
+            if "prediction_client" in _llm_clients:
+                return _llm_clients["prediction_client"], _llm_clients["endpoint"]
+            
             # For fine-tuned models, we need to use PredictionServiceClient
-            import json
-            import os
-            from google.oauth2 import service_account
             from google.cloud import aiplatform
-            from google.protobuf import json_format
-            from google.protobuf.struct_pb2 import Value
-            
-            # Get credentials from environment variable
-            credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-            if not credentials_json:
-                print("Warning: GOOGLE_APPLICATION_CREDENTIALS not set")
-                return {"error": "Google Cloud credentials not configured"}
-            
-            # Parse the JSON credentials
-            try:
-                # Try to parse as JSON first
-                creds_data = json.loads(credentials_json)
-                credentials = service_account.Credentials.from_service_account_info(creds_data)
-                print("Successfully loaded credentials from JSON string")
-            except json.JSONDecodeError:
-                # If it's not valid JSON, treat as file path
-                credentials = service_account.Credentials.from_service_account_file(credentials_json)
-                print("Successfully loaded credentials from file path")
             
-            # Initialize client
+            credentials = self._load_credentials()
             client_options = {"api_endpoint": f"{self.location}-aiplatform.googleapis.com"}
-            client = aiplatform.gapic.PredictionServiceClient(client_options=client_options)
+            client = aiplatform.gapic.PredictionServiceClient(
+                credentials=credentials,
+                client_options=client_options
+            )
+            endpoint = self._resolve_endpoint(client, credentials)
+            print(f"Using endpoint: {endpoint}")
+            
+            _llm_clients["prediction_client"] = client
+            _llm_clients["endpoint"] = endpoint
+            return client, endpoint
+    
+    def _resolve_endpoint(self, client, credentials) -> str:
+        """Find the endpoint where the fine-tuned model is deployed"""
+        # If endpoint ID is manually set, use it
+        if self.endpoint_id:
+            print(f"Using manually set endpoint ID: {self.endpoint_id}")
+            return client.endpoint_path(
+                project=self.project_id,
+                location=self.location,
+                endpoint=self.endpoint_id
+            )
+        
+        # Otherwise list available endpoints and look for one serving our model
+        try:
+            from google.cloud import aiplatform
+            endpoints = aiplatform.Endpoint.list(
+                project=self.project_id,
+                location=self.location,
+                credentials=credentials
+            )
+            print(f"Available endpoints: {[ep.display_name for ep in endpoints]}")
             
-            # We need to find the endpoint where the model is deployed
-            print(f"Looking for endpoint for model: {self.model_name}")
+            for ep in endpoints:
+                if self.model_name in ep.display_name or self.model_name in str(ep.resource_name):
+                    print(f"Found matching endpoint: {ep.display_name}")
+                    self.endpoint_id = ep.name.split('/')[-1]  # Extract endpoint ID
+                    return ep.resource_name
             
-            # Try to get the model and find its endpoint
+            print("No matching endpoint found, trying model ID as endpoint")
+        except Exception as list_error:
+            print(f"Could not list endpoints: {list_error}")
+        
+        # Fallback to using model ID as endpoint
+        self.endpoint_id = self.model_name
+        return client.endpoint_path(
+            project=self.project_id,
+            location=self.location,
+            endpoint=self.model_name
+        )
+    
+    def _predict_fine_tuned(self, prompt: str, timeout: float) -> str:
+        """Single prediction against the fine-tuned endpoint (micro-batched if enabled)"""
+        if LLM_BATCHING:
+            batcher = get_batcher("vertex", self._predict_fine_tuned_batch, **LLM_BATCH_OPTIONS)
+            return batcher.predict(prompt, timeout)
+        return self._predict_fine_tuned_batch([prompt], timeout)[0]
+    
+    def _predict_fine_tuned_batch(self, prompts: List[str], timeout: float) -> List[str]:
+        """One predict call to the fine-tuned endpoint with an instance per prompt"""
+        from google.protobuf import json_format
+        from google.protobuf.struct_pb2 import Value
+        
+        client, endpoint = self._get_prediction_client()
+        
+        # The instance key the endpoint accepts is discovered once and memoized
+        instance_key = _llm_clients.get("instance_key")
+        candidate_keys = [instance_key] if instance_key else INSTANCE_KEY_CANDIDATES
+        
+        last_error = None
+        for key in candidate_keys:
+            instances = [json_format.ParseDict({key: prompt}, Value()) for prompt in prompts]
             try:
-                # If endpoint ID is manually set, use it
-                if self.endpoint_id:
-                    print(f"Using manually set endpoint ID: {self.endpoint_id}")
-                    endpoint = client.endpoint_path(
-                        project=self.project_id, 
-                        location=self.location, 
-                        endpoint=self.endpoint_id
-                    )
-                else:
-                    # First, let's try to list available endpoints to see what's available
-                    try:
-                        from google.cloud import aiplatform
-                        endpoints = aiplatform.Endpoint.list(
-                            project=self.project_id,
-                            location=self.location
-                        )
-                        print(f"Available endpoints: {[ep.display_name for ep in endpoints]}")
-                        
-                        # Look for an endpoint that might contain our model ID
-                        target_endpoint = None
-                        for ep in endpoints:
-                            print(f"Checking endpoint: {ep.display_name} (ID: {ep.name.split('/')[-1]})")
-                            if self.model_name in ep.display_name or self.model_name in str(ep.resource_name):
-                                target_endpoint = ep
-                                break
-                        
-                        if target_endpoint:
-                            print(f"Found matching endpoint: {target_endpoint.display_name}")
-                            self.endpoint_id = target_endpoint.name.split('/')[-1]  # Extract endpoint ID
-                            endpoint = target_endpoint.resource_name
-                        else:
-                            print("No matching endpoint found, trying model ID as endpoint")
-                            self.endpoint_id = self.model_name  # Use model ID as endpoint ID
-                            endpoint = client.endpoint_path(
-                                project=self.project_id, 
-                                location=self.location, 
-                                endpoint=self.model_name
-                            )
-                    except Exception as list_error:
-                        print(f"Could not list endpoints: {list_error}")
-                        # Fallback to using model ID as endpoint
-                        self.endpoint_id = self.model_name  # Use model ID as endpoint ID
-                        endpoint = client.endpoint_path(
-                            project=self.project_id, 
-                            location=self.location, 
-                            endpoint=self.model_name
-                        )
-                
-                print(f"Trying endpoint: {endpoint}")
-                
-                # Prepare the prompt
-                system_prompt = self.build_system_prompt()
-                conversation_messages = [{"role": "system", "content": system_prompt}] + messages[-5:]
-                
-                # Convert to Vertex AI format
-                vertex_messages = []
-                for msg in conversation_messages:
-                    if msg["role"] == "system":
-                        vertex_messages.append(f"System: {msg['content']}")
-                    elif msg["role"] == "user":
-                        vertex_messages.append(f"User: {msg['content']}")
-                    elif msg["role"] == "assistant":
-                        vertex_messages.append(f"Assistant: {msg['content']}")
-                
-                # Join messages
-                prompt = "\n".join(vertex_messages)
-                
-                # Create instance for prediction - try different formats
-                try:
-                    # Try with "prompt" key first
-                    instance = {"prompt": prompt}
-                    instances = [json_format.ParseDict(instance, Value())]
-                    
-                    # Make prediction
-                    response = client.predict(
-                        endpoint=endpoint, 
-                        instances=instances, 
-                        parameters=json_format.ParseDict({}, Value())
-                    )
-                except Exception as e:
-                    print(f"Failed with 'prompt' key, trying 'input_text': {e}")
-                    # Try with "input_text" key
-                    instance = {"input_text": prompt}
-                    instances = [json_format.ParseDict(instance, Value())]
-                    
-                    # Make prediction
-                    response = client.predict(
-                        endpoint=endpoint, 
-                        instances=instances, 
-                        parameters=json_format.ParseDict({}, Value())
-                    )
-                
-                # Extract prediction
-                if response.predictions:
-                    prediction = response.predictions[0]
-                    # Convert from protobuf Value to string
-                    if hasattr(prediction, 'string_value'):
-                        content = prediction.string_value
-                    else:
-                        content = str(prediction)
-                    
-                    return {
-                        "choices": [{
-                            "message": {
-                                "content": content,
-                                "role": "assistant"
-                            }
-                        }]
-                    }
-                else:
-                    raise Exception("No predictions returned")
-                    
+                response = client.predict(
+                    endpoint=endpoint,
+                    instances=instances,
+                    parameters=json_format.ParseDict({}, Value()),
+                    timeout=timeout
+                )
             except Exception as e:
-                print(f"Failed to use model as endpoint: {e}")
-                # Fallback to base model
-                return self._invoke_base_model(messages, tools)
-                
-        except Exception as e:
-            print(f"Error invoking LLM: {e}")
-            return self._invoke_base_model(messages, tools)
+                # Only a rejected request format is worth trying with the next key
+                if instance_key or type(e).__name__ not in ("InvalidArgument", "BadRequest"):
+                    raise
+                print(f"Endpoint rejected instance key '{key}': {e}")
+                last_error = e
+                continue
+            
+            _llm_clients["instance_key"] = key
+            
+            # Extract predictions, one per instance
+            if len(response.predictions) != len(prompts):
+                raise Exception(f"Expected {len(prompts)} predictions, got {len(response.predictions)}")
+            contents = []
+            for prediction in response.predictions:
+                # Convert from protobuf Value to string
+                if hasattr(prediction, 'string_value'):
+                    contents.append(prediction.string_value)
+                else:
+                    contents.append(str(prediction))
+            return contents
+        
+        raise last_error
     
-    def _invoke_base_model(self, messages: List[Dict], tools: List[Dict]) -> Dict:
-        """Fallback to base model using TextGenerationModel"""
-        try:
+    def _predict_local(self, prompt: str, timeout: float) -> str:
+        """Single completion from the local OpenAI-compatible server (micro-batched if enabled)"""
+        if LLM_BATCHING:
+            batcher = get_batcher("local", self._predict_local_batch, **LLM_BATCH_OPTIONS)
+            return batcher.predict(prompt, timeout)
+        return self._predict_local_batch([prompt], timeout)[0]
+    
+    def _predict_local_batch(self, prompts: List[str], timeout: float) -> List[str]:
+        """One /completions request to the local server; it accepts a list of prompts"""
+        import requests
+        
+        payload = {
+            "model": LOCAL_LLM_MODEL,
+            "prompt": [f"{prompt}\nAssistant:" for prompt in prompts],
+            "temperature": 0.1,
+            "max_tokens": 512
+        }
+        if STRUCTURED_OUTPUT:
+            # Grammar-guided decoding: the server can only emit schema-valid JSON
+            payload[LOCAL_LLM_GRAMMAR_FIELD] = tool_call_parser.schema
+        
+        response = requests.post(
+            f"{LOCAL_LLM_BASE_URL.rstrip('/')}/completions",
+            json=payload,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        
+        # Choices come back tagged with the index of their prompt
+        choices = sorted(response.json()["choices"], key=lambda choice: choice.get("index", 0))
+        return [choice["text"].strip() for choice in choices]
+    
+    def _get_base_model(self):
+        """Initialize (once) the base model used as secondary backend"""
+        with _llm_clients_lock:
+            if "base_model" in _llm_clients:
+                return _llm_clients["base_model"]
+            
             import vertexai
             from vertexai.preview import language_models
-            import json
-            from google.oauth2 import service_account
-            
-            # Get credentials from environment variable
-            credentials_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-            if not credentials_json:
-                print("Warning: GOOGLE_APPLICATION_CREDENTIALS not set")
-                return {"error": "Google Cloud credentials not configured"}
-            
-            # Parse the JSON credentials
-            try:
-                # Try to parse as JSON first
-                creds_data = json.loads(credentials_json)
-                credentials = service_account.Credentials.from_service_account_info(creds_data)
-                print("Base model: Successfully loaded credentials from JSON string")
-            except json.JSONDecodeError:
-                # If it's not valid JSON, treat as file path
-                credentials = service_account.Credentials.from_service_account_file(credentials_json)
-                print("Base model: Successfully loaded credentials from file path")
             
             # Initialize Vertex AI with explicit credentials
             vertexai.init(
                 project=self.project_id,
                 location=self.location,
-                credentials=credentials
+                credentials=self._load_credentials()
             )
             
             # Use base model - try different model names
-            try:
-                model = language_models.TextGenerationModel.from_pretrained("gemini-1.5-flash")
-            except Exception as e:
-                print(f"Failed with gemini-1.5-flash, trying gemini-1.5-pro: {e}")
+            model = None
+            for model_name in BASE_MODEL_CANDIDATES:
                 try:
-                    model = language_models.TextGenerationModel.from_pretrained("gemini-1.5-pro")
-                except Exception as e2:
-                    print(f"Failed with gemini-1.5-pro, trying gemini-1.0-pro: {e2}")
-                    model = language_models.TextGenerationModel.from_pretrained("gemini-1.0-pro")
-            
-            # Prepare messages for Vertex AI format
-            system_prompt = self.build_system_prompt()
-            conversation_messages = [{"role": "system", "content": system_prompt}] + messages[-5:]
-            
-            # Convert to Vertex AI format
-            vertex_messages = []
-            for msg in conversation_messages:
-                if msg["role"] == "system":
-                    vertex_messages.append(f"System: {msg['content']}")
-                elif msg["role"] == "user":
-                    vertex_messages.append(f"User: {msg['content']}")
-                elif msg["role"] == "assistant":
-                    vertex_messages.append(f"Assistant: {msg['content']}")
+                    model = language_models.TextGenerationModel.from_pretrained(model_name)
+                    break
+                except Exception as e:
+                    print(f"Failed to load base model {model_name}: {e}")
+            if model is None:
+                raise Exception("No base model available")
             
-            # Join messages
-            prompt = "\n".join(vertex_messages)
+            _llm_clients["base_model"] = model
+            return model
+    
+    def _predict_base_model(self, prompt: str) -> str:
+        """Single prediction against the base model"""
+        model = self._get_base_model()
+        print("Using base model as fallback")
+        response = model.predict(
+            prompt,
+            temperature=0.1,
+            max_output_tokens=512
+        )
+        return response.text
+    
+    def invoke_llm(self, messages: List[Dict], tools: List[Dict]) -> Dict:
+        """
+        Invoke the Llama 3.1 8B model via Google Cloud Vertex AI.
+        
+        The fine-tuned endpoint is called with a per-attempt timeout and jittered
+        backoff inside an overall deadline, behind a circuit breaker. The base model
+        is the secondary backend: used when the breaker is open or the primary
+        fails, or raced against the primary when hedging is enabled.
+        """
+        if LOCAL_LLM_BASE_URL:
+            return self._invoke_local_model(messages)
+        
+        if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+            print("Warning: GOOGLE_APPLICATION_CREDENTIALS not set")
+            return {"error": "Google Cloud credentials not configured"}
+        
+        deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+        prompt = self._build_prompt(messages)
+        
+        def primary() -> str:
+            return fine_tuned_breaker.call(lambda: retry_with_backoff(
+                lambda timeout: self._predict_fine_tuned(prompt, timeout),
+                deadline=deadline,
+                max_retries=LLM_MAX_RETRIES,
+                attempt_timeout=LLM_ATTEMPT_TIMEOUT_SECONDS
+            ))
+        
+        def secondary() -> str:
+            return self._predict_base_model(prompt)
+        
+        try:
+            # While the breaker is open, primary() raises immediately and the
+            # base model answers without waiting on the fine-tuned endpoint
+            if LLM_HEDGE_AFTER_SECONDS is not None:
+                content = hedged_call(primary, secondary, LLM_HEDGE_AFTER_SECONDS, deadline)
+            else:
+                try:
+                    content = primary()
+                except Exception as e:
+                    print(f"Fine-tuned endpoint failed: {e}")
+                    content = call_with_deadline(secondary, deadline)
             
-            # Generate response
-            print(f"Using base model as fallback")
-            response = model.predict(
-                prompt,
-                temperature=0.1,
-                max_output_tokens=512
+            return {
+                "choices": [{
+                    "message": {
+                        "content": content,
+                        "role": "assistant"
+                    }
+                }]
+            }
+        
+        except Exception as e:
+            print(f"Error invoking LLM: {e}")
+            return {"error": f"Failed to get response from AI model: {str(e)}"}
+    
+    def _invoke_local_model(self, messages: List[Dict]) -> Dict:
+        """Invoke a local OpenAI-compatible server (vLLM, llama.cpp, TGI) set via LOCAL_LLM_BASE_URL"""
+        try:
+            deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+            prompt = self._build_prompt(messages)
+            content = retry_with_backoff(
+                lambda timeout: self._predict_local(prompt, timeout),
+                deadline=deadline,
+                max_retries=LLM_MAX_RETRIES,
+                attempt_timeout=LLM_ATTEMPT_TIMEOUT_SECONDS
             )
             
-            # Convert response to expected format
             return {
                 "choices": [{
                     "message": {
-                        "content": response.text,
+                        "content": content,
                         "role": "assistant"
                     }
                 }]
             }
-            
+        
         except Exception as e:
-            print(f"Error with base model fallback: {e}")
+            print(f"Error invoking local LLM: {e}")
             return {"error": f"Failed to get response from AI model: {str(e)}"}
-
+    
     def invoke_llm_dev_mode(self, messages: List[Dict], tools: List[Dict]) -> Dict:
         """Development mode LLM invocation with simple rule-based responses"""
         try:
@@ -346,36 +489,11 @@ Available tools:
             
             # Handle availability checking
             if any(word in user_message for word in ['check', 'available', 'availability', 'slot', 'time']) and any(word in user_message for word in ['people', 'person', 'guest']):
-                # Extract availability information
-                party_size = None
-                date = None
-                time = None
-                
-                # Simple extraction
-                if '2' in user_message or 'two' in user_message:
-                    party_size = 2
-                elif '4' in user_message or 'four' in user_message:
-                    party_size = 4
-                elif '6' in user_message or 'six' in user_message:
-                    party_size = 6
-                elif '8' in user_message or 'eight' in user_message:
-                    party_size = 8
-                
-                if 'tomorrow' in user_message:
-                    from datetime import datetime, timedelta
-                    date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-                elif 'today' in user_message or 'tonight' in user_message:
-                    from datetime import datetime
-                    date = datetime.now().strftime('%Y-%m-%d')
-                
-                if '7' in user_message or 'seven' in user_message:
-                    time = '19:00'
-                elif '8' in user_message or 'eight' in user_message:
-                    time = '20:00'
-                elif '9' in user_message or 'nine' in user_message:
-                    time = '21:00'
-                elif '6' in user_message or 'six' in user_message:
-                    time = '18:00'
+                # Slots come from the booking state tracker
+                slots = self.current_booking_context.slots
+                party_size = slots.get("party_size")
+                date = slots.get("date")
+                time = slots.get("time")
                 
                 if party_size and date and time:
                     return {
@@ -385,7 +503,7 @@ Available tools:
                                     "functionCall": {
                                         "name": "check_availability",
                                         "args": json.dumps({
-                                            "restaurant_id": 1,  # Default to first restaurant
+                                            "restaurant_id": slots.get("restaurant_id", 1),  # Default to first restaurant
                                             "date": date,
                                             "time": time,
                                             "party_size": party_size
@@ -460,119 +578,35 @@ Available tools:
                         }]
                     }
                 
-                # Extract booking information
-                party_size = None
-                date = None
-                time = None
-                customer_name = None
-                phone_number = None
-                
-                # Simple extraction
-                if '2' in user_message or 'two' in user_message:
-                    party_size = 2
-                elif '4' in user_message or 'four' in user_message:
-                    party_size = 4
-                elif '6' in user_message or 'six' in user_message:
-                    party_size = 6
-                elif '8' in user_message or 'eight' in user_message:
-                    party_size = 8
-                
-                if 'tomorrow' in user_message:
-                    from datetime import datetime, timedelta
-                    date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-                elif 'friday' in user_message:
-                    # Simple date logic for demo
-                    date = '2025-08-08'  # Next Friday
-                elif 'today' in user_message:
-                    from datetime import datetime
-                    date = datetime.now().strftime('%Y-%m-%d')
-                
-                if '7' in user_message or 'seven' in user_message:
-                    time = '19:00'
-                elif '8' in user_message or 'eight' in user_message:
-                    time = '20:00'
-                elif '9' in user_message or 'nine' in user_message:
-                    time = '21:00'
-                elif '6' in user_message or 'six' in user_message:
-                    time = '18:00'
-                
-                # Extract name and phone (simple pattern matching)
-                import re
-                phone_match = re.search(r'\b\d{10}\b', user_message)
-                if phone_match:
-                    phone_number = phone_match.group()
-                
-                # Simple name extraction (look for "my name is" or "i am")
-                if 'my name is' in user_message:
-                    name_start = user_message.find('my name is') + 11
-                    name_end = user_message.find(' ', name_start)
-                    if name_end == -1:
-                        name_end = len(user_message)
-                    customer_name = user_message[name_start:name_end].strip()
-                elif 'i am' in user_message:
-                    name_start = user_message.find('i am') + 4
-                    name_end = user_message.find(' ', name_start)
-                    if name_end == -1:
-                        name_end = len(user_message)
-                    customer_name = user_message[name_start:name_end].strip()
-                
-                # If we have all required booking details, proceed with booking
-                if party_size and date and time and customer_name and phone_number:
+                # Only reached while the booking state cannot act on its own,
+                # i.e. the restaurant is unknown: default to the first restaurant
+                state = self.current_booking_context
+                missing = [slot for slot in state.missing_slots() if slot != "restaurant_id"]
+                if not missing:
+                    arguments = {"restaurant_id": 1}
+                    arguments.update((slot, state.slots[slot]) for slot in BOOKING_SLOTS if slot in state.slots)
                     return {
                         "candidates": [{
                             "content": {
                                 "parts": [{
                                     "functionCall": {
                                         "name": "create_booking",
-                                        "args": json.dumps({
-                                            "restaurant_id": 1,  # Default to first restaurant
-                                            "user_name": customer_name,
-                                            "phone_number": phone_number,
-                                            "date": date,
-                                            "time": time,
-                                            "party_size": party_size
-                                        })
+                                        "args": json.dumps(arguments)
                                     }
                                 }]
                             }
                         }]
                     }
-                # If we have partial details, ask for missing information
-                elif party_size and date and time:
-                    missing_info = []
-                    if not customer_name:
-                        missing_info.append("your name")
-                    if not phone_number:
-                        missing_info.append("your phone number")
-                    
-                    return {
-                        "candidates": [{
-                            "content": {
-                                "parts": [{
-                                    "text": f"Great! I have your booking details for {party_size} people on {date} at {time}. I just need: {', '.join(missing_info)}."
-                                }]
-                            }
-                        }]
-                    }
-                # If we have some details but not all, ask for the rest
-                else:
-                    missing_info = []
-                    if not party_size:
-                        missing_info.append("number of people")
-                    if not date:
-                        missing_info.append("date")
-                    if not time:
-                        missing_info.append("time")
-                    
-                    return {
-                        "candidates": [{
-                            "content": {
-                                "parts": [{
-                                    "text": f"Could you please provide: {', '.join(missing_info)}?"
-                                }]
-                            }
-                        }]
-                    }
+                
+                return {
+                    "candidates": [{
+                        "content": {
+                            "parts": [{
+                                "text": state.prompt_for(missing)
+                            }]
+                        }
+                    }]
+                }
             
             elif 'hi' in user_message or 'hello' in user_message:
                 return {
@@ -621,25 +655,11 @@ Available tools:
                         })
                     return {"type": "tool_call", "data": tool_calls}
                 
-                # Check if content contains a JSON tool call (Vertex AI sometimes returns this)
+                # Check if content contains a JSON tool call (Vertex AI sometimes returns this).
+                # The parser validates against the tool definitions and repairs fenced,
+                # truncated or slightly malformed JSON instead of showing it as text.
                 elif "content" in message and message["content"]:
-                    content = message["content"]
-                    # Try to parse as JSON tool call
-                    try:
-                        parsed_content = json.loads(content)
-                        if "tool_calls" in parsed_content and parsed_content["tool_calls"]:
-                            tool_calls = []
-                            for tool_call in parsed_content["tool_calls"]:
-                                tool_calls.append({
-                                    "name": tool_call["name"],
-                                    "arguments": tool_call["arguments"]
-                                })
-                            return {"type": "tool_call", "data": tool_calls}
-                    except json.JSONDecodeError:
-                        # Not JSON, treat as regular text
-                        pass
-                    
-                    return {"type": "text", "data": content}
+                    return tool_call_parser.parse(message["content"])
             
             # Fallback to old format for development mode
             if "candidates" in response and response["candidates"]:
@@ -668,19 +688,40 @@ Available tools:
             print(f"Error parsing LLM response: {e}")
             return {"type": "error", "data": f"Failed to parse response: {str(e)}"}
 
-    def execute_tool(self, tool_call: Dict) -> Any:
-        """Execute a tool call and return the result"""
+    def execute_tool(self, tool_call: Dict, speculation: Optional[Speculation] = None) -> Any:
+        """
+        Execute a tool call and return the result.
+        Arguments are validated and normalized by the tool registry first; the
+        normalized values are written back to tool_call. A matching speculative
+        prefetch is used instead of running the tool again. Raises
+        ToolValidationError when the call is rejected.
+        """
+        function_name = tool_call.get("name")
         try:
-            function_name = tool_call["name"]
-            arguments = tool_call["arguments"]
-            
-            # Map function name to actual function
-            if hasattr(tool_functions, function_name):
-                function_to_call = getattr(tool_functions, function_name)
-                result = function_to_call(**arguments)
+            validated_arguments = tool_registry.validate(function_name, tool_call.get("arguments") or {})
+            tool_call["arguments"] = validated_arguments
+            
+            if speculation is not None:
+                hit, result = speculation.claim(function_name, validated_arguments)
+                if hit:
+                    return result
+            
+            # A repeated booking in the same conversation returns the first one, unless it was cancelled since
+            if function_name in IDEMPOTENT_TOOLS and self.session_id:
+                result, _ = idempotency_store.run(
+                    function_name, derive_key(self.session_id, validated_arguments), validated_arguments,
+                    lambda: tool_registry.run(function_name, validated_arguments), replay_if=still_confirmed
+                )
                 return result
-            else:
-                return f"Error: Tool '{function_name}' not found."
+            
+            return tool_registry.run(function_name, validated_arguments)
+        
+        except ToolValidationError:
+            raise
+        
+        except IdempotencyInProgress as e:
+            # The same booking is running for this conversation on another worker
+            return {"success": False, "error": str(e)}
         
         except Exception as e:
             print(f"Error executing tool {function_name}: {e}")
@@ -689,142 +730,48 @@ Available tools:
     def format_tool_result(self, tool_name: str, result: Any) -> str:
         """Format tool execution result into a user-friendly message"""
         try:
-            if tool_name == "find_restaurants":
-                if not result:
-                    return "I couldn't find any restaurants matching your criteria. Could you try a different location or cuisine type?"
-                
-                restaurants = result
-                if len(restaurants) == 1:
-                    restaurant = restaurants[0]
-                    return f"I found {restaurant['name']} in {restaurant['address']}. They serve {restaurant['cuisine_type']} cuisine. Would you like to book a table there?"
-                else:
-                    response = f"I found {len(restaurants)} restaurants:"
-                    for i, restaurant in enumerate(restaurants[:3], 1):  # Show top 3
-                        response += f"\n{i}. {restaurant['name']} - {restaurant['address']} ({restaurant['cuisine_type']})"
-                    
-                    if len(restaurants) > 3:
-                        response += f"\n... and {len(restaurants) - 3} more"
-                    
-                    response += "\n\nWhich one would you like to book?"
-                    return response
-            
-            elif tool_name == "check_availability":
-                if not result:
-                    return "I'm sorry, but there are no tables available at that time. Would you like me to check for alternative times?"
-                
-                # Convert 24-hour format to 12-hour format
-                def format_time_12hr(time_24hr):
-                    try:
-                        from datetime import datetime
-                        time_obj = datetime.strptime(time_24hr, "%H:%M")
-                        return time_obj.strftime("%I:%M %p")
-                    except:
-                        return time_24hr
-                
-                if len(result) == 1:
-                    formatted_time = format_time_12hr(result[0])
-                    return f"Great! A table is available at {formatted_time}. Would you like me to proceed with the booking?"
-                else:
-                    response = f"The requested time isn't available, but I found these alternative times:"
-                    for time_slot in result[:5]:  # Show top 5 alternatives
-                        formatted_time = format_time_12hr(time_slot)
-                        response += f"\n- {formatted_time}"
-                    response += "\n\nWhich time would you prefer?"
-                    return response
-            
-            elif tool_name == "create_booking":
-                if result.get("success"):
-                    # Format the date and time for better display
-                    from datetime import datetime
-                    
-                    # Parse the date and time
-                    booking_date = result.get('date', '')
-                    booking_time = result.get('time', '')
-                    
-                    # Format date
-                    try:
-                        date_obj = datetime.strptime(booking_date, "%Y-%m-%d")
-                        formatted_date = date_obj.strftime("%B %d, %Y")  # e.g., "August 2, 2025"
-                    except:
-                        formatted_date = booking_date
-                    
-                    # Format time to 12-hour format
-                    try:
-                        time_obj = datetime.strptime(booking_time, "%H:%M")
-                        formatted_time = time_obj.strftime("%I:%M %p")  # e.g., "7:00 PM"
-                    except:
-                        formatted_time = booking_time
-                    
-                    return f"Excellent! Your booking is confirmed. Your booking reference is {result['booking_id']}. We look forward to seeing you at {result['restaurant_name']} on {formatted_date} at {formatted_time} for {result['party_size']} people."
-                else:
-                    return f"I'm sorry, I couldn't complete the booking: {result.get('error', 'Unknown error')}"
-            
-            elif tool_name == "cancel_booking":
-                if result:
-                    return f"Your booking has been cancelled successfully. Thank you for letting us know."
-                else:
-                    return "I'm sorry, I couldn't find that booking to cancel. Please check your booking reference number."
-            
-            elif tool_name == "get_booking_details":
-                if result.get("success"):
-                    booking = result
-                    
-                    # Format date and time
-                    from datetime import datetime
-                    
-                    try:
-                        date_obj = datetime.strptime(booking['date'], "%Y-%m-%d")
-                        formatted_date = date_obj.strftime("%B %d, %Y")
-                    except:
-                        formatted_date = booking['date']
-                    
-                    try:
-                        time_obj = datetime.strptime(booking['time'], "%H:%M")
-                        formatted_time = time_obj.strftime("%I:%M %p")
-                    except:
-                        formatted_time = booking['time']
-                    
-                    return f"Here are your booking details:\n- Booking ID: {booking['booking_id']}\n- Restaurant: {booking['restaurant_name']}\n- Date: {formatted_date}\n- Time: {formatted_time}\n- Party Size: {booking['party_size']}\n- Status: {booking['status']}"
-                else:
-                    return f"I'm sorry, I couldn't find that booking: {result.get('error', 'Unknown error')}"
-            
-            elif tool_name == "get_menu_specials":
-                if not result:
-                    return "I'm sorry, but I couldn't find any menu specials at the moment. Please check back later or ask about our regular menu items."
-                
-                specials = result
-                if len(specials) == 1:
-                    special = specials[0]
-                    return f"Our current special is the {special['name']} - {special['description']} for {special['price']}."
-                else:
-                    response = f"Here are our current menu specials:"
-                    for i, special in enumerate(specials, 1):
-                        response += f"\n{i}. {special['name']} - {special['description']} ({special['price']})"
-                    
-                    response += "\n\nThese are our chef's recommendations for today!"
-                    return response
-            
-            else:
-                return f"Tool {tool_name} executed successfully."
-                
+            return response_renderer.render(tool_name, result)
         except Exception as e:
             print(f"Error formatting tool result: {e}")
-            return f"I processed your request, but there was an issue formatting the response. Please try again."
+            return "I processed your request, but there was an issue formatting the response. Please try again."
+
+    def emit(self, event: str, **data):
+        """Tell the event listener, if any, about progress within a turn"""
+        if self.event_listener is not None:
+            try:
+                self.event_listener(event, data)
+            except Exception as e:
+                print(f"Error in event listener: {e}")
 
     def get_response(self, user_message: str) -> str:
         """Main method to get a response from the AI agent"""
+        speculation = None
         try:
             # Add user message to conversation history
             self.conversation_history.append({"role": "user", "content": user_message})
-            
-            # Invoke the LLM (use dev mode if enabled)
-            if self.dev_mode:
-                llm_response = self.invoke_llm_dev_mode(self.conversation_history, tools)
+            state = self.current_booking_context
+            state.update_from_message(user_message)
+            
+            # The booking state answers directly when it can: ask for missing
+            # details, or book once every slot is known, without an LLM round trip
+            action = state.next_action()
+            if action is not None and action[0] == "ask":
+                parsed_response = {"type": "text", "data": state.prompt_for(action[1])}
+            elif action is not None:
+                parsed_response = {"type": "tool_call", "data": [{"name": action[0], "arguments": action[1]}]}
             else:
-                llm_response = self.invoke_llm(self.conversation_history, tools)
-            
-            # Parse the response
-            parsed_response = self.parse_llm_response(llm_response)
+                # Prefetch likely read-only tool results while the model is generating
+                if SPECULATIVE_PREFETCH and not self.dev_mode:
+                    speculation = speculative_executor.start(state.slots)
+                
+                # Invoke the LLM (use dev mode if enabled)
+                if self.dev_mode:
+                    llm_response = self.invoke_llm_dev_mode(self.conversation_history, tools)
+                else:
+                    llm_response = self.invoke_llm(self.conversation_history, tools)
+                
+                # Parse the response
+                parsed_response = self.parse_llm_response(llm_response)
             
             if parsed_response["type"] == "tool_call":
                 # Execute the tool
@@ -832,9 +779,18 @@ Available tools:
                 tool_results = []
                 
                 for tool_call in tool_calls:
-                    result = self.execute_tool(tool_call)
+                    self.emit("tool_call", name=tool_call["name"], arguments=tool_call.get("arguments", {}))
+                    try:
+                        result = self.execute_tool(tool_call, speculation)
+                    except ToolValidationError as e:
+                        # Rejected before touching the database; ask the user to fix it
+                        tool_results.append(str(e))
+                        self.emit("tool_result", name=tool_call["name"], ok=False, text=str(e))
+                        continue
+                    state.update_from_tool(tool_call["name"], tool_call["arguments"], result)
                     formatted_result = self.format_tool_result(tool_call["name"], result)
                     tool_results.append(formatted_result)
+                    self.emit("tool_result", name=tool_call["name"], ok=True, text=formatted_result)
                 
                 # Combine all tool results
                 final_response = "\n\n".join(tool_results)
@@ -853,8 +809,21 @@ Available tools:
         except Exception as e:
             print(f"Error in get_response: {e}")
             return "I'm sorry, I'm experiencing technical difficulties. Please try again later."
+        
+        finally:
+            # Failed turns too: prefetches the model never asked for are cancelled
+            if speculation is not None:
+                speculation.finish()
     
     def reset_conversation(self):
         """Reset the conversation history"""
         self.conversation_history = []
-        self.current_booking_context = {} 
\ No newline at end of file
+        self.current_booking_context = BookingState()
+
+    def restore_conversation(self, history: List[Dict[str, str]]):
+        """Resume from a transcript, rebuilding booking details from the user's messages"""
+        self.reset_conversation()
+        self.conversation_history = [dict(message) for message in history]
+        for message in self.conversation_history:
+            if message.get("role") == "user":
+                self.current_booking_context.update_from_message(message.get("content", "")) 
\ No newline at end of file
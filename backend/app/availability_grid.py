@@ -0,0 +1,95 @@
+"""
+Day-view availability grid for the GoodFoods AI Agent
+Computes every slot of a day in one pass: the seating capacity over the
+open minutes of the day minus a histogram of the day's confirmed bookings,
+as NumPy arrays, instead of one availability query per slot.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict
+
+import numpy as np
+
+from .database import DatabaseManager
+from .opening_hours import MINUTES_PER_DAY, opening_hours_index
+from .tool_functions import _availability_group, availability_cache
+
+GRID_INTERVAL_MINUTES = (15, 30, 60)
+
+
+def _open_minutes(mask: int, weekday: int) -> np.ndarray:
+    """Boolean array with one entry per minute of the day: is the restaurant open"""
+    day = mask >> (weekday * MINUTES_PER_DAY) & ((1 << MINUTES_PER_DAY) - 1)
+    packed = np.frombuffer(day.to_bytes(MINUTES_PER_DAY // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(packed, bitorder="little").astype(bool)
+
+
+def _compute_grid(restaurant_id: int, date: str, party_size: int, interval: int) -> Dict:
+    empty = {"restaurant_id": restaurant_id, "date": date, "party_size": party_size,
+             "interval_minutes": interval, "start": None, "remaining_seats": [], "available": ""}
+
+    mask = opening_hours_index.mask(restaurant_id)
+    if mask is None:
+        return empty
+    day = datetime.strptime(date, "%Y-%m-%d")
+    open_minutes = _open_minutes(mask, day.weekday())
+
+    # Slots from the first to the last one inside opening hours
+    slot_minutes = np.arange(0, MINUTES_PER_DAY, interval)
+    open_slots = open_minutes[slot_minutes]
+    if not open_slots.any():
+        return empty
+    first, last = np.flatnonzero(open_slots)[[0, -1]]
+    slot_minutes = slot_minutes[first:last + 1]
+    open_slots = open_slots[first:last + 1]
+
+    with DatabaseManager() as db:
+        capacity = db.execute_query(
+            "SELECT COALESCE(SUM(capacity), 0) FROM RestaurantTable WHERE restaurant_id = ?",
+            [restaurant_id]
+        )[0][0]
+        bookings = db.execute_query(
+            """
+            SELECT booking_time, num_guests FROM Booking
+            WHERE restaurant_id = ? AND booking_time >= ? AND booking_time < ? AND status = 'confirmed'
+            """,
+            [restaurant_id, f"{date} 00:00:00", f"{(day + timedelta(days=1)).strftime('%Y-%m-%d')} 00:00:00"]
+        )
+
+    # Guests booked per minute of the day. A booking only occupies its own slot,
+    # as in check_availability, so off-grid booking times don't count here either
+    minutes = np.fromiter((int(t[11:13]) * 60 + int(t[14:16]) for t, _ in bookings), dtype=np.int64, count=len(bookings))
+    guests = np.fromiter((g for _, g in bookings), dtype=np.int64, count=len(bookings))
+    booked = np.bincount(minutes, weights=guests, minlength=MINUTES_PER_DAY).astype(np.int64)
+
+    # Capacity vector (zero while closed) minus the bookings histogram
+    remaining = np.where(open_slots, capacity - booked[slot_minutes], 0)
+    status = np.where(~open_slots, "-", np.where(remaining >= party_size, "1", "0"))
+    start = int(slot_minutes[0])
+    return {
+        "restaurant_id": restaurant_id,
+        "date": date,
+        "party_size": party_size,
+        "interval_minutes": interval,
+        "start": f"{start // 60:02d}:{start % 60:02d}",
+        "remaining_seats": remaining.tolist(),
+        "available": "".join(status.tolist()),
+    }
+
+
+def availability_grid(restaurant_id: int, date: str, party_size: int, interval: int = 30) -> Dict:
+    """
+    Slots of `date` every `interval` minutes from `start` to the last slot
+    within opening hours. "available" has one character per slot: "1" if
+    `party_size` fits, "0" if not, "-" while closed; "remaining_seats" is
+    aligned with it. Cached with, and invalidated alongside, the per-slot
+    availability of the same restaurant and date.
+    """
+    if interval not in GRID_INTERVAL_MINUTES:
+        raise ValueError(f"interval must be one of: {', '.join(map(str, GRID_INTERVAL_MINUTES))}")
+    key = (restaurant_id, date, f"grid/{interval}", party_size)
+    return availability_cache.get_or_compute(
+        key,
+        _availability_group(key),
+        lambda: _compute_grid(restaurant_id, date, party_size, interval)
+    )
@@ -0,0 +1,233 @@
+"""
+Booking state tracking for the GoodFoods AI Agent
+BookingState accumulates the booking slots (restaurant, date, time, party
+size, name, phone) from user messages and tool results across turns, and
+tracks where the booking dialog is so the agent can ask for missing details
+or call create_booking itself without another LLM round trip.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tool_registry import ToolValidationError, parse_date, parse_time
+
+_PARTY_SIZE = re.compile(r"\b(?:for|party of|table for)?\s*(\d{1,2})\s*(?:people|persons|person|guests|pax|of us)\b|\b(?:for|party of|table for)\s+(\d{1,2})\b(?![:.]\d|\s*(?:am|pm|a\.m|p\.m))")
+_TIME = re.compile(r"\b(\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m\.|p\.m\.))|\b(\d{1,2}:\d{2})\b")
+_DATE_WORDS = re.compile(r"\b(today|tonight|tomorrow|day after tomorrow|(?:next |this )?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)|\d{4}-\d{2}-\d{2})\b")
+_BOOKING_ID = re.compile(r"\bGF\d{6}\b", re.IGNORECASE)
+_PHONE = re.compile(r"(?<![\w+])(\+?\d[\d\s-]{8,16}\d)(?![\w])")
+_NAME = re.compile(r"\b(?:my name is|name is|name:|under the name|(?:booking|reservation|table) under)\s+([a-z][a-z.'-]*(?:\s+[a-z][a-z.'-]*){0,2})", re.IGNORECASE)
+_SELF_INTRODUCTION = re.compile(r"(?i:\b(?:i am|i'm|this is))\s+([A-Z][a-z.'-]+(?:\s+[A-Z][a-z.'-]+){0,2})")
+_FULL_NAME = re.compile(r"^[A-Z][a-z.'-]+(?:\s+[A-Z][a-z.'-]+){0,3}$")
+_NAME_STOPWORDS = {"and", "phone", "my", "at", "for", "on", "with", "number", "please", "mobile", "contact"}
+
+_BOOKING_INTENT = re.compile(r"\b(book|booking|reserve|reservation|table for)\b")
+_OTHER_INTENT = re.compile(r"\b(cancel|details|status|look ?up|find my)\b")
+_CONFIRMATION = re.compile(r"^\s*(yes|yeah|yep|yup|sure|ok|okay|confirm|go ahead|please do|proceed|book it)\b|\b(book it|confirm(?:ed)?|go ahead|proceed)\b")
+_DECLINE = re.compile(r"^\s*(no|nope|not now)\b|\b(don't|do not|cancel|wait)\b")
+
+# Slots create_booking needs, in the order they are asked for
+BOOKING_SLOTS = ("restaurant_id", "party_size", "date", "time", "user_name", "phone_number")
+SLOT_LABELS = {
+    "restaurant_id": "Which restaurant",
+    "party_size": "Number of people",
+    "date": "Date (e.g., tonight, tomorrow, Friday)",
+    "time": "Time (e.g., 7:00 PM)",
+    "user_name": "Your name",
+    "phone_number": "Your phone number",
+}
+
+# Dialog phases
+IDLE = "idle"
+COLLECTING = "collecting"
+CONFIRMING = "confirming"
+BOOKED = "booked"
+
+
+def _parse_name(message: str) -> Optional[str]:
+    """A customer name stated in the message, title-cased"""
+    match = _NAME.search(message) or _SELF_INTRODUCTION.search(message)
+    if match:
+        words = []
+        for word in match.group(1).split():
+            if word.lower() in _NAME_STOPWORDS:
+                break
+            words.append(word)
+        if words:
+            return " ".join(word if word[0].isupper() else word.capitalize() for word in words)
+
+    # "Friday at 7pm, Priya Patel, +91-76543-21098": a bare name next to the phone number
+    parts = [part.strip() for part in re.split(r"[,;\n]", message)]
+    for i, part in enumerate(parts):
+        if not _PHONE.search(part):
+            continue
+        for neighbour in parts[max(i - 1, 0):i] + parts[i + 1:i + 2]:
+            if _FULL_NAME.match(neighbour) and not _DATE_WORDS.search(neighbour.lower()) and "goodfoods" not in neighbour.lower():
+                return neighbour
+    return None
+
+
+def _parse_phone(message: str) -> Optional[str]:
+    for match in _PHONE.finditer(message):
+        digits = re.sub(r"\D", "", match.group(1))
+        if 10 <= len(digits) <= 13:
+            return match.group(1).strip()
+    return None
+
+
+class BookingState:
+    """Dialog state tracker for one conversation"""
+
+    def __init__(self):
+        self.slots: Dict[str, Any] = {}
+        self.candidates: Dict[str, int] = {}
+        self.phase = IDLE
+        self.intent = False
+        self.confirmed = False
+        self.filled: List[str] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        """What carries over between turns, for storing with the transcript"""
+        return {"slots": self.slots, "candidates": self.candidates, "phase": self.phase}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BookingState":
+        state = cls()
+        state.slots = dict(data.get("slots", {}))
+        state.candidates = dict(data.get("candidates", {}))
+        state.phase = data.get("phase", IDLE)
+        return state
+
+    def _set(self, slot: str, value: Any):
+        if value is not None and self.slots.get(slot) != value:
+            self.slots[slot] = value
+            self.filled.append(slot)
+
+    def update_from_message(self, message: str):
+        """Pick up slots, booking intent and confirmation from a user message"""
+        text = message.lower()
+        self.filled = []
+
+        match = _PARTY_SIZE.search(text)
+        if match:
+            self._set("party_size", int(match.group(1) or match.group(2)))
+
+        match = _DATE_WORDS.search(text)
+        if match:
+            try:
+                self._set("date", parse_date(match.group(1)))
+            except ToolValidationError:
+                pass
+
+        match = _TIME.search(text)
+        if match:
+            try:
+                self._set("time", parse_time(match.group(1) or match.group(2)))
+            except ToolValidationError:
+                pass
+
+        reference = _BOOKING_ID.search(message)
+        if reference:
+            self.slots["booking_id"] = reference.group().upper()
+
+        self._set("user_name", _parse_name(message))
+        self._set("phone_number", _parse_phone(message))
+
+        # A restaurant from the last search results named in the message
+        for name, restaurant_id in self.candidates.items():
+            if name in text:
+                self._set("restaurant_id", restaurant_id)
+                break
+
+        self.intent = bool(_BOOKING_INTENT.search(text)) and not _OTHER_INTENT.search(text) and not reference
+        if self.intent and self.phase in (IDLE, BOOKED):
+            self.phase = COLLECTING
+
+        self.confirmed = bool(_CONFIRMATION.search(text)) and not _DECLINE.search(text)
+        if self.phase == CONFIRMING and (_DECLINE.search(text) or self.filled or self.confirmed and self.missing_slots()):
+            # Declined, changed a detail or still missing some: back to collecting before booking
+            self.phase = COLLECTING
+
+    def update_from_tool(self, name: str, arguments: Dict[str, Any], result: Any):
+        """Pick up slots and the dialog phase from a tool call and its result"""
+        if name == "find_restaurants" and isinstance(result, list):
+            # Remember the distinctive part of each name ("GoodFoods Indiranagar" -> "indiranagar")
+            self.candidates = {
+                restaurant["name"].lower().replace("goodfoods", "").strip(): restaurant["id"]
+                for restaurant in result
+            }
+            if len(result) == 1:
+                self.slots["restaurant_id"] = result[0]["id"]
+
+        elif name in ("check_availability", "create_booking", "join_waitlist"):
+            for slot in BOOKING_SLOTS:
+                if slot in arguments:
+                    self.slots[slot] = arguments[slot]
+            if name == "check_availability" and isinstance(result, list):
+                if result == [arguments.get("time")]:
+                    self.phase = CONFIRMING
+                else:
+                    # Requested time is taken: the user picks one of the alternatives
+                    self.slots.pop("time", None)
+                    if self.phase != IDLE:
+                        self.phase = COLLECTING
+            elif name == "create_booking" and isinstance(result, dict) and result.get("success"):
+                self.slots["booking_id"] = result["booking_id"]
+                # Keep who is booking; the next booking starts from a fresh date, time and party
+                for slot in ("date", "time", "party_size"):
+                    self.slots.pop(slot, None)
+                self.phase = BOOKED
+
+        elif name in ("get_booking_details", "cancel_booking"):
+            self.slots["booking_id"] = arguments.get("booking_id", self.slots.get("booking_id"))
+            if arguments.get("phone_number"):
+                self.slots["phone_number"] = arguments["phone_number"]
+
+    def missing_slots(self) -> List[str]:
+        return [slot for slot in BOOKING_SLOTS if not self.slots.get(slot)]
+
+    def booking_arguments(self) -> Dict[str, Any]:
+        return {slot: self.slots[slot] for slot in BOOKING_SLOTS}
+
+    def next_action(self) -> Optional[Tuple[str, Any]]:
+        """
+        What the agent can do this turn without the LLM:
+        ("create_booking", arguments) once every slot is known and the user
+        confirmed or just supplied the last details, ("ask", missing slots)
+        while collecting, or None to let the model decide.
+        """
+        if self.phase not in (COLLECTING, CONFIRMING):
+            return None
+
+        missing = self.missing_slots()
+        if not missing:
+            if self.confirmed or (self.phase == COLLECTING and self.filled):
+                return "create_booking", self.booking_arguments()
+            return None
+
+        # Without search results the model is better placed to find the restaurant
+        if "restaurant_id" in missing and not self.candidates:
+            return None
+        if self.phase == COLLECTING and (self.filled or self.intent or self.confirmed):
+            return "ask", missing
+        return None
+
+    def prompt_for(self, missing: List[str]) -> str:
+        """Ask the user for the missing booking details"""
+        known = []
+        if self.slots.get("party_size"):
+            known.append(f"for {self.slots['party_size']} people")
+        if self.slots.get("date"):
+            known.append(f"on {self.slots['date']}")
+        if self.slots.get("time"):
+            known.append(f"at {self.slots['time']}")
+        intro = f"Great! I have your booking {' '.join(known)}." if known else "I'd be happy to help you book a table!"
+
+        if missing == ["restaurant_id"]:
+            names = ", ".join(f"GoodFoods {name.title()}" for name in self.candidates)
+            return f"{intro} Which restaurant would you like: {names}?"
+        if len(missing) == 1:
+            label = SLOT_LABELS[missing[0]]
+            return f"{intro} I just need one more detail: {label[0].lower()}{label[1:]}."
+        steps = "\n".join(f"{i}. {SLOT_LABELS[slot]}" for i, slot in enumerate(missing, 1))
+        return f"{intro} Could you please provide:\n{steps}"
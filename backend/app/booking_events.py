@@ -0,0 +1,300 @@
+"""
+Booking event log for the GoodFoods AI Agent
+Every change to a booking appends a row to BookingEvent: created, modified,
+cancelled, seated or no_show, with the booking's state after the change and
+where it came from. Triggers reject updates and deletes, so the log is a
+complete audit trail. The transaction that appends an event also updates
+two views incrementally:
+  - SlotOccupancy: confirmed bookings and guests per restaurant and slot
+  - UserBookingStats: bookings, cancellations, visits and no-shows per user
+replay() rebuilds both from the log alone, and verify() checks the
+occupancy against the Booking table.
+
+Usage (from backend/):
+    python -m app.booking_events seed       # log bookings written before the log existed
+    python -m app.booking_events replay     # rebuild the views from the log and check them
+    python -m app.booking_events history GF000123
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .database import DatabaseManager
+
+EVENT_TYPES = ("created", "modified", "cancelled", "seated", "no_show")
+ATTENDANCE_EVENTS = ("seated", "no_show")
+# How early before its booking time a party can be recorded as seated
+SEATED_EARLY_MINUTES = float(os.getenv("SEATED_EARLY_MINUTES", "30"))
+
+# (restaurant_id, booking_time, num_guests, status) of a booking
+BookingState = Tuple[int, str, int, str]
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _add_occupancy(conn: sqlite3.Connection, restaurant_id: int, booking_time: str, guests: int, bookings: int):
+    conn.execute(
+        """
+        INSERT INTO SlotOccupancy (restaurant_id, booking_time, guests, bookings) VALUES (?, ?, ?, ?)
+        ON CONFLICT (restaurant_id, booking_time) DO UPDATE SET
+            guests = guests + excluded.guests, bookings = bookings + excluded.bookings
+        """,
+        [restaurant_id, booking_time, guests, bookings]
+    )
+    if bookings < 0:
+        conn.execute("DELETE FROM SlotOccupancy WHERE restaurant_id = ? AND booking_time = ? AND bookings <= 0",
+                     [restaurant_id, booking_time])
+
+
+def _add_user_stats(conn: sqlite3.Connection, user_id: int, event_type: str, status: str, booking_time: str):
+    created = event_type == "created"
+    conn.execute(
+        """
+        INSERT INTO UserBookingStats (user_id, bookings, cancelled, seated, no_shows, last_booking_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            bookings = bookings + excluded.bookings, cancelled = cancelled + excluded.cancelled,
+            seated = seated + excluded.seated, no_shows = no_shows + excluded.no_shows,
+            last_booking_time = MAX(last_booking_time, excluded.last_booking_time)
+        """,
+        [user_id, int(created), int(event_type == "cancelled" or (created and status == "cancelled")),
+         int(event_type == "seated"), int(event_type == "no_show"), booking_time if created else ""]
+    )
+
+
+def record(conn: sqlite3.Connection, booking_id: int, event_type: str, source: str,
+           previous: Optional[BookingState] = None):
+    """
+    Append an event for a booking just written in the caller's transaction, and
+    update the views. `previous` is the booking's state before the change
+    (None for a new booking); only the difference reaches SlotOccupancy.
+    """
+    restaurant_id, user_id, booking_time, num_guests, status = conn.execute(
+        "SELECT restaurant_id, user_id, booking_time, num_guests, status FROM Booking WHERE booking_id = ?",
+        [booking_id]
+    ).fetchone()
+    conn.execute(
+        """
+        INSERT INTO BookingEvent (booking_id, event_type, restaurant_id, user_id, booking_time, num_guests,
+                                  status, source, occurred_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [booking_id, event_type, restaurant_id, user_id, booking_time, num_guests, status, source, _now()]
+    )
+    current = (restaurant_id, booking_time, num_guests, status)
+    if previous != current:
+        if previous is not None and previous[3] == "confirmed":
+            _add_occupancy(conn, previous[0], previous[1], -previous[2], -1)
+        if status == "confirmed":
+            _add_occupancy(conn, restaurant_id, booking_time, num_guests, 1)
+    _add_user_stats(conn, user_id, event_type, status, booking_time)
+
+
+def record_snapshot(conn: sqlite3.Connection, where: str, params: List[Any], source: str) -> int:
+    """
+    Log the Booking rows matching `where` as created, as they are now, with
+    set-based statements: for bulk imports and bookings that predate the log.
+    Returns the number of events appended.
+    """
+    conn.execute(
+        f"""
+        INSERT INTO SlotOccupancy (restaurant_id, booking_time, guests, bookings)
+        SELECT restaurant_id, booking_time, SUM(num_guests), COUNT(*) FROM Booking
+        WHERE status = 'confirmed' AND ({where})
+        GROUP BY restaurant_id, booking_time
+        ON CONFLICT (restaurant_id, booking_time) DO UPDATE SET
+            guests = guests + excluded.guests, bookings = bookings + excluded.bookings
+        """,
+        params
+    )
+    conn.execute(
+        f"""
+        INSERT INTO UserBookingStats (user_id, bookings, cancelled, seated, no_shows, last_booking_time)
+        SELECT user_id, COUNT(*), SUM(status = 'cancelled'), 0, 0, MAX(booking_time) FROM Booking
+        WHERE {where}
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            bookings = bookings + excluded.bookings, cancelled = cancelled + excluded.cancelled,
+            last_booking_time = MAX(last_booking_time, excluded.last_booking_time)
+        """,
+        params
+    )
+    return conn.execute(
+        f"""
+        INSERT INTO BookingEvent (booking_id, event_type, restaurant_id, user_id, booking_time, num_guests,
+                                  status, source, occurred_at)
+        SELECT booking_id, 'created', restaurant_id, user_id, booking_time, num_guests, status, ?, ?
+        FROM Booking WHERE {where}
+        ORDER BY booking_id
+        """,
+        [source, _now()] + list(params)
+    ).rowcount
+
+
+def seed(conn: sqlite3.Connection) -> int:
+    """Log bookings written without events (before the log existed, or by setup scripts)"""
+    logged_until = conn.execute("SELECT COALESCE(MAX(booking_id), 0) FROM BookingEvent").fetchone()[0]
+    return record_snapshot(conn, "booking_id > ?", [logged_until], "seed")
+
+
+def replay(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Rebuild both views from the event log alone, inside the caller's transaction"""
+    conn.execute("DELETE FROM SlotOccupancy")
+    conn.execute("DELETE FROM UserBookingStats")
+    # Each booking's latest event holds its current state
+    conn.execute(
+        """
+        INSERT INTO SlotOccupancy (restaurant_id, booking_time, guests, bookings)
+        SELECT restaurant_id, booking_time, SUM(num_guests), COUNT(*) FROM BookingEvent
+        WHERE event_id IN (SELECT MAX(event_id) FROM BookingEvent GROUP BY booking_id) AND status = 'confirmed'
+        GROUP BY restaurant_id, booking_time
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO UserBookingStats (user_id, bookings, cancelled, seated, no_shows, last_booking_time)
+        SELECT user_id, SUM(event_type = 'created'),
+               SUM(event_type = 'cancelled' OR (event_type = 'created' AND status = 'cancelled')),
+               SUM(event_type = 'seated'), SUM(event_type = 'no_show'),
+               MAX(CASE WHEN event_type = 'created' THEN booking_time ELSE '' END)
+        FROM BookingEvent GROUP BY user_id
+        """
+    )
+    return {
+        "events": conn.execute("SELECT COUNT(*) FROM BookingEvent").fetchone()[0],
+        "slots": conn.execute("SELECT COUNT(*) FROM SlotOccupancy").fetchone()[0],
+        "users": conn.execute("SELECT COUNT(*) FROM UserBookingStats").fetchone()[0],
+    }
+
+
+def verify(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Differences between the log (and its views) and the Booking table; all zero when in sync"""
+    live = """
+        SELECT restaurant_id, booking_time, SUM(num_guests), COUNT(*) FROM Booking
+        WHERE status = 'confirmed' GROUP BY restaurant_id, booking_time
+    """
+    view = "SELECT restaurant_id, booking_time, guests, bookings FROM SlotOccupancy"
+    return {
+        "bookings_without_events": conn.execute(
+            "SELECT COUNT(*) FROM Booking b WHERE NOT EXISTS (SELECT 1 FROM BookingEvent e WHERE e.booking_id = b.booking_id)"
+        ).fetchone()[0],
+        "slots_missing_from_view": conn.execute(f"SELECT COUNT(*) FROM ({live} EXCEPT {view})").fetchone()[0],
+        "slots_only_in_view": conn.execute(f"SELECT COUNT(*) FROM ({view} EXCEPT {live})").fetchone()[0],
+    }
+
+
+def booking_history(booking_id: int) -> List[Dict[str, Any]]:
+    """Every event of one booking, oldest first"""
+    with DatabaseManager() as db:
+        rows = db.execute_query(
+            """
+            SELECT event_id, event_type, booking_time, num_guests, status, source, occurred_at
+            FROM BookingEvent WHERE booking_id = ? ORDER BY event_id
+            """,
+            [booking_id]
+        )
+    return [
+        dict(zip(("event_id", "event_type", "booking_time", "party_size", "status", "source", "occurred_at"), row))
+        for row in rows
+    ]
+
+
+def slot_occupancy(restaurant_id: int, date: str) -> List[Dict[str, Any]]:
+    """Confirmed bookings and guests per booked slot of one day, from the view"""
+    with DatabaseManager() as db:
+        rows = db.execute_query(
+            """
+            SELECT booking_time, bookings, guests FROM SlotOccupancy
+            WHERE restaurant_id = ? AND booking_time >= ? AND booking_time < ?
+            ORDER BY booking_time
+            """,
+            [restaurant_id, date, f"{date} 99"]
+        )
+    return [{"time": row[0].split()[1][:5], "bookings": row[1], "guests": row[2]} for row in rows]
+
+
+def user_stats(phone_number: str) -> Optional[Dict[str, Any]]:
+    """A guest's booking record, from the view"""
+    with DatabaseManager() as db:
+        rows = db.execute_query(
+            """
+            SELECT u.name, s.bookings, s.cancelled, s.seated, s.no_shows, s.last_booking_time
+            FROM User u JOIN UserBookingStats s ON s.user_id = u.user_id
+            WHERE u.phone_number = ?
+            """,
+            [phone_number]
+        )
+    if not rows:
+        return None
+    return dict(zip(("user_name", "bookings", "cancelled", "seated", "no_shows", "last_booking_time"), rows[0]))
+
+
+def record_attendance(booking_id: int, outcome: str) -> Dict[str, Any]:
+    """
+    Log that a confirmed booking's party was seated or didn't show up, once per
+    booking. Attendance lives only in the log: the Booking row stays
+    confirmed, so it keeps holding its seats.
+    """
+    if outcome not in ATTENDANCE_EVENTS:
+        return {"success": False, "error": f"outcome must be one of: {', '.join(ATTENDANCE_EVENTS)}"}
+    with DatabaseManager() as db, db.transaction() as conn:
+        booking = conn.execute(
+            "SELECT restaurant_id, booking_time, num_guests, status FROM Booking WHERE booking_id = ?", [booking_id]
+        ).fetchone()
+        if booking is None or booking[3] != "confirmed":
+            return {"success": False, "error": "Booking not found or not confirmed"}
+        now = datetime.now()
+        booking_time = datetime.fromisoformat(str(booking[1]))
+        if outcome == "no_show" and booking_time > now:
+            return {"success": False, "error": "The booking time hasn't come yet"}
+        if outcome == "seated" and booking_time - timedelta(minutes=SEATED_EARLY_MINUTES) > now:
+            return {"success": False, "error": f"Parties can be seated at most {SEATED_EARLY_MINUTES:g} minutes early"}
+        recorded = conn.execute(
+            f"SELECT event_type FROM BookingEvent WHERE booking_id = ? AND event_type IN {ATTENDANCE_EVENTS}",
+            [booking_id]
+        ).fetchone()
+        if recorded:
+            return {"success": False, "error": f"Already recorded as {recorded[0]}"}
+        record(conn, booking_id, outcome, "admin", previous=tuple(booking))
+    return {"success": True, "booking_id": f"GF{booking_id:06d}", "event_type": outcome}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking event log maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("seed", help="Log bookings that have no events yet")
+    commands.add_parser("replay", help="Rebuild SlotOccupancy and UserBookingStats from the log, then verify")
+    commands.add_parser("verify", help="Compare the views with the Booking table")
+    history = commands.add_parser("history", help="Print one booking's events")
+    history.add_argument("booking_id")
+    args = parser.parse_args()
+
+    if args.command == "history":
+        from .tool_registry import ToolValidationError, tool_registry
+        try:
+            reference = tool_registry.validate("get_booking_details", {"booking_id": args.booking_id})["booking_id"]
+        except ToolValidationError as e:
+            parser.error(str(e))
+        for event in booking_history(int(reference[2:])):
+            print(json.dumps(event))
+        return
+    # Creates the log's tables on a database that predates them, and logs its bookings
+    import setup_database
+    from . import database
+    seeded = setup_database.migrate(database.DB_PATH)
+    with DatabaseManager() as db, db.transaction() as conn:
+        if args.command == "seed":
+            print(f"Logged {seeded:,} bookings")
+        elif args.command == "replay":
+            print(f"Replayed: {replay(conn)}")
+        print(f"Verify: {verify(conn)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Bulk booking import and export for the GoodFoods AI Agent
+Imports stream CSV or JSONL bookings in batches: each batch is checked
+(restaurant exists, slot capacity) with a few set-based queries and written
+with executemany inside one transaction. Exports walk the Booking table with
+a server-side cursor, so neither side holds more than a batch in memory.
+
+Usage (from backend/):
+    python -m app.bulk import bookings.csv
+    python -m app.bulk export --format jsonl --restaurant-id 3 > bookings.jsonl
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+from datetime import date as date_type, timedelta
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import booking_events, database
+from .database import DatabaseManager
+from .tool_functions import invalidate_availability
+from .tool_registry import ToolValidationError, compile_parameter, parse_date, parse_time, tool_registry
+
+BULK_FORMATS = ("csv", "jsonl")
+BOOKING_STATUSES = ("confirmed", "cancelled")
+
+# Export columns; an export file can be imported again as is (booking_id is
+# informational, imported bookings get new ids)
+EXPORT_FIELDS = ["booking_id", "restaurant_id", "user_name", "phone_number", "date", "time",
+                 "party_size", "status", "special_requests"]
+REQUIRED_FIELDS = ["restaurant_id", "user_name", "phone_number", "date", "time", "party_size"]
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "5000"))
+MAX_REPORTED_ERRORS = 100
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_CLOCK_TIME = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+def format_from_name(filename: str) -> str:
+    """'bookings.jsonl' -> 'jsonl'; anything else is read as CSV"""
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_records(stream: IO[str], format: str) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """(line number, record) for each row of a CSV (with header) or JSONL stream; unreadable rows give None"""
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif format == "jsonl":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+    else:
+        raise ValueError(f"format must be one of: {', '.join(BULK_FORMATS)}")
+
+
+class BookingImporter:
+    """
+    Imports booking records batch by batch. A batch is all-or-nothing at the
+    database level, but rows are validated individually: invalid rows, rows
+    for unknown restaurants and confirmed rows that would overbook their slot
+    are rejected and reported, the rest of the batch is written.
+    """
+
+    def __init__(self, batch_size: int = BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+        # Same coercion as create_booking, except that past dates are accepted (historical data)
+        # and party sizes are only bounded by the restaurant's capacity, checked per batch
+        self._coercers = dict(tool_registry.tools["create_booking"].coercers)
+        self._coercers["party_size"] = compile_parameter("party_size", {"type": "integer", "minimum": 1}, "bulk_import")
+        self.stats = {"read": 0, "imported": 0, "rejected": 0, "batches": 0, "errors": []}
+
+    def _reject(self, line: int, error: str):
+        self.stats["rejected"] += 1
+        if len(self.stats["errors"]) < MAX_REPORTED_ERRORS:
+            self.stats["errors"].append({"line": line, "error": error})
+
+    def _normalize(self, line: int, record: Optional[Dict]) -> Optional[tuple]:
+        """A row ready for insertion, or None (and a rejection) if the record is invalid"""
+        if not isinstance(record, dict):
+            self._reject(line, "Unreadable record")
+            return None
+        status = str(record.get("status") or "confirmed").strip().lower()
+        if status not in BOOKING_STATUSES:
+            self._reject(line, f"Unknown status '{status}'")
+            return None
+        missing = [name for name in REQUIRED_FIELDS if record.get(name) in (None, "")]
+        if missing:
+            self._reject(line, f"Missing {', '.join(missing)}")
+            return None
+        coerce = self._coercers
+        try:
+            # Exports and most feeds are already normalized; skip the general parsers for them
+            day = str(record["date"]).strip()
+            day = date_type.fromisoformat(day).isoformat() if _ISO_DATE.match(day) else parse_date(day)
+            clock = str(record["time"]).strip()
+            clock = clock if _CLOCK_TIME.match(clock) else parse_time(clock)
+            special_requests = record.get("special_requests")
+            return (line, coerce["restaurant_id"](record["restaurant_id"]), coerce["user_name"](record["user_name"]),
+                    coerce["phone_number"](record["phone_number"]), f"{day} {clock}:00",
+                    coerce["party_size"](record["party_size"]), status,
+                    coerce["special_requests"](special_requests) if special_requests else None)
+        except (ToolValidationError, ValueError) as e:
+            self._reject(line, str(e))
+            return None
+
+    def run(self, records: Iterable[Tuple[int, Optional[Dict]]]) -> Dict:
+        batch: List[tuple] = []
+        for line, record in records:
+            self.stats["read"] += 1
+            row = self._normalize(line, record)
+            if row is not None:
+                batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        return self.stats
+
+    def _flush(self, batch: List[tuple]):
+        accepted = []
+        with DatabaseManager() as db, db.transaction() as conn:
+            # The batch's slots, so capacity and existing bookings come from two joins
+            conn.execute("CREATE TEMP TABLE import_slot (restaurant_id INTEGER, booking_time TEXT, "
+                         "PRIMARY KEY (restaurant_id, booking_time))")
+            conn.executemany("INSERT OR IGNORE INTO import_slot VALUES (?, ?)", [(row[1], row[4]) for row in batch])
+            capacity = dict(conn.execute(
+                """
+                SELECT r.restaurant_id, COALESCE(SUM(t.capacity), 0)
+                FROM Restaurant r LEFT JOIN RestaurantTable t ON t.restaurant_id = r.restaurant_id
+                WHERE r.restaurant_id IN (SELECT DISTINCT restaurant_id FROM import_slot)
+                GROUP BY r.restaurant_id
+                """
+            ))
+            booked = {
+                (restaurant_id, booking_time): guests
+                for restaurant_id, booking_time, guests in conn.execute(
+                    """
+                    SELECT s.restaurant_id, s.booking_time, SUM(b.num_guests)
+                    FROM import_slot s JOIN Booking b
+                      ON b.restaurant_id = s.restaurant_id AND b.booking_time = s.booking_time
+                    WHERE b.status = 'confirmed'
+                    GROUP BY s.restaurant_id, s.booking_time
+                    """
+                )
+            }
+
+            for line, restaurant_id, user_name, phone_number, booking_time, party_size, status, special_requests in batch:
+                if restaurant_id not in capacity:
+                    self._reject(line, f"Restaurant {restaurant_id} not found")
+                    continue
+                if status == "confirmed":
+                    slot = (restaurant_id, booking_time)
+                    seats_left = capacity[restaurant_id] - booked.get(slot, 0)
+                    if party_size > seats_left:
+                        self._reject(line, f"Only {max(seats_left, 0)} seats left at {booking_time[:16]}")
+                        continue
+                    booked[slot] = booked.get(slot, 0) + party_size
+                accepted.append((restaurant_id, user_name, phone_number, booking_time, party_size, status, special_requests))
+
+            conn.executemany(
+                "INSERT OR IGNORE INTO User (name, phone_number) VALUES (?, ?)",
+                [(row[1], row[2]) for row in accepted]
+            )
+            logged_until = conn.execute("SELECT COALESCE(MAX(booking_id), 0) FROM Booking").fetchone()[0]
+            conn.executemany(
+                """
+                INSERT INTO Booking (restaurant_id, user_id, booking_time, num_guests, status, special_requests)
+                VALUES (?, (SELECT user_id FROM User WHERE phone_number = ?), ?, ?, ?, ?)
+                """,
+                [(row[0], row[2], row[3], row[4], row[5], row[6]) for row in accepted]
+            )
+            booking_events.record_snapshot(conn, "booking_id > ?", [logged_until], "bulk_import")
+
+        self.stats["batches"] += 1
+        self.stats["imported"] += len(accepted)
+        for restaurant_id, day in {(row[0], row[3][:10]) for row in accepted}:
+            invalidate_availability(restaurant_id, day)
+
+
+def import_bookings(stream: IO[str], format: str, batch_size: int = BULK_BATCH_SIZE) -> Dict:
+    """Import a CSV or JSONL text stream; returns counts and the first rejected rows"""
+    if format not in BULK_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(BULK_FORMATS)}")
+    return BookingImporter(batch_size).run(read_records(stream, format))
+
+
+def export_bookings(format: str, restaurant_id: Optional[int] = None, start_date: Optional[str] = None,
+                    end_date: Optional[str] = None, batch_size: int = BULK_BATCH_SIZE) -> Iterator[str]:
+    """
+    Bookings as CSV (with header) or JSONL text, in booking order, yielded in
+    chunks of `batch_size` rows. Dates are inclusive YYYY-MM-DD bounds.
+    """
+    if format not in BULK_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(BULK_FORMATS)}")
+
+    conditions, params = [], []
+    if restaurant_id is not None:
+        conditions.append("b.restaurant_id = ?")
+        params.append(restaurant_id)
+    if start_date:
+        conditions.append("b.booking_time >= ?")
+        params.append(f"{date_type.fromisoformat(start_date)} 00:00:00")
+    if end_date:
+        conditions.append("b.booking_time < ?")
+        params.append(f"{date_type.fromisoformat(end_date) + timedelta(days=1)} 00:00:00")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = DatabaseManager().iterate(
+        f"""
+        SELECT b.booking_id, b.restaurant_id, u.name, u.phone_number, b.booking_time,
+               b.num_guests, b.status, b.special_requests
+        FROM Booking b JOIN User u ON u.user_id = b.user_id
+        {where}
+        ORDER BY b.booking_id
+        """,
+        params,
+        batch_size=batch_size
+    )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if format == "csv":
+        writer.writerow(EXPORT_FIELDS)
+    pending = 0
+    for booking_id, restaurant, user_name, phone_number, booking_time, guests, status, special_requests in rows:
+        values = [f"GF{booking_id:06d}", restaurant, user_name, phone_number, booking_time[:10],
+                  booking_time[11:16], guests, status, special_requests]
+        if format == "csv":
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values))) + "\n")
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import and export of GoodFoods bookings")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Import bookings from a CSV or JSONL file ('-' for stdin)")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=BULK_FORMATS, help="Default: from the file extension")
+    import_parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+
+    export_parser = commands.add_parser("export", help="Export bookings as CSV or JSONL")
+    export_parser.add_argument("--format", choices=BULK_FORMATS, default="csv")
+    export_parser.add_argument("--output", "-o", help="Default: stdout")
+    export_parser.add_argument("--restaurant-id", type=int)
+    export_parser.add_argument("--start-date")
+    export_parser.add_argument("--end-date")
+    export_parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        # A database from before the booking event log gets its tables first
+        import setup_database
+        setup_database.migrate(database.DB_PATH)
+        format = args.format or format_from_name(args.file)
+        if args.file == "-":
+            stats = import_bookings(sys.stdin, format, args.batch_size)
+        else:
+            with open(args.file, newline="", encoding="utf-8") as stream:
+                stats = import_bookings(stream, format, args.batch_size)
+        print(f"Read {stats['read']} rows: {stats['imported']} imported, {stats['rejected']} rejected "
+              f"({stats['batches']} batches)", file=sys.stderr)
+        for error in stats["errors"]:
+            print(f"  line {error['line']}: {error['error']}", file=sys.stderr)
+    else:
+        output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for chunk in export_bookings(args.format, args.restaurant_id, args.start_date,
+                                         args.end_date, args.batch_size):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Request coalescing and short-lived result caching for GoodFoods tools
+Concurrent identical lookups share one computation (single-flight), and the
+result is kept for a few seconds unless a write invalidates its group.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """An in-flight computation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class CoalescingCache:
+    """
+    Single-flight cache keyed by request, with invalidation by group.
+
+    Each entry belongs to a group (e.g. restaurant + date). Invalidating a
+    group drops its cached entries and bumps its generation, so results of
+    computations that started before the invalidation are never stored.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, _Call] = {}
+        self._generations: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key: Hashable, group: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached result for key, joining or starting its computation if needed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._in_flight[key] = call
+                generation = self._generations.get(group, 0)
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if call.error is None and self.ttl > 0 and self._generations.get(group, 0) == generation:
+                    self._entries[key] = (call.result, time.monotonic() + self.ttl)
+                    if len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            call.done.set()
+
+        return call.result
+
+    def invalidate(self, group: Hashable, group_of: Callable[[Hashable], Hashable]):
+        """Drop every cached entry whose key maps to `group`"""
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            stale = [key for key in self._entries if group_of(key) == group]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,215 @@
+"""
+WebSocket chat transport for the GoodFoods AI Agent
+One connection holds one conversation session for its lifetime. Turns stream
+their tool events and reply text as they are produced, over the protocol:
+
+  client -> server
+    {"type": "message", "id": "1", "message": "...", "version": 3?, "conversation_history": [...]?}
+    {"type": "reset"}                   start a new conversation
+    {"type": "ping"} / {"type": "pong"}
+
+  server -> client
+    {"type": "session", "session_id": "...", "version": 0}
+    {"type": "start", "id": "1"}
+    {"type": "tool_call", "id": "1", "name": "...", "arguments": {...}}
+    {"type": "tool_result", "id": "1", "name": "...", "ok": true}
+    {"type": "delta", "id": "1", "text": "..."}
+    {"type": "done", "id": "1", "response": "...", "version": 4}    the complete reply
+    {"type": "error", "id": "1", "code": "busy|rate_limited|conflict|invalid|internal", "detail": "..."}
+    {"type": "ping"} / {"type": "pong"}
+
+Backpressure: at most WS_MAX_PENDING messages wait behind the running turn
+(more are answered with a "busy" error), and outgoing events go through a
+bounded buffer, so a client that stops reading stalls its own turn rather
+than growing server memory. Heartbeat pings go out every WS_HEARTBEAT_SECONDS;
+a connection silent for WS_IDLE_TIMEOUT_SECONDS is closed.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from .rate_limit import AdmissionController, client_address
+from .sessions import ChatSession, SessionStore, VersionConflict
+
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "20"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "120"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "4"))
+WS_SEND_BUFFER = int(os.getenv("WS_SEND_BUFFER", "64"))
+
+# WebSocket turns share the /chat admission limits
+ADMISSION_ROUTE = "/chat"
+
+
+class ChatConnection:
+    """Serves one /ws/chat connection"""
+
+    def __init__(self, websocket: WebSocket, sessions: SessionStore, admission: AdmissionController):
+        self.websocket = websocket
+        self.sessions = sessions
+        self.admission = admission
+        self.session: Optional[ChatSession] = None
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PENDING)
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_BUFFER)
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Turns are rate limited per caller address: a reset (new session) or a
+        # new connection doesn't start a fresh bucket
+        peer = websocket.client.host if websocket.client else None
+        self.client_key = f"ip:{client_address(peer, websocket.headers.get('x-forwarded-for'))}"
+
+    async def run(self, session_id: Optional[str] = None):
+        await self.websocket.accept()
+        self.loop = asyncio.get_running_loop()
+        # The shared session store reads and writes the database: keep it off the event loop
+        self.session = (await run_in_threadpool(self.sessions.get, session_id) if session_id else None) \
+            or await run_in_threadpool(self.sessions.create)
+
+        sender = asyncio.create_task(self._send_loop())
+        tasks = [asyncio.create_task(self._read_loop()), asyncio.create_task(self._work_loop()),
+                 asyncio.create_task(self._heartbeat_loop())]
+        await self.send({"type": "session", "session_id": self.session.session_id, "version": self.session.version})
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.closed = True
+            for task in tasks:
+                task.cancel()
+            # Let queued events go out, then stop the sender; a turn still running
+            # in its thread drops the rest of its events
+            try:
+                await asyncio.wait_for(self.outbox.join(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+            sender.cancel()
+            while not self.outbox.empty():
+                self.outbox.get_nowait()
+                self.outbox.task_done()
+            await asyncio.gather(sender, *tasks, return_exceptions=True)
+
+    async def send(self, event: Dict[str, Any]):
+        """Queue an event for the client, waiting while the send buffer is full"""
+        if not self.closed:
+            await self.outbox.put(event)
+
+    def _send_from_thread(self, event: Dict[str, Any]):
+        """send() for the agent's worker thread: blocks it while the buffer is full"""
+        if not self.closed:
+            asyncio.run_coroutine_threadsafe(self.send(event), self.loop).result()
+
+    async def _send_loop(self):
+        while True:
+            event = await self.outbox.get()
+            try:
+                await self.websocket.send_text(json.dumps(event))
+            except Exception:
+                # The client went away; the reader notices and ends the connection
+                self.closed = True
+            finally:
+                self.outbox.task_done()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                self.last_seen = time.monotonic()
+                try:
+                    data = json.loads(text)
+                    kind = data.get("type")
+                except (ValueError, AttributeError):
+                    await self.send({"type": "error", "code": "invalid", "detail": "Messages must be JSON objects"})
+                    continue
+
+                if kind == "ping":
+                    await self.send({"type": "pong"})
+                elif kind == "pong":
+                    continue
+                elif kind in ("message", "reset"):
+                    if kind == "message" and not str(data.get("message") or "").strip():
+                        await self.send({"type": "error", "id": data.get("id"), "code": "invalid",
+                                         "detail": "The message is empty"})
+                        continue
+                    try:
+                        self.inbox.put_nowait(data)
+                    except asyncio.QueueFull:
+                        await self.send({"type": "error", "id": data.get("id"), "code": "busy",
+                                         "detail": "Too many messages waiting. Please wait for a reply."})
+                else:
+                    await self.send({"type": "error", "code": "invalid", "detail": f"Unknown message type '{kind}'"})
+        except WebSocketDisconnect:
+            return
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_SECONDS)
+            if time.monotonic() - self.last_seen > WS_IDLE_TIMEOUT_SECONDS:
+                await self.websocket.close(code=1001, reason="Idle timeout")
+                return
+            await self.send({"type": "ping"})
+
+    async def _work_loop(self):
+        while True:
+            data = await self.inbox.get()
+            if data["type"] == "reset":
+                await run_in_threadpool(self.sessions.delete, self.session.session_id)
+                self.session = await run_in_threadpool(self.sessions.create)
+                await self.send({"type": "session", "session_id": self.session.session_id, "version": 0})
+                continue
+
+            message_id = data.get("id")
+            allowed, retry_after = self.admission.check_rate(ADMISSION_ROUTE, self.client_key)
+            if not allowed:
+                await self.send({"type": "error", "id": message_id, "code": "rate_limited",
+                                 "detail": "Rate limit exceeded. Please slow down.", "retry_after": round(retry_after, 1)})
+                continue
+            limiter = self.admission.concurrency(ADMISSION_ROUTE)
+            if not await limiter.acquire():
+                await self.send({"type": "error", "id": message_id, "code": "busy",
+                                 "detail": "Server is busy. Please retry shortly."})
+                continue
+            try:
+                await self._turn(message_id, data)
+            finally:
+                limiter.release()
+
+    async def _turn(self, message_id: Any, data: Dict[str, Any]):
+        # Keep the session at the front of the store while the connection uses it
+        await run_in_threadpool(self.sessions.get, self.session.session_id)
+        streamed = []
+
+        def on_event(event: str, payload: Dict[str, Any]):
+            if event == "tool_call":
+                self._send_from_thread({"type": "tool_call", "id": message_id, **payload})
+            elif event == "tool_result":
+                self._send_from_thread({"type": "tool_result", "id": message_id,
+                                        "name": payload["name"], "ok": payload["ok"]})
+                # Tool results make up the reply; stream each one as it is ready
+                self._send_from_thread({"type": "delta", "id": message_id,
+                                        "text": ("\n\n" if streamed else "") + payload["text"]})
+                streamed.append(payload["text"])
+
+        await self.send({"type": "start", "id": message_id})
+        try:
+            response = await run_in_threadpool(
+                self.session.run_turn, data["message"], data.get("version"),
+                data.get("conversation_history"), on_event
+            )
+        except VersionConflict as e:
+            await self.send({"type": "error", "id": message_id, "code": "conflict", "version": e.version,
+                             "detail": "Conversation is out of sync. Resend with conversation_history."})
+            return
+        except Exception as e:
+            # A failed turn is reported like the HTTP path's 500; the connection stays open for the next message
+            print(f"Error in WebSocket turn {message_id!r} of session {self.session.session_id}: {e!r}")
+            await self.send({"type": "error", "id": message_id, "code": "internal",
+                             "detail": f"Error processing chat request: {str(e)}"})
+            return
+        if not streamed:
+            await self.send({"type": "delta", "id": message_id, "text": response})
+        await self.send({"type": "done", "id": message_id, "response": response, "version": self.session.version})
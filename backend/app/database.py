@@ -5,12 +5,168 @@ Handles all database operations using SQLite for local development
 
 import asyncio
 import os
-from typing import List, Dict, Any, Optional
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional
 
 # Conditional import for Prisma (only for production)
 PRISMA_AVAILABLE = False  # Disabled for deployment
 # Note: Prisma import removed for deployment - using SQLite only
 
+# SQLite database file: DATABASE_PATH, or backend/goodfoods.db. Several workers
+# (or containers on one host) can share the file from a volume; it runs in WAL mode.
+DB_PATH = os.getenv("DATABASE_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "goodfoods.db")
+
+# How long a connection waits for another process's write lock before failing
+DB_BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_BUSY_TIMEOUT_SECONDS", "10"))
+
+# Literals stripped out when grouping statements by their normalized text
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse a SQL statement to a stable key (literals and IN-lists replaced by ?)"""
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(?, ...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryProfiler:
+    """
+    Records per-statement latency, rows returned and errors, aggregated by
+    normalized SQL text. Statements slower than the threshold also get their
+    EXPLAIN QUERY PLAN captured so the offending scans can be identified.
+    """
+
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 50.0, sample_size: int = 256):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.sample_size = sample_size
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn: sqlite3.Connection, query: str, params: Optional[List[Any]],
+               elapsed_ms: float, rows: int, error: Optional[Exception] = None):
+        """Record one execution of a statement"""
+        key = normalize_sql(query)
+        is_slow = elapsed_ms >= self.slow_query_ms
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = {
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "errors": 0,
+                    "slow_calls": 0,
+                    "last_error": None,
+                    "query_plan": None,
+                    "samples": deque(maxlen=self.sample_size),
+                }
+                self._stats[key] = stats
+
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += rows
+            stats["samples"].append(elapsed_ms)
+            if error is not None:
+                stats["errors"] += 1
+                stats["last_error"] = str(error)
+            if is_slow:
+                stats["slow_calls"] += 1
+            needs_plan = is_slow and error is None and stats["query_plan"] is None
+
+        # Capture the plan outside the lock, on the connection that ran the query
+        if needs_plan:
+            plan = self._explain(conn, query, params)
+            with self._lock:
+                stats["query_plan"] = plan
+
+    def _explain(self, conn: sqlite3.Connection, query: str, params: Optional[List[Any]]) -> List[str]:
+        try:
+            # Through a cursor, so a profiled connection doesn't record the EXPLAIN itself
+            cursor = conn.cursor().execute(f"EXPLAIN QUERY PLAN {query}", params or [])
+            return [row[-1] for row in cursor.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN QUERY PLAN failed: {e}"]
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Aggregated statistics, statements with the highest total time first"""
+        with self._lock:
+            report = []
+            for query, stats in self._stats.items():
+                samples = sorted(stats["samples"])
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0
+                report.append({
+                    "query": query,
+                    "calls": stats["calls"],
+                    "total_ms": round(stats["total_ms"], 3),
+                    "mean_ms": round(stats["total_ms"] / stats["calls"], 3),
+                    "p95_ms": round(p95, 3),
+                    "max_ms": round(stats["max_ms"], 3),
+                    "rows": stats["rows"],
+                    "errors": stats["errors"],
+                    "last_error": stats["last_error"],
+                    "slow_calls": stats["slow_calls"],
+                    "query_plan": stats["query_plan"],
+                })
+
+        report.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return report[:limit] if limit else report
+
+    def reset(self):
+        """Drop all collected statistics"""
+        with self._lock:
+            self._stats.clear()
+
+
+# Shared profiler; enable with DB_PROFILING=true
+profiler = QueryProfiler(
+    enabled=os.getenv("DB_PROFILING", "false").lower() == "true",
+    slow_query_ms=float(os.getenv("DB_SLOW_QUERY_MS", "50")),
+)
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    Connection that records each execute/executemany with the profiler, for
+    transactions. Rows are those written (reads inside a transaction count 0).
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            cursor = super().execute(sql, parameters)
+        except Exception as e:
+            profiler.record(self, sql, parameters, (time.perf_counter() - start) * 1000, 0, error=e)
+            raise
+        profiler.record(self, sql, parameters, (time.perf_counter() - start) * 1000, max(cursor.rowcount, 0))
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        rows = list(seq_of_parameters)
+        # One row's parameters are enough for the query plan
+        sample = rows[0] if rows else None
+        start = time.perf_counter()
+        try:
+            cursor = super().executemany(sql, rows)
+        except Exception as e:
+            profiler.record(self, sql, sample, (time.perf_counter() - start) * 1000, 0, error=e)
+            raise
+        profiler.record(self, sql, sample, (time.perf_counter() - start) * 1000, max(cursor.rowcount, 0))
+        return cursor
+
+
 class DatabaseManager:
     def __init__(self):
         self._connection_string = os.getenv("DATABASE_URL", "sqlite:///./goodfoods.db")
@@ -26,19 +182,20 @@ class DatabaseManager:
         # No cleanup needed for SQLite
         pass
     
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        """Open a connection to the SQLite database"""
+        return sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_SECONDS, **kwargs)
+    
     def execute_query(self, query: str, params: List[Any] = None) -> List[tuple]:
         """
         Execute a raw SQL query and return results
         For development, we'll use a simple SQLite approach
         """
+        conn = None
+        start = time.perf_counter()
         try:
-            import sqlite3
-            import os
-            
-            # Create database connection with absolute path
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            db_path = os.path.join(current_dir, "..", "goodfoods.db")
-            conn = sqlite3.connect(db_path)
+            # Create database connection
+            conn = self._connect()
             cursor = conn.cursor()
             
             # Execute query
@@ -54,33 +211,69 @@ class DatabaseManager:
             if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
                 conn.commit()
             
-            conn.close()
+            if profiler.enabled:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                profiler.record(conn, query, params, elapsed_ms, len(results))
+            
             return results
             
         except Exception as e:
             print(f"Database query error: {e}")
+            if profiler.enabled:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                profiler.record(conn, query, params, elapsed_ms, 0, error=e)
             return []
+        
+        finally:
+            if conn is not None:
+                conn.close()
     
-    def get_last_insert_id(self) -> int:
-        """Get the last inserted row ID"""
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        A connection holding the write lock for a batch of statements:
+        committed when the block exits, rolled back if it raises. Unlike
+        execute_query, errors propagate to the caller. Its statements are
+        profiled like execute_query's when profiling is enabled.
+        """
+        conn = self._connect(factory=ProfiledConnection if profiler.enabled else sqlite3.Connection)
         try:
-            import sqlite3
-            import os
-            
-            # Create database connection with absolute path
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            db_path = os.path.join(current_dir, "..", "goodfoods.db")
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT last_insert_rowid()")
-            result = cursor.fetchone()
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
             conn.close()
-            
-            return result[0] if result else 0
-            
+
+    def iterate(self, query: str, params: List[Any] = None, batch_size: int = 1000) -> Iterator[tuple]:
+        """
+        Yield the rows of a query as SQLite steps through them, fetching
+        `batch_size` at a time, so result sets of any size use constant memory.
+        The generator may be consumed from another thread (e.g. a streaming
+        response); the connection closes when it is exhausted or closed.
+        The profiler records the whole walk, from the query to the last row.
+        """
+        conn = self._connect(check_same_thread=False)
+        start = time.perf_counter()
+        count = 0
+        error = None
+        try:
+            cursor = conn.execute(query, params or [])
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
         except Exception as e:
-            print(f"Error getting last insert ID: {e}")
-            return 0
+            error = e
+            raise
+        finally:
+            if profiler.enabled:
+                profiler.record(conn, query, params, (time.perf_counter() - start) * 1000, count, error=error)
+            conn.close()
 
     # Prisma-based methods (commented out for deployment - using SQLite only)
     # These methods are not used in the current deployment
@@ -1,132 +1,341 @@
-import random
+"""
+Synthetic data generator for the GoodFoods AI Agent
+Fills the database with restaurants, tables, users and bookings at
+performance-testing scale (100k restaurants, 2M tables, 50M bookings).
+Columns are drawn with NumPy a batch at a time and written with executemany,
+one transaction per batch; the Booking indexes are rebuilt once at the end.
+Bookings follow the configured distributions but are not checked against
+capacity (use app.bulk for validated imports).
+
+Usage (from backend/):
+    python -m app.generate_data --restaurants 100000 --bookings 50000000
+    python -m app.generate_data --bookings 1000000 --peak-hours 12:30-14:00,19:00-21:30 \\
+        --party-sizes 2:45,4:30,6:10 --cancellation-rate 0.15
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date as date_type, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
 from faker import Faker
-from database import DatabaseManager
-
-def generate_synthetic_data():
-    """Generate realistic synthetic data for GoodFoods restaurants."""
-    
-    # Initialize Faker with Indian locale
-    fake = Faker(['en_IN'])
-    
-    # Initialize database
-    db = DatabaseManager()
-    
-    # Indian cities and areas for restaurant locations
-    cities = [
-        "Bangalore", "Mumbai", "Delhi", "Chennai", "Hyderabad", "Pune", "Kolkata", "Ahmedabad"
-    ]
-    
-    areas = {
-        "Bangalore": ["Koramangala", "Indiranagar", "Jayanagar", "Whitefield", "Marathahalli", "Electronic City"],
-        "Mumbai": ["Bandra", "Andheri", "Juhu", "Worli", "Colaba", "Powai"],
-        "Delhi": ["Connaught Place", "Hauz Khas", "Dwarka", "Gurgaon", "Noida", "Greater Noida"],
-        "Chennai": ["T Nagar", "Anna Nagar", "Adyar", "OMR", "Porur", "Velachery"],
-        "Hyderabad": ["Banjara Hills", "Jubilee Hills", "Gachibowli", "Hitech City", "Secunderabad"],
-        "Pune": ["Koregaon Park", "Viman Nagar", "Kharadi", "Hinjewadi", "Wakad"],
-        "Kolkata": ["Park Street", "Salt Lake", "New Town", "Howrah", "Dum Dum"],
-        "Ahmedabad": ["Satellite", "Vastrapur", "Navrangpura", "Paldi", "Bodakdev"]
-    }
-    
-    # Cuisine types for Indian restaurants
-    cuisines = [
-        "North Indian", "South Indian", "Chinese", "Italian", "Continental", 
-        "Mexican", "Thai", "Japanese", "Mediterranean", "Fusion", "Street Food",
-        "Biryani", "Kebabs", "Seafood", "Vegetarian", "Multi-cuisine"
-    ]
-    
-    # Opening hours templates
-    opening_hours_templates = [
-        {"Mon-Fri": "12:00-23:00", "Sat-Sun": "11:00-23:30"},
-        {"Mon-Sun": "11:30-22:30"},
-        {"Mon-Fri": "11:00-22:00", "Sat-Sun": "10:30-23:00"},
-        {"Mon-Thu": "12:00-22:00", "Fri-Sun": "12:00-23:00"},
-        {"Mon-Sun": "12:00-23:00"}
-    ]
-    
-    print("Generating synthetic restaurant data...")
-    
-    # Generate 50-100 restaurants
-    num_restaurants = random.randint(50, 100)
-    
-    for i in range(num_restaurants):
-        # Select random city and area
-        city = random.choice(cities)
-        area = random.choice(areas[city])
-        
-        # Generate restaurant name
-        restaurant_name = f"GoodFoods {area}"
-        
-        # Generate address
-        street_address = fake.street_address()
-        address = f"{street_address}, {area}, {city}"
-        
-        # Generate coordinates (simplified - in real app would use geocoding)
-        latitude = 12.9716 + random.uniform(-0.1, 0.1)  # Bangalore center + variation
-        longitude = 77.5946 + random.uniform(-0.1, 0.1)
-        
-        # Select cuisine
-        cuisine = random.choice(cuisines)
-        
-        # Select opening hours
-        opening_hours = random.choice(opening_hours_templates)
-        
-        # Add restaurant to database
-        restaurant_id = db.add_restaurant(
-            name=restaurant_name,
-            address=address,
-            latitude=latitude,
-            longitude=longitude,
-            cuisine_type=cuisine,
-            opening_hours=opening_hours
-        )
-        
-        # Add tables to restaurant
-        # Generate random number of tables with varying capacities
-        num_tables = random.randint(8, 25)
-        table_capacities = []
-        
-        for _ in range(num_tables):
-            # 60% 2-4 seaters, 30% 6-8 seaters, 10% large tables
-            capacity_choice = random.random()
-            if capacity_choice < 0.6:
-                capacity = random.choice([2, 3, 4])
-            elif capacity_choice < 0.9:
-                capacity = random.choice([6, 8])
-            else:
-                capacity = random.choice([10, 12, 15])
-            table_capacities.append(capacity)
-        
-        db.add_tables_to_restaurant(restaurant_id, table_capacities)
-        
-        if (i + 1) % 10 == 0:
-            print(f"Generated {i + 1} restaurants...")
-    
-    print(f"Successfully generated {num_restaurants} restaurants with tables!")
-    
-    # Generate some sample users
-    print("Generating sample users...")
-    sample_users = [
-        ("Rahul Sharma", "+91-98765-43210"),
-        ("Priya Patel", "+91-87654-32109"),
-        ("Amit Kumar", "+91-76543-21098"),
-        ("Sneha Reddy", "+91-65432-10987"),
-        ("Vikram Singh", "+91-54321-09876"),
-        ("Anjali Desai", "+91-43210-98765"),
-        ("Rajesh Khanna", "+91-32109-87654"),
-        ("Meera Iyer", "+91-21098-76543"),
-        ("Suresh Menon", "+91-10987-65432"),
-        ("Kavita Gupta", "+91-09876-54321")
-    ]
-    
-    for name, phone in sample_users:
-        try:
-            db.add_user(name, phone)
-        except:
-            # Skip if user already exists (due to unique constraint)
-            pass
-    
-    print("Sample users generated!")
-    print("Database initialization complete!")
+
+from . import booking_events, database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# City -> (latitude, longitude, areas); restaurants are scattered around the centre
+CITIES = {
+    "Bangalore": (12.9716, 77.5946, ["Koramangala", "Indiranagar", "Jayanagar", "Whitefield", "Marathahalli", "Electronic City"]),
+    "Mumbai": (19.0760, 72.8777, ["Bandra", "Andheri", "Juhu", "Worli", "Colaba", "Powai"]),
+    "Delhi": (28.6139, 77.2090, ["Connaught Place", "Hauz Khas", "Dwarka", "Gurgaon", "Noida", "Greater Noida"]),
+    "Chennai": (13.0827, 80.2707, ["T Nagar", "Anna Nagar", "Adyar", "OMR", "Porur", "Velachery"]),
+    "Hyderabad": (17.3850, 78.4867, ["Banjara Hills", "Jubilee Hills", "Gachibowli", "Hitech City", "Secunderabad"]),
+    "Pune": (18.5204, 73.8567, ["Koregaon Park", "Viman Nagar", "Kharadi", "Hinjewadi", "Wakad"]),
+    "Kolkata": (22.5726, 88.3639, ["Park Street", "Salt Lake", "New Town", "Howrah", "Dum Dum"]),
+    "Ahmedabad": (23.0225, 72.5714, ["Satellite", "Vastrapur", "Navrangpura", "Paldi", "Bodakdev"]),
+}
+
+CUISINES = [
+    "North Indian", "South Indian", "Chinese", "Italian", "Continental",
+    "Mexican", "Thai", "Japanese", "Mediterranean", "Fusion", "Street Food",
+    "Biryani", "Kebabs", "Seafood", "Vegetarian", "Multi-cuisine"
+]
+
+OPENING_HOURS_TEMPLATES = [json.dumps(hours) for hours in [
+    {"Mon-Fri": "12:00-23:00", "Sat-Sun": "11:00-23:30"},
+    {"Mon-Sun": "11:30-22:30"},
+    {"Mon-Fri": "11:00-22:00", "Sat-Sun": "10:30-23:00"},
+    {"Mon-Thu": "12:00-22:00", "Fri-Sun": "12:00-23:00"},
+    {"Mon-Sun": "12:00-23:00"},
+]]
+
+# 60% 2-4 seaters, 30% 6-8 seaters, 10% large tables
+TABLE_CAPACITIES = np.array([2, 3, 4, 6, 8, 10, 12, 15])
+TABLE_CAPACITY_WEIGHTS = np.array([0.2, 0.2, 0.2, 0.15, 0.15, 0.1 / 3, 0.1 / 3, 0.1 / 3])
+
+SPECIAL_REQUESTS = ["Window seat preferred", "Birthday celebration", "Anniversary", "High chair needed",
+                    "Business dinner", "Wheelchair access", "Quiet table please", "Vegetarian only"]
+
+# Names and street addresses are drawn from a pool rather than one Faker call per row
+FAKE_POOL_SIZE = 2000
+
+DEFAULT_PARTY_SIZES = "1:5,2:40,3:12,4:25,5:6,6:7,8:4,10:1"
+
+
+def parse_weights(spec: str) -> Tuple[np.ndarray, np.ndarray]:
+    """'2:40,4:25' -> (values, probabilities)"""
+    values, weights = [], []
+    for part in spec.split(","):
+        value, _, weight = part.partition(":")
+        values.append(int(value))
+        weights.append(float(weight or 1))
+    weights = np.array(weights)
+    return np.array(values), weights / weights.sum()
+
+
+def parse_ranges(spec: str) -> List[Tuple[int, int]]:
+    """'12:30-14:00,19:00-21:30' -> [(750, 840), (1140, 1290)] in minutes"""
+    ranges = []
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        start, end = part.split("-")
+        ranges.append(tuple(int(hour) * 60 + int(minute) for hour, minute in (start.split(":"), end.split(":"))))
+    return ranges
+
+
+class Progress:
+    """Prints rows written and rate for one table, at most every few seconds"""
+
+    def __init__(self, table: str, total: int):
+        self.table = table
+        self.total = total
+        self.done = 0
+        self.start = self.last = time.perf_counter()
+
+    def add(self, rows: int):
+        self.done += rows
+        now = time.perf_counter()
+        if now - self.last >= 5 or self.done >= self.total:
+            self.last = now
+            print(f"  {self.table}: {self.done:,}/{self.total:,} ({self.done / max(now - self.start, 1e-9):,.0f} rows/s)")
+
+
+def _insert_batches(conn: sqlite3.Connection, sql: str, batches, progress: Progress):
+    """executemany each batch of rows in its own transaction"""
+    for rows in batches:
+        with conn:
+            conn.executemany(sql, rows)
+        progress.add(len(rows))
+
+
+def _next_id(conn: sqlite3.Connection, table: str, column: str) -> int:
+    return conn.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}").fetchone()[0]
+
+
+def generate_restaurants(conn, rng, fake, count: int, batch_size: int) -> np.ndarray:
+    """Insert `count` restaurants; returns their ids"""
+    first_id = _next_id(conn, "Restaurant", "restaurant_id")
+    ids = np.arange(first_id, first_id + count)
+    streets = [fake.street_address().replace("\n", ", ") for _ in range(FAKE_POOL_SIZE)]
+    cities = list(CITIES)
+
+    def batches():
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            city_index = rng.integers(0, len(cities), size)
+            area_pick = rng.random(size)
+            street_index = rng.integers(0, len(streets), size)
+            offsets = rng.uniform(-0.1, 0.1, (size, 2))
+            cuisine_index = rng.integers(0, len(CUISINES), size)
+            hours_index = rng.integers(0, len(OPENING_HOURS_TEMPLATES), size)
+            ratings = np.round(rng.uniform(3.5, 5.0, size), 1)
+            rows = []
+            for i in range(size):
+                city = cities[city_index[i]]
+                latitude, longitude, areas = CITIES[city]
+                area = areas[int(area_pick[i] * len(areas))]
+                rows.append((
+                    int(ids[start + i]), f"GoodFoods {area}", f"{streets[street_index[i]]}, {area}, {city}",
+                    latitude + offsets[i, 0], longitude + offsets[i, 1], CUISINES[cuisine_index[i]],
+                    OPENING_HOURS_TEMPLATES[hours_index[i]], float(ratings[i])
+                ))
+            yield rows
+
+    _insert_batches(conn, """
+        INSERT INTO Restaurant (restaurant_id, name, address, latitude, longitude, cuisine_type, opening_hours, rating)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, batches(), Progress("Restaurant", count))
+    return ids
+
+
+def generate_tables(conn, rng, restaurant_ids: np.ndarray, min_tables: int, max_tables: int, batch_size: int) -> int:
+    """Insert between min_tables and max_tables tables per restaurant; returns the number of tables"""
+    counts = rng.integers(min_tables, max_tables + 1, len(restaurant_ids))
+    total = int(counts.sum())
+    restaurants_per_batch = max(1, batch_size * 2 // (min_tables + max_tables))
+
+    def batches():
+        for start in range(0, len(restaurant_ids), restaurants_per_batch):
+            owners = np.repeat(restaurant_ids[start:start + restaurants_per_batch],
+                               counts[start:start + restaurants_per_batch])
+            capacities = rng.choice(TABLE_CAPACITIES, len(owners), p=TABLE_CAPACITY_WEIGHTS)
+            yield list(zip(owners.tolist(), capacities.tolist()))
+
+    _insert_batches(conn, "INSERT INTO RestaurantTable (restaurant_id, capacity) VALUES (?, ?)",
+                    batches(), Progress("RestaurantTable", total))
+    return total
+
+
+def generate_users(conn, rng, fake, count: int, batch_size: int) -> np.ndarray:
+    """Insert `count` users with unique phone numbers; returns their ids"""
+    first_id = _next_id(conn, "User", "user_id")
+    ids = np.arange(first_id, first_id + count)
+    names = np.array([fake.name() for _ in range(FAKE_POOL_SIZE)], dtype=object)
+
+    def batches():
+        for start in range(0, count, batch_size):
+            batch_ids = ids[start:start + batch_size]
+            # Derived from the id, so unique without a lookup
+            phones = [f"+91-{7000000000 + user_id}" for user_id in batch_ids.tolist()]
+            yield list(zip(batch_ids.tolist(), names[rng.integers(0, len(names), len(batch_ids))].tolist(), phones))
+
+    _insert_batches(conn, "INSERT INTO User (user_id, name, phone_number) VALUES (?, ?, ?)",
+                    batches(), Progress("User", count))
+    return ids
+
+
+def booking_slots(start: date_type, days: int, service_hours: Tuple[int, int], slot_minutes: int,
+                  peak_hours: List[Tuple[int, int]], peak_weight: float, weekend_weight: float):
+    """All bookable 'YYYY-MM-DD HH:MM:00' slots and the probability of each"""
+    minutes = np.arange(service_hours[0], service_hours[1] + 1, slot_minutes)
+    slot_weights = np.ones(len(minutes))
+    for peak_start, peak_end in peak_hours:
+        slot_weights[(minutes >= peak_start) & (minutes < peak_end)] = peak_weight
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    day_weights = np.array([weekend_weight if day.weekday() >= 5 else 1.0 for day in dates])
+
+    labels = np.array([f"{day.isoformat()} {minute // 60:02d}:{minute % 60:02d}:00"
+                       for day in dates for minute in minutes], dtype=object)
+    weights = np.outer(day_weights, slot_weights).ravel()
+    return labels, weights / weights.sum()
+
+
+def generate_bookings(conn, rng, restaurant_ids: np.ndarray, user_ids: np.ndarray, count: int, slots, slot_weights,
+                      party_sizes, party_weights, cancellation_rate: float, special_request_rate: float,
+                      popularity_skew: float, batch_size: int):
+    """Insert `count` bookings; restaurants are picked with Zipf-like popularity"""
+    # Popularity falls off with rank as 1 / rank^skew; ranks are shuffled so ids don't matter
+    popularity = 1.0 / np.arange(1, len(restaurant_ids) + 1) ** popularity_skew
+    popularity = rng.permutation(popularity / popularity.sum())
+    statuses = np.array(["confirmed", "cancelled"], dtype=object)
+    requests = np.array([None] + SPECIAL_REQUESTS, dtype=object)
+
+    def batches():
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            has_request = rng.random(size) < special_request_rate
+            request_index = np.where(has_request, rng.integers(1, len(requests), size), 0)
+            yield list(zip(
+                rng.choice(restaurant_ids, size, p=popularity).tolist(),
+                user_ids[rng.integers(0, len(user_ids), size)].tolist(),
+                rng.choice(slots, size, p=slot_weights).tolist(),
+                rng.choice(party_sizes, size, p=party_weights).tolist(),
+                statuses[(rng.random(size) < cancellation_rate).astype(np.int64)].tolist(),
+                requests[request_index].tolist(),
+            ))
+
+    # Maintaining the indexes row by row is most of the insert cost; build them once at the end
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Booking' AND sql IS NOT NULL"
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    logged_until = _next_id(conn, "Booking", "booking_id") - 1
+    try:
+        _insert_batches(conn, """
+            INSERT INTO Booking (restaurant_id, user_id, booking_time, num_guests, status, special_requests)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, batches(), Progress("Booking", count))
+    finally:
+        for name, sql in indexes:
+            print(f"  Rebuilding index {name}...")
+            conn.execute(sql)
+        conn.commit()
+    # One set-based pass logs the new bookings and fills the event views
+    with conn:
+        booking_events.record_snapshot(conn, "booking_id > ?", [logged_until], "generate_data")
+
+
+def _existing_ids(conn, table: str, column: str) -> np.ndarray:
+    return np.array([row[0] for row in conn.execute(f"SELECT {column} FROM {table}")], dtype=np.int64)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic GoodFoods data for performance testing",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--database", default=database.DB_PATH, help="SQLite file; created with the schema if missing")
+    parser.add_argument("--fresh", action="store_true", help="Delete the database file first")
+    parser.add_argument("--restaurants", type=int, default=100)
+    parser.add_argument("--min-tables", type=int, default=8, help="Tables per restaurant, lower bound")
+    parser.add_argument("--max-tables", type=int, default=32, help="Tables per restaurant, upper bound")
+    parser.add_argument("--users", type=int, default=None, help="Default: one per 10 bookings, at least 10")
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--start-date", default=None, help="First booking date (YYYY-MM-DD); default today")
+    parser.add_argument("--days", type=int, default=90, help="Bookings are spread over this many days")
+    parser.add_argument("--service-hours", default="12:00-22:00", help="First-last bookable slot")
+    parser.add_argument("--slot-minutes", type=int, default=30)
+    parser.add_argument("--peak-hours", default="12:30-14:00,19:00-21:30")
+    parser.add_argument("--peak-weight", type=float, default=4.0, help="Relative booking rate of a peak slot")
+    parser.add_argument("--weekend-weight", type=float, default=1.5, help="Relative booking rate of a weekend day")
+    parser.add_argument("--party-sizes", default=DEFAULT_PARTY_SIZES, help="size:weight pairs")
+    parser.add_argument("--cancellation-rate", type=float, default=0.1)
+    parser.add_argument("--special-request-rate", type=float, default=0.05)
+    parser.add_argument("--popularity-skew", type=float, default=0.5,
+                        help="Zipf exponent of restaurant popularity (0 = uniform)")
+    parser.add_argument("--batch-size", type=int, default=100000, help="Rows per executemany/transaction")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.min_tables < 1 or args.max_tables < args.min_tables:
+        parser.error("need 1 <= --min-tables <= --max-tables")
+    if not 0 <= args.cancellation_rate <= 1 or not 0 <= args.special_request_rate <= 1:
+        parser.error("rates must be between 0 and 1")
+    (service_hours,) = parse_ranges(args.service_hours)
+    peak_hours = parse_ranges(args.peak_hours)
+    party_sizes, party_weights = parse_weights(args.party_sizes)
+    start_date = date_type.fromisoformat(args.start_date) if args.start_date else date_type.today()
+    users = args.users if args.users is not None else max(10, args.bookings // 10) if args.bookings else 0
+
+    if args.fresh and os.path.exists(args.database):
+        os.remove(args.database)
+    sys.path.insert(0, BACKEND_DIR)
+    import setup_database
+    conn, _ = setup_database.create_database(args.database)
+    # Bulk-load settings: a crash mid-run loses the run, not the existing data
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")
+
+    rng = np.random.default_rng(args.seed)
+    fake = Faker(["en_IN"])
+    if args.seed is not None:
+        Faker.seed(args.seed)
+
+    started = time.perf_counter()
+    print(f"Generating data in {os.path.abspath(args.database)}")
+    try:
+        restaurant_ids = generate_restaurants(conn, rng, fake, args.restaurants, args.batch_size)
+        tables = generate_tables(conn, rng, restaurant_ids, args.min_tables, args.max_tables, args.batch_size)
+        user_ids = generate_users(conn, rng, fake, users, args.batch_size)
+
+        if args.bookings:
+            if not len(restaurant_ids):
+                restaurant_ids = _existing_ids(conn, "Restaurant", "restaurant_id")
+            if not len(user_ids):
+                user_ids = _existing_ids(conn, "User", "user_id")
+            if not len(restaurant_ids) or not len(user_ids):
+                parser.error("bookings need restaurants and users")
+            slots, slot_weights = booking_slots(start_date, args.days, service_hours, args.slot_minutes,
+                                                peak_hours, args.peak_weight, args.weekend_weight)
+            generate_bookings(conn, rng, restaurant_ids, user_ids, args.bookings, slots, slot_weights,
+                              party_sizes, party_weights, args.cancellation_rate, args.special_request_rate,
+                              args.popularity_skew, args.batch_size)
+        conn.execute("PRAGMA optimize")
+        # Back to WAL (left by create_database) so API workers can share the file
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+
+    print(f"Generated {args.restaurants:,} restaurants, {tables:,} tables, {users:,} users and "
+          f"{args.bookings:,} bookings in {time.perf_counter() - started:.1f}s")
+
 
 if __name__ == "__main__":
-    generate_synthetic_data() 
\ No newline at end of file
+    main()
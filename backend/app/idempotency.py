@@ -0,0 +1,177 @@
+"""
+Idempotency keys for GoodFoods bookings
+A retried booking (a client retrying after a timeout, or the model calling
+create_booking twice in one conversation) gets the original result back
+instead of taking a second table. The key is the Idempotency-Key header, or
+is derived from the session id and the validated arguments. A derived key
+isn't a retry token: its booking is replayed only while it is still
+confirmed, so a guest who cancels and asks for the same slot again books it.
+Keys are kept in the IdempotencyKey table (WITHOUT ROWID) as 16-byte digests,
+next to a digest of the arguments and the JSON result, and expire after
+IDEMPOTENCY_TTL_SECONDS. A replay is a single primary-key lookup.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from .database import DatabaseManager
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a request holds its key; a retry after that (e.g. the first attempt's worker died) runs again
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+# Agent tools whose calls are deduplicated per conversation
+IDEMPOTENT_TOOLS = ("create_booking",)
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was first used with different arguments"""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with this key is still running"""
+
+
+def _canonical(arguments: Dict[str, Any]) -> str:
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _digest(*parts: str) -> bytes:
+    return hashlib.sha256("\x1f".join(parts).encode()).digest()[:16]
+
+
+def client_key(header_value: str) -> str:
+    """Key for a request carrying an Idempotency-Key header"""
+    return f"client:{header_value}"
+
+
+def derive_key(session_id: str, arguments: Dict[str, Any]) -> str:
+    """Key for a request without one: the same validated arguments in the same session"""
+    return f"session:{session_id}:{_canonical(arguments)}"
+
+
+def succeeded(result: Any) -> bool:
+    """Only successful bookings are kept; a failed attempt can be retried for real"""
+    return isinstance(result, dict) and result.get("success") is True
+
+
+def still_confirmed(result: Any) -> bool:
+    """Whether the booking in a stored create_booking result hasn't been cancelled since"""
+    booking_id = str(result.get("booking_id") or "")
+    if not booking_id.startswith("GF") or not booking_id[2:].isdigit():
+        return False
+    return bool(DatabaseManager().execute_query(
+        "SELECT 1 FROM Booking WHERE booking_id = ? AND status = 'confirmed'", [int(booking_id[2:])]
+    ))
+
+
+class IdempotencyStore:
+    """Runs an operation at most once per key and replays its result to retries"""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, lease: float = IDEMPOTENCY_LEASE_SECONDS):
+        self.ttl = ttl
+        self.lease = lease
+        self.db = DatabaseManager()
+        self._tables: Set[str] = set()
+        self.stats = {"executed": 0, "replayed": 0, "reused": 0, "in_progress": 0, "stale": 0}
+
+    def _ensure_table(self):
+        from . import database
+        if database.DB_PATH in self._tables:
+            return
+        self.db.execute_query("""
+            CREATE TABLE IF NOT EXISTS IdempotencyKey (
+                idempotency_key BLOB PRIMARY KEY,
+                request_hash BLOB NOT NULL,
+                response TEXT,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.db.execute_query("CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON IdempotencyKey (expires_at)")
+        self._tables.add(database.DB_PATH)
+
+    def _replay(self, row: tuple, request_hash: bytes, replay_if: Optional[Callable[[Any], bool]]):
+        """
+        The stored result for a live key, or None while the first request is
+        running or when `replay_if` rejects the stored result
+        """
+        if row[0] != request_hash:
+            self.stats["reused"] += 1
+            raise IdempotencyKeyReused("This idempotency key was already used with different booking details")
+        if row[1] is None:
+            return None
+        result = json.loads(row[1])
+        if replay_if is not None and not replay_if(result):
+            return None
+        self.stats["replayed"] += 1
+        return result
+
+    def run(self, operation: str, key: str, arguments: Dict[str, Any], execute: Callable[[], Any],
+            keep: Callable[[Any], bool] = succeeded,
+            replay_if: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """
+        `execute()` once per (operation, key). Returns (result, replayed).
+        Results `keep` rejects aren't stored, so a retry runs again, and a
+        stored result `replay_if` rejects (e.g. still_confirmed for a booking
+        cancelled since) is replaced by running again under the same key.
+        Raises IdempotencyKeyReused for the key with other arguments and
+        IdempotencyInProgress while the first request still holds the key.
+        """
+        self._ensure_table()
+        key_hash = _digest(operation, key)
+        request_hash = _digest(_canonical(arguments))
+        now = time.time()
+
+        # Retries of finished requests are answered from one primary-key read, without the write lock
+        rows = self.db.execute_query(
+            "SELECT request_hash, response FROM IdempotencyKey WHERE idempotency_key = ? AND expires_at > ?",
+            [key_hash, now]
+        )
+        if rows:
+            result = self._replay(rows[0], request_hash, replay_if)
+            if result is not None:
+                return result, True
+
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT request_hash, response FROM IdempotencyKey WHERE idempotency_key = ? AND expires_at > ?",
+                [key_hash, now]
+            ).fetchone()
+            if row is not None:
+                result = self._replay(row, request_hash, replay_if)
+                if result is not None:
+                    return result, True
+                if row[1] is None:
+                    self.stats["in_progress"] += 1
+                    raise IdempotencyInProgress("This booking is already being processed")
+                self.stats["stale"] += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO IdempotencyKey (idempotency_key, request_hash, response, expires_at) "
+                "VALUES (?, ?, NULL, ?)",
+                [key_hash, request_hash, now + self.lease]
+            )
+
+        try:
+            result = execute()
+        except BaseException:
+            self.db.execute_query("DELETE FROM IdempotencyKey WHERE idempotency_key = ?", [key_hash])
+            raise
+        self.stats["executed"] += 1
+
+        if keep(result):
+            self.db.execute_query(
+                "UPDATE IdempotencyKey SET response = ?, expires_at = ? WHERE idempotency_key = ?",
+                [json.dumps(result, separators=(",", ":")), time.time() + self.ttl, key_hash]
+            )
+        else:
+            self.db.execute_query("DELETE FROM IdempotencyKey WHERE idempotency_key = ?", [key_hash])
+        # Expired keys are swept now and then rather than on every request
+        if self.stats["executed"] % 100 == 1:
+            self.db.execute_query("DELETE FROM IdempotencyKey WHERE expires_at < ?", [time.time()])
+        return result, False
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,123 @@
+"""
+Micro-batching of concurrent LLM predictions
+Prompts submitted within a short window are sent as one multi-instance
+request and the results are dispatched back to the waiting turns.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, List, Tuple
+
+# predict_batch(prompts, timeout) -> one completion per prompt, in order
+BatchPredictFn = Callable[[List[str], float], List[str]]
+
+
+class PredictionBatcher:
+    """
+    Collects prompts for up to `max_wait_ms` (or until `max_batch_size` are
+    queued) and sends them through `predict_batch` in a single call. Up to
+    `max_in_flight` batches run concurrently.
+    """
+
+    def __init__(self, predict_batch: BatchPredictFn, max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0, max_in_flight: int = 4, name: str = "llm"):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[Tuple[str, float, Future]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"{name}-batch")
+        self._in_flight = threading.Semaphore(max_in_flight)
+        self.batches = 0
+        self.requests = 0
+        self._thread = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, timeout: float) -> Future:
+        """Queue a prompt; the future resolves to its completion"""
+        future: Future = Future()
+        self._queue.put((prompt, time.monotonic() + timeout, future))
+        return future
+
+    def predict(self, prompt: str, timeout: float) -> str:
+        """Blocking helper: submit and wait for the completion"""
+        future = self.submit(prompt, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Not dispatched yet? Then it will be dropped from its batch
+            future.cancel()
+            raise
+
+    def _collect(self) -> List[Tuple[str, float, Future]]:
+        batch = [self._queue.get()]
+        window_end = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            wait = window_end - time.monotonic()
+            if wait <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Drop requests whose caller already gave up
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self._in_flight.acquire()
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[str, float, Future]]):
+        try:
+            prompts = [prompt for prompt, _, _ in batch]
+            timeout = max(0.001, min(deadline for _, deadline, _ in batch) - time.monotonic())
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                results = self.predict_batch(prompts, timeout)
+                if len(results) != len(batch):
+                    raise Exception(f"Expected {len(batch)} predictions, got {len(results)}")
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._in_flight.release()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(name: str, predict_batch: BatchPredictFn, **options) -> PredictionBatcher:
+    """Shared batcher per backend, created on first use"""
+    with _batchers_lock:
+        batcher = _batchers.get(name)
+        if batcher is None:
+            batcher = PredictionBatcher(predict_batch, name=name, **options)
+            _batchers[name] = batcher
+        return batcher
+
+
+def batcher_stats() -> dict:
+    with _batchers_lock:
+        return {name: batcher.stats() for name, batcher in _batchers.items()}
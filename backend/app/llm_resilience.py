@@ -0,0 +1,184 @@
+"""
+Resilience primitives for LLM calls
+Deadlines, jittered exponential backoff, circuit breaking and hedged requests
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+# Exception class names (from google.api_core, requests and the stdlib) worth retrying.
+# Matched by name so this module does not pull in the Google client libraries.
+RETRYABLE_ERRORS = {
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "InternalServerError",
+    "GatewayTimeout",
+    "Aborted",
+    "TimeoutError",
+    "ConnectionError",
+    "Timeout",
+}
+
+# Threads for deadline-bounded calls; abandoned calls finish in the background.
+# Hedged legs get their own pool since each leg itself waits on a deadline-bounded call.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_MAX_CONCURRENT_CALLS", "64")),
+    thread_name_prefix="llm-call"
+)
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_MAX_CONCURRENT_CALLS", "64")),
+    thread_name_prefix="llm-hedge"
+)
+
+
+class DeadlineExceededError(Exception):
+    """The overall time budget for an LLM call ran out"""
+
+
+class CircuitOpenError(Exception):
+    """The backend is failing and calls are short-circuited"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def remaining(deadline: float) -> float:
+    return deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend after `failure_threshold` consecutive failures.
+    After `reset_timeout` seconds a single trial call is let through; its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run fn through the breaker"""
+        if not self.allow():
+            raise CircuitOpenError("Circuit open, skipping call")
+        try:
+            result = fn()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+def call_with_deadline(fn: Callable[[], Any], deadline: float) -> Any:
+    """Run fn in a worker thread and stop waiting for it once the deadline passes"""
+    timeout = remaining(deadline)
+    if timeout <= 0:
+        raise DeadlineExceededError("No time left for the call")
+
+    future = _executor.submit(fn)
+    done, _ = wait([future], timeout=timeout)
+    if not done:
+        raise DeadlineExceededError(f"Call did not finish within {timeout:.1f}s")
+    return future.result()
+
+
+def retry_with_backoff(fn: Callable[[float], Any], deadline: float, max_retries: int = 2,
+                       base_delay: float = 0.25, max_delay: float = 2.0,
+                       attempt_timeout: Optional[float] = None) -> Any:
+    """
+    Call fn(timeout) until it succeeds, retrying retryable errors with full-jitter
+    exponential backoff. Never sleeps or starts an attempt past the deadline.
+    """
+    attempt = 0
+    while True:
+        timeout = remaining(deadline)
+        if attempt_timeout is not None:
+            timeout = min(timeout, attempt_timeout)
+        if timeout <= 0:
+            raise DeadlineExceededError("Deadline reached before the call could be attempted")
+
+        try:
+            return call_with_deadline(lambda: fn(timeout), time.monotonic() + timeout)
+        except Exception as e:
+            if attempt >= max_retries or not (is_retryable(e) or isinstance(e, DeadlineExceededError)):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            if remaining(deadline) <= delay:
+                raise
+            print(f"LLM call failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def hedged_call(primary: Callable[[], Any], secondary: Callable[[], Any],
+                hedge_after: float, deadline: float) -> Any:
+    """
+    Start primary; if it has not answered within `hedge_after` seconds (or fails
+    first), also start secondary. The first successful result wins.
+    """
+    futures = {_hedge_executor.submit(primary): "primary"}
+    hedge_at = time.monotonic() + hedge_after
+    hedged = False
+    last_error: Optional[BaseException] = None
+
+    while futures:
+        if not hedged:
+            timeout = min(remaining(hedge_at), remaining(deadline))
+        else:
+            timeout = remaining(deadline)
+        if timeout <= 0 and (hedged or remaining(deadline) <= 0):
+            break
+
+        done, _ = wait(list(futures), timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            del futures[future]
+            try:
+                return future.result()
+            except Exception as e:
+                last_error = e
+
+        if not hedged and (not futures or time.monotonic() >= hedge_at):
+            futures[_hedge_executor.submit(secondary)] = "secondary"
+            hedged = True
+
+    if last_error is not None and not futures:
+        raise last_error
+    raise DeadlineExceededError("Neither backend answered before the deadline")
@@ -3,21 +3,105 @@ Main FastAPI application for GoodFoods AI Agent
 Provides the API endpoints for the conversational agent
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
+from contextlib import asynccontextmanager
+import codecs
+import hmac
+import io
 import os
-from .agent import GoodFoodsAgent
+import tempfile
+from .agent import GoodFoodsAgent, speculative_executor, tool_call_parser
+from . import booking_events
+from .bulk import BULK_FORMATS, export_bookings, import_bookings
+from .chat_socket import ChatConnection
+from . import tool_functions
+from .database import DatabaseManager, profiler
+from .idempotency import (IdempotencyInProgress, IdempotencyKeyReused, client_key, derive_key,
+                          idempotency_store, still_confirmed)
+from .llm_batcher import batcher_stats
+from .opening_hours import opening_hours_index
+from .rate_limit import AdmissionController, AdmissionMiddleware, RouteLimit, client_address
+from .reminders import REMINDERS_ENABLED, ReminderScheduler
+from .responses import CompressionMiddleware, FastJSONResponse
+from .sessions import VersionConflict, create_session_store
+from .tool_registry import ToolValidationError, parse_date, parse_moment, tool_registry
+from .warmup import WARMUP, warm_up, warmup_report
+
+# Booking reminders, started with the app when REMINDERS_ENABLED
+reminder_scheduler: Optional[ReminderScheduler] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up before taking traffic, so the first requests don't pay one-off initialization"""
+    global reminder_scheduler
+    # Databases from before the waitlist and the booking event log get their tables
+    # (gunicorn also does this in on_starting; plain uvicorn starts here)
+    import setup_database
+    from . import database
+    seeded = await run_in_threadpool(setup_database.migrate, database.DB_PATH)
+    if seeded:
+        print(f"Booking event log seeded with {seeded} bookings")
+    if WARMUP:
+        report = await run_in_threadpool(warm_up)
+        print(f"Warm-up finished in {report['total_ms']} ms: {report}")
+    if REMINDERS_ENABLED:
+        reminder_scheduler = await run_in_threadpool(ReminderScheduler)
+        reminder_scheduler.start()
+    yield
+    if reminder_scheduler is not None:
+        await reminder_scheduler.stop()
 
 # Create FastAPI app
 app = FastAPI(
     title="GoodFoods AI Agent API",
     description="Conversational AI agent for restaurant reservations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Add CORS middleware
+# Admission control: per-client token buckets and a concurrency cap per route.
+# Each limit is overridable through <PREFIX>_RATE_LIMIT_PER_MINUTE, <PREFIX>_RATE_LIMIT_BURST,
+# <PREFIX>_MAX_CONCURRENT, <PREFIX>_MAX_QUEUE and <PREFIX>_QUEUE_TIMEOUT.
+admission = AdmissionController({
+    "/chat": RouteLimit.from_env(
+        "CHAT", requests_per_minute=20, burst=5, max_concurrent=8, max_queue=16, queue_timeout=10
+    ),
+    "/availability": RouteLimit.from_env(
+        "AVAILABILITY", requests_per_minute=120, burst=20, max_concurrent=32, max_queue=64, queue_timeout=5
+    ),
+    "/bookings": RouteLimit.from_env(
+        "BOOKINGS", requests_per_minute=30, burst=10, max_concurrent=16, max_queue=32, queue_timeout=5
+    ),
+    "/waitlist": RouteLimit.from_env(
+        "WAITLIST", requests_per_minute=30, burst=10, max_concurrent=16, max_queue=32, queue_timeout=5
+    ),
+})
+
+async def get_client_keys(scope: dict) -> List[str]:
+    """
+    The rate-limit buckets a request is charged to: always the caller's
+    address (X-Forwarded-For only from TRUSTED_PROXIES), and also a session
+    header naming a live session. Charging the address too means one client
+    can't get fresh buckets by creating sessions; made-up session ids are
+    ignored.
+    """
+    request = Request(scope)
+    peer = request.client.host if request.client else None
+    keys = [f"ip:{client_address(peer, request.headers.get('x-forwarded-for'))}"]
+    session_id = request.headers.get("x-session-id")
+    if session_id and await run_in_threadpool(session_store.exists, session_id):
+        keys.append(f"session:{session_id}")
+    return keys
+
+# Shed excess load with a fast 429 instead of letting requests time out
+app.add_middleware(AdmissionMiddleware, controller=admission, client_keys=get_client_keys)
+
+# Add CORS middleware (registered last so it also wraps 429 responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8501", "http://127.0.0.1:8501"],
@@ -26,25 +110,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the AI agent
+# Compress responses from COMPRESSION_MIN_SIZE bytes with gzip or brotli, as the client accepts
+app.add_middleware(CompressionMiddleware)
+
+# Agent configuration (tools, model) for status reporting; conversations
+# each get their own agent through the session store
 agent = GoodFoodsAgent()
+session_store = create_session_store(GoodFoodsAgent)
 
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
-    conversation_history: Optional[List[Dict[str, str]]] = []
+    # Omit to start a new conversation; the response carries the id to send next time
+    session_id: Optional[str] = None
+    # Replies received so far in this session; a mismatch is answered with 409
+    version: Optional[int] = None
+    # Full transcript, only to (re)start a session from it after a 404 or 409
+    conversation_history: Optional[List[Dict[str, str]]] = None
 
 class ChatResponse(BaseModel):
     response: str
     message: str
-    conversation_history: List[Dict[str, str]]
+    session_id: str
+    version: int
 
 class RestaurantResponse(BaseModel):
-    id: int
-    name: str
-    address: str
-    cuisine_type: str
-    rating: float
+    # Every field is optional because listings can be projected with ?fields=
+    id: Optional[int] = None
+    name: Optional[str] = None
+    address: Optional[str] = None
+    cuisine_type: Optional[str] = None
+    rating: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    opening_hours: Optional[Dict[str, str]] = None
+    distance_km: Optional[float] = None
+
+class RestaurantPage(BaseModel):
+    restaurants: List[RestaurantResponse]
+    next_cursor: Optional[str] = None
 
 class BookingRequest(BaseModel):
     restaurant_id: int
@@ -66,6 +170,10 @@ class BookingResponse(BaseModel):
     phone_number: Optional[str] = None
     error: Optional[str] = None
 
+class WaitlistRequest(BookingRequest):
+    # Higher is served first; parties joining through the agent wait at 0
+    priority: int = 0
+
 # Health check endpoints
 @app.get("/")
 async def root():
@@ -88,53 +196,105 @@ async def health():
     }
 
 # Main chat endpoint
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@app.post("/chat", response_model=ChatResponse, response_class=FastJSONResponse)
+async def chat(request: ChatRequest, x_session_id: Optional[str] = Header(None)):
     """
     Main conversational endpoint for the AI agent.
     Handles natural language queries and tool calling.
+    Conversations live server-side: send only the new message with the
+    session_id and version from the previous response.
     """
+    session_id = request.session_id or x_session_id
+    session = await run_in_threadpool(session_store.get, session_id) if session_id else None
+    if session is None:
+        if session_id and request.conversation_history is None and request.version:
+            # The server no longer has this conversation; the client resends its transcript
+            raise HTTPException(status_code=404, detail="Unknown or expired session. Resend with conversation_history.")
+        session = await run_in_threadpool(session_store.create)
+    
     try:
-        # Set conversation history if provided
-        if request.conversation_history:
-            agent.conversation_history = request.conversation_history
-        
-        # Get response from AI agent
-        response = agent.get_response(request.message)
+        # Run the (blocking) agent turn off the event loop so other requests keep flowing
+        response = await run_in_threadpool(
+            session.run_turn, request.message, request.version, request.conversation_history
+        )
         
         return ChatResponse(
             response=response,
             message=request.message,
-            conversation_history=agent.conversation_history
+            session_id=session.session_id,
+            version=session.version
         )
         
+    except VersionConflict as e:
+        return JSONResponse(status_code=409, content={
+            "detail": "Conversation is out of sync. Resend with conversation_history.",
+            "session_id": session.session_id,
+            "version": e.version
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Chat over a WebSocket: one connection per conversation, with tool events
+    and reply text streamed as each turn runs. Pass ?session_id= to resume a
+    conversation; see app/chat_socket.py for the message protocol.
+    """
+    connection = ChatConnection(websocket, session_store, admission)
+    try:
+        await connection.run(session_id)
+    finally:
+        try:
+            await websocket.close()
+        except RuntimeError:
+            # Already closed by either side
+            pass
+
 # Restaurant endpoints
-@app.get("/restaurants", response_model=List[RestaurantResponse])
-async def get_restaurants(location: Optional[str] = None, cuisine: Optional[str] = None):
+@app.get("/restaurants", response_model=RestaurantPage, response_model_exclude_none=True)
+async def get_restaurants(
+    location: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    order_by: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=tool_functions.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    open_at: Optional[str] = None
+):
     """
     Get restaurants with optional filtering by location and cuisine.
+    Results are paginated: pass next_cursor back as ?cursor= for the next page.
+    order_by is rating, distance (needs lat and lng) or name; fields is a
+    comma-separated projection, e.g. ?fields=id,name. open_at ("now", "7pm",
+    "Friday 19:00") keeps restaurants open at that time.
     This endpoint can be used directly or through the AI agent.
     """
     try:
-        from . import tool_functions
-        restaurants = tool_functions.find_restaurants(location=location, cuisine=cuisine)
-        
-        # Convert to response model format
-        response_restaurants = []
-        for restaurant in restaurants:
-            response_restaurants.append(RestaurantResponse(
-                id=restaurant["id"],
-                name=restaurant["name"],
-                address=restaurant["address"],
-                cuisine_type=restaurant["cuisine_type"],
-                rating=restaurant.get("rating", 4.5)
-            ))
-        
-        return response_restaurants
+        page = await run_in_threadpool(
+            tool_functions.search_restaurants,
+            location=location,
+            cuisine=cuisine,
+            order_by=order_by,
+            latitude=lat,
+            longitude=lng,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+            limit=limit,
+            cursor=cursor,
+            open_at=parse_moment(open_at) if open_at else None
+        )
+        # Rows come from the database already typed; returning the response
+        # directly skips re-validating every row against RestaurantPage
+        body = {"restaurants": [{key: value for key, value in restaurant.items() if value is not None}
+                                for restaurant in page["restaurants"]]}
+        if page["next_cursor"] is not None:
+            body["next_cursor"] = page["next_cursor"]
+        return FastJSONResponse(body)
         
+    except (ValueError, ToolValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching restaurants: {str(e)}")
 
@@ -142,11 +302,7 @@ async def get_restaurants(location: Optional[str] = None, cuisine: Optional[str]
 async def get_restaurant(restaurant_id: int):
     """Get details of a specific restaurant"""
     try:
-        from . import tool_functions
-        
-        # Get all restaurants and find the specific one
-        restaurants = tool_functions.find_restaurants()
-        restaurant = next((r for r in restaurants if r["id"] == restaurant_id), None)
+        restaurant = tool_functions.get_restaurant(restaurant_id)
         
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
@@ -167,46 +323,105 @@ async def check_availability(restaurant_id: int, date: str, time: str, party_siz
     """
     try:
         from . import tool_functions
-        available_times = tool_functions.check_availability(
-            restaurant_id=restaurant_id,
-            date=date,
-            time=time,
-            party_size=party_size
-        )
-        
-        return {
+        # Normalizes "tomorrow"/"7pm" and enforces bounds before any DB work
+        arguments = tool_registry.validate("check_availability", {
             "restaurant_id": restaurant_id,
             "date": date,
-            "requested_time": time,
-            "party_size": party_size,
+            "time": time,
+            "party_size": party_size
+        })
+        
+        # Run in the threadpool so concurrent identical lookups can coalesce
+        available_times = await run_in_threadpool(tool_functions.check_availability, **arguments)
+        
+        # Returned as a response directly, skipping FastAPI's generic encoder
+        return FastJSONResponse({
+            "restaurant_id": restaurant_id,
+            "date": arguments["date"],
+            "requested_time": arguments["time"],
+            "party_size": arguments["party_size"],
             "available_times": available_times,
-            "is_requested_time_available": time in available_times
-        }
+            "is_requested_time_available": arguments["time"] in available_times
+        })
         
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking availability: {str(e)}")
 
+@app.get("/availability/{restaurant_id}/grid")
+async def get_availability_grid(restaurant_id: int, date: str, party_size: int, interval: int = 30):
+    """
+    Availability for every slot of a day in one call, for day views.
+    Slot i starts at `start` + i * interval_minutes; "available" has one
+    character per slot ("1" fits party_size, "0" full, "-" closed).
+    """
+    try:
+        # Imported on first use: NumPy is needed only here (warm-up preloads it)
+        from .availability_grid import availability_grid
+        coercers = tool_registry.tools["check_availability"].coercers
+        grid = await run_in_threadpool(
+            availability_grid,
+            coercers["restaurant_id"](restaurant_id),
+            coercers["date"](date),
+            coercers["party_size"](party_size),
+            interval
+        )
+        if grid["start"] is None and opening_hours_index.mask(restaurant_id) is None:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        return FastJSONResponse(grid)
+        
+    except HTTPException:
+        raise
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing availability grid: {str(e)}")
+
 # Booking endpoints
 @app.post("/bookings", response_model=BookingResponse)
-async def create_booking(request: BookingRequest):
+async def create_booking(request: BookingRequest, response: Response,
+                         idempotency_key: Optional[str] = Header(None), x_session_id: Optional[str] = Header(None)):
     """
     Create a new booking.
     This endpoint can be used directly or through the AI agent.
+    A retry with the same Idempotency-Key header (or, without one, the same
+    details in the same X-Session-Id session) returns the original booking;
+    a session's booking is only replayed while it is still confirmed.
     """
     try:
         from . import tool_functions
-        result = tool_functions.create_booking(
-            restaurant_id=request.restaurant_id,
-            user_name=request.user_name,
-            phone_number=request.phone_number,
-            date=request.date,
-            time=request.time,
-            party_size=request.party_size,
-            special_requests=request.special_requests
-        )
+        arguments = tool_registry.validate("create_booking", request.model_dump())
+        replay_if = None
+        if idempotency_key:
+            key = client_key(idempotency_key)
+        elif x_session_id:
+            key = derive_key(x_session_id, arguments)
+            replay_if = still_confirmed
+        else:
+            key = None
+        
+        # The key claim, the booking and the stored result are write transactions: run them off the event loop
+        if key is None:
+            result = await run_in_threadpool(lambda: tool_functions.create_booking(**arguments))
+        else:
+            result, replayed = await run_in_threadpool(
+                idempotency_store.run, "create_booking", key, arguments,
+                lambda: tool_functions.create_booking(**arguments), replay_if=replay_if
+            )
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
         
         return BookingResponse(**result)
         
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating booking: {str(e)}")
 
@@ -215,10 +430,13 @@ async def cancel_booking(booking_id: str):
     """Cancel an existing booking"""
     try:
         from . import tool_functions
-        success = tool_functions.cancel_booking(booking_id=booking_id)
+        # Holds the write lock (and may wait on another writer): keep it off the event loop
+        result = await run_in_threadpool(tool_functions.cancel_and_backfill, booking_id)
         
-        if success:
-            return {"success": True, "message": f"Booking {booking_id} cancelled successfully"}
+        if result["success"]:
+            # The freed seats go straight to the slot's waitlist
+            return {"success": True, "message": f"Booking {booking_id} cancelled successfully",
+                    "waitlist_promoted": result["waitlist_promoted"]}
         else:
             raise HTTPException(status_code=404, detail="Booking not found or already cancelled")
             
@@ -247,12 +465,57 @@ async def get_booking_details(booking_id: str, phone_number: Optional[str] = Non
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching booking: {str(e)}")
 
+# Waitlist endpoints
+@app.post("/waitlist")
+async def join_waitlist(request: WaitlistRequest):
+    """Wait for a table at a fully booked slot; the party is booked automatically when one frees up"""
+    try:
+        arguments = tool_registry.validate("join_waitlist", request.model_dump(exclude={"priority"}))
+        return await run_in_threadpool(lambda: tool_functions.join_waitlist(**arguments, priority=request.priority))
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error joining waitlist: {str(e)}")
+
+@app.get("/waitlist/{waitlist_id}")
+async def get_waitlist_status(waitlist_id: str):
+    """A waitlist entry: its place in the queue, or the booking it became"""
+    try:
+        arguments = tool_registry.validate("get_waitlist_status", {"waitlist_id": waitlist_id})
+        result = await run_in_threadpool(lambda: tool_functions.get_waitlist_status(**arguments))
+        if result.get("success"):
+            return result
+        raise HTTPException(status_code=404, detail=result.get("error", "Waitlist entry not found"))
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching waitlist entry: {str(e)}")
+
+@app.delete("/waitlist/{waitlist_id}")
+async def leave_waitlist(waitlist_id: str):
+    """Take a party off the waitlist"""
+    try:
+        arguments = tool_registry.validate("leave_waitlist", {"waitlist_id": waitlist_id})
+        if await run_in_threadpool(lambda: tool_functions.leave_waitlist(**arguments)):
+            return {"success": True, "message": f"Waitlist entry {arguments['waitlist_id']} cancelled"}
+        raise HTTPException(status_code=404, detail="Waitlist entry not found or no longer waiting")
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error leaving waitlist: {str(e)}")
+
 # Agent management endpoints
 @app.post("/agent/reset")
-async def reset_agent():
-    """Reset the AI agent's conversation history"""
+async def reset_agent(session_id: Optional[str] = None, x_session_id: Optional[str] = Header(None)):
+    """End a conversation; the next message without its session id starts a new one"""
     try:
-        agent.reset_conversation()
+        session_id = session_id or x_session_id
+        if session_id:
+            await run_in_threadpool(session_store.delete, session_id)
         return {"message": "Agent conversation history reset successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error resetting agent: {str(e)}")
@@ -264,22 +527,177 @@ async def get_agent_status():
         return {
             "status": "active",
             "model": "Llama 3.1 8B",
-            "conversation_length": len(agent.conversation_history),
+            "sessions": session_store.stats(),
             "available_tools": [tool["function"]["name"] for tool in agent.tools],
             "project_id": agent.project_id,
-            "location": agent.location
+            "location": agent.location,
+            "admission": admission.status(),
+            "availability_cache": tool_functions.availability_cache.stats(),
+            "llm_batching": batcher_stats(),
+            "tool_call_parsing": dict(tool_call_parser.stats),
+            "tool_calls": tool_registry.stats(),
+            "speculative_prefetch": speculative_executor.stats(),
+            "warmup": warmup_report,
+            "reminders": reminder_scheduler.status() if reminder_scheduler else None,
+            "idempotency": dict(idempotency_store.stats)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting agent status: {str(e)}")
 
+# Admin endpoints
+def require_admin(x_admin_token: Optional[str]):
+    """
+    Reject the request unless it carries the configured ADMIN_TOKEN. Without a
+    token the admin endpoints are closed, unless ADMIN_OPEN=true (development only).
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        if os.getenv("ADMIN_OPEN", "false").lower() == "true":
+            return
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: set ADMIN_TOKEN")
+    if not hmac.compare_digest((x_admin_token or "").encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/db/profile")
+async def get_db_profile(limit: Optional[int] = 50, x_admin_token: Optional[str] = Header(None)):
+    """
+    Per-statement database timings aggregated by normalized SQL text,
+    ordered by total time. Enable collection with DB_PROFILING=true.
+    """
+    require_admin(x_admin_token)
+    return {
+        "enabled": profiler.enabled,
+        "slow_query_ms": profiler.slow_query_ms,
+        "statements": profiler.snapshot(limit=limit)
+    }
+
+@app.delete("/admin/db/profile")
+async def reset_db_profile(x_admin_token: Optional[str] = Header(None)):
+    """Clear the collected database profile"""
+    require_admin(x_admin_token)
+    profiler.reset()
+    return {"message": "Database profile reset successfully"}
+
+@app.post("/admin/bookings/import")
+async def import_bookings_endpoint(request: Request, format: str = "csv", x_admin_token: Optional[str] = Header(None)):
+    """
+    Bulk-import bookings from a CSV (with header) or JSONL request body.
+    The body is spooled to disk as it arrives, then imported in batches;
+    returns row counts and the first rejected rows with their line numbers.
+    A body that isn't UTF-8 is rejected before any row is imported.
+    """
+    require_admin(x_admin_token)
+    if format not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(BULK_FORMATS)}")
+    try:
+        with tempfile.TemporaryFile() as spool:
+            # Decoded as it is spooled: batches are committed as they go, so a bad byte must be found first
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            async for chunk in request.stream():
+                decoder.decode(chunk)
+                spool.write(chunk)
+            decoder.decode(b"", final=True)
+            spool.seek(0)
+            stream = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+            return await run_in_threadpool(import_bookings, stream, format)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="The import must be UTF-8 text")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing bookings: {str(e)}")
+
+@app.get("/admin/bookings/export")
+async def export_bookings_endpoint(format: str = "csv", restaurant_id: Optional[int] = None,
+                                   start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                   x_admin_token: Optional[str] = Header(None)):
+    """Stream bookings as CSV or JSONL, optionally for one restaurant and an inclusive date range"""
+    require_admin(x_admin_token)
+    try:
+        chunks = export_bookings(format, restaurant_id, start_date, end_date)
+        # Run the generator up to its query so bad arguments fail before streaming starts
+        first = await run_in_threadpool(next, chunks, "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def body():
+        yield first
+        yield from chunks
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="bookings.{format}"'
+    })
+
+def _booking_number(booking_id: str) -> int:
+    try:
+        return int(tool_registry.validate("get_booking_details", {"booking_id": booking_id})["booking_id"][2:])
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/admin/bookings/{booking_id}/events")
+async def get_booking_events(booking_id: str, x_admin_token: Optional[str] = Header(None)):
+    """A booking's history from the event log, oldest event first"""
+    require_admin(x_admin_token)
+    number = _booking_number(booking_id)
+    events = await run_in_threadpool(booking_events.booking_history, number)
+    if not events:
+        raise HTTPException(status_code=404, detail="No events for this booking")
+    return {"booking_id": f"GF{number:06d}", "events": events}
+
+@app.post("/admin/bookings/{booking_id}/attendance")
+async def record_attendance(booking_id: str, outcome: Literal["seated", "no_show"],
+                            x_admin_token: Optional[str] = Header(None)):
+    """Record that a confirmed booking's party was seated or was a no-show"""
+    require_admin(x_admin_token)
+    result = await run_in_threadpool(booking_events.record_attendance, _booking_number(booking_id), outcome)
+    if not result["success"]:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
+
+@app.get("/admin/occupancy/{restaurant_id}")
+async def get_slot_occupancy(restaurant_id: int, date: str, x_admin_token: Optional[str] = Header(None)):
+    """Confirmed bookings and guests per booked slot of a day, read from the SlotOccupancy view"""
+    require_admin(x_admin_token)
+    try:
+        day = parse_date(date)
+    except ToolValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    slots = await run_in_threadpool(booking_events.slot_occupancy, restaurant_id, day)
+    return {"restaurant_id": restaurant_id, "date": day, "slots": slots}
+
+@app.get("/admin/users/stats")
+async def get_user_booking_stats(phone_number: str, x_admin_token: Optional[str] = Header(None)):
+    """A guest's bookings, cancellations, visits and no-shows, read from the UserBookingStats view"""
+    require_admin(x_admin_token)
+    stats = await run_in_threadpool(booking_events.user_stats, phone_number)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No bookings for this phone number")
+    return stats
+
+@app.post("/admin/events/replay")
+async def replay_booking_events(x_admin_token: Optional[str] = Header(None)):
+    """
+    Rebuild SlotOccupancy and UserBookingStats from the event log, then
+    compare the occupancy with the Booking table (all zeros when in sync)
+    """
+    require_admin(x_admin_token)
+
+    def rebuild():
+        with DatabaseManager() as db, db.transaction() as conn:
+            return {"replayed": booking_events.replay(conn), "verify": booking_events.verify(conn)}
+
+    try:
+        return await run_in_threadpool(rebuild)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error replaying booking events: {str(e)}")
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"error": "Resource not found", "detail": str(exc)}
+    return JSONResponse(status_code=404, content={"error": "Resource not found", "detail": getattr(exc, "detail", str(exc))})
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return {"error": "Internal server error", "detail": str(exc)}
+    return JSONResponse(status_code=500, content={"error": "Internal server error", "detail": str(exc)})
 
 if __name__ == "__main__":
     import uvicorn
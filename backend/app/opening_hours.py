@@ -0,0 +1,142 @@
+"""
+Opening-hours index for the GoodFoods AI Agent
+Restaurant.opening_hours is a JSON blob ({"monday": "12:00-23:00", ...}).
+It is parsed once per restaurant into a weekly bitmap with one bit per
+minute, so "is it open at this time" is a shift and a mask on the hot path.
+"""
+
+import json
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .database import DatabaseManager
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+ALWAYS_OPEN = (1 << MINUTES_PER_WEEK) - 1
+
+DAY_NAMES = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+DAY_GROUPS = {
+    "daily": range(7), "everyday": range(7), "all": range(7),
+    "weekdays": range(5), "weekday": range(5), "weekends": range(5, 7), "weekend": range(5, 7),
+}
+
+_INTERVAL = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*-\s*(\d{1,2})(?::(\d{2}))?")
+
+
+def _days(key: str) -> List[int]:
+    """'monday', 'Mon-Fri', 'sat,sun', 'weekends' -> weekday numbers (Monday = 0)"""
+    key = key.strip().lower()
+    if key in DAY_GROUPS:
+        return list(DAY_GROUPS[key])
+    days = []
+    for part in re.split(r"[,/&]|\band\b", key):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (DAY_NAMES[name.strip()] for name in part.split("-", 1))
+            days.extend((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+        else:
+            days.append(DAY_NAMES[part])
+    return days
+
+
+def _intervals(value: str) -> List[Tuple[int, int]]:
+    """'12:00-15:00, 19:00-23:30' -> [(720, 900), (1140, 1410)]; 'closed' -> []"""
+    text = str(value).strip().lower()
+    if text in ("24h", "24 hours", "open 24 hours"):
+        return [(0, MINUTES_PER_DAY)]
+    intervals = []
+    for match in _INTERVAL.finditer(text):
+        opens = int(match.group(1)) * 60 + int(match.group(2) or 0)
+        closes = int(match.group(3)) * 60 + int(match.group(4) or 0)
+        if closes <= opens:
+            # Past midnight: spills into the next day
+            closes += MINUTES_PER_DAY
+        intervals.append((opens, closes))
+    return intervals
+
+
+def parse_opening_hours(raw: Optional[str]) -> int:
+    """
+    Weekly bitmap of an opening_hours JSON blob: bit n is set when the
+    restaurant is open at minute n of the week (Monday 00:00 = 0).
+    Missing or unreadable hours count as always open, as before.
+    """
+    try:
+        hours = json.loads(raw) if isinstance(raw, str) else raw
+    except (TypeError, ValueError):
+        return ALWAYS_OPEN
+    if not isinstance(hours, dict) or not hours:
+        return ALWAYS_OPEN
+
+    mask = 0
+    for key, value in hours.items():
+        try:
+            days = _days(key)
+        except KeyError:
+            print(f"Ignoring unknown opening-hours key: {key}")
+            continue
+        for day in days:
+            for opens, closes in _intervals(value):
+                start = day * MINUTES_PER_DAY + opens
+                length = closes - opens
+                bits = ((1 << length) - 1) << start
+                # Sunday night spills over into Monday morning
+                mask |= (bits | bits >> MINUTES_PER_WEEK) & ALWAYS_OPEN
+    return mask
+
+
+def minute_of_week(moment: datetime) -> int:
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+class OpeningHoursIndex:
+    """Bitmaps for every restaurant, loaded once and reloaded on invalidate() or an unknown id"""
+
+    def __init__(self):
+        self._masks: Optional[Dict[int, int]] = None
+        self._db_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[int, int]:
+        from . import database
+        with self._lock:
+            if self._masks is None or self._db_path != database.DB_PATH:
+                with DatabaseManager() as db:
+                    rows = db.execute_query("SELECT restaurant_id, opening_hours FROM Restaurant")
+                self._masks = {restaurant_id: parse_opening_hours(raw) for restaurant_id, raw in rows}
+                self._db_path = database.DB_PATH
+            return self._masks
+
+    def invalidate(self):
+        with self._lock:
+            self._masks = None
+
+    def mask(self, restaurant_id: int) -> Optional[int]:
+        """The restaurant's weekly bitmap, or None if there is no such restaurant"""
+        masks = self._load()
+        if restaurant_id not in masks:
+            # Possibly added since the index was built
+            self.invalidate()
+            masks = self._load()
+        return masks.get(restaurant_id)
+
+    def is_open(self, restaurant_id: int, moment: datetime) -> bool:
+        mask = self.mask(restaurant_id)
+        return mask is not None and bool(mask >> minute_of_week(moment) & 1)
+
+    def open_restaurants(self, moment: datetime) -> List[int]:
+        """Ids of the restaurants open at `moment`"""
+        minute = minute_of_week(moment)
+        return [restaurant_id for restaurant_id, mask in self._load().items() if mask >> minute & 1]
+
+
+opening_hours_index = OpeningHoursIndex()
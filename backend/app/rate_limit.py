@@ -0,0 +1,256 @@
+"""
+Rate limiting and admission control for the GoodFoods API
+Token buckets per client plus a global concurrency limiter per route
+"""
+
+import asyncio
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+
+# Proxies (addresses or CIDR ranges, comma-separated) whose X-Forwarded-For is believed
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str]) -> str:
+    """
+    The caller's address: the connection's peer, unless the peer is a trusted
+    proxy, in which case the nearest X-Forwarded-For entry that isn't one
+    """
+    address = peer or "unknown"
+    if forwarded_for and _trusted(address):
+        for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+            address = hop
+            if not _trusted(hop):
+                break
+    return address
+
+
+@dataclass
+class RouteLimit:
+    """Admission settings for a single route"""
+    requests_per_minute: float
+    burst: int
+    max_concurrent: int
+    max_queue: int
+    queue_timeout: float
+
+    @classmethod
+    def from_env(cls, prefix: str, **defaults) -> "RouteLimit":
+        """Read the settings from <PREFIX>_RATE_LIMIT_PER_MINUTE, <PREFIX>_MAX_CONCURRENT, ..."""
+        return cls(
+            requests_per_minute=float(os.getenv(f"{prefix}_RATE_LIMIT_PER_MINUTE", defaults["requests_per_minute"])),
+            burst=int(os.getenv(f"{prefix}_RATE_LIMIT_BURST", defaults["burst"])),
+            max_concurrent=int(os.getenv(f"{prefix}_MAX_CONCURRENT", defaults["max_concurrent"])),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", defaults["max_queue"])),
+            queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", defaults["queue_timeout"])),
+        )
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def wait(self) -> float:
+        """Refill; returns the seconds until a token is available (0 when one is)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            return 0.0
+
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        wait = self.wait()
+        if wait == 0:
+            self.tokens -= 1
+            return True, 0.0
+        return False, wait
+
+
+class RateLimiter:
+    """Per-key token buckets, keeping only the most recently seen keys"""
+
+    def __init__(self, requests_per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def check(self, *keys: str) -> Tuple[bool, float]:
+        """
+        Take a token from the bucket of every key (e.g. the caller's session
+        and its address), only if each of them has one
+        """
+        buckets = [self._bucket(key) for key in keys]
+        wait = max(bucket.wait() for bucket in buckets)
+        if wait > 0:
+            return False, wait
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return True, 0.0
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests. Requests beyond the cap wait in a bounded queue;
+    when the queue is full (or the wait times out) they are shed immediately.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self.in_flight = 0
+        self.shed = 0
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; returns False if the request should be shed"""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self.shed += 1
+            return False
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        finally:
+            self._waiting -= 1
+
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+
+class AdmissionController:
+    """Applies the configured RouteLimit to each matching route"""
+
+    def __init__(self, route_limits: Dict[str, RouteLimit]):
+        self.route_limits = route_limits
+        self._rate_limiters = {
+            route: RateLimiter(limit.requests_per_minute, limit.burst)
+            for route, limit in route_limits.items()
+        }
+        self._concurrency_limiters = {
+            route: ConcurrencyLimiter(limit.max_concurrent, limit.max_queue, limit.queue_timeout)
+            for route, limit in route_limits.items()
+        }
+
+    def match(self, path: str) -> Optional[str]:
+        """Return the configured route for a request path, if any"""
+        for route in self.route_limits:
+            if path == route or path.startswith(route.rstrip("/") + "/"):
+                return route
+        return None
+
+    def check_rate(self, route: str, *client_keys: str) -> Tuple[bool, float]:
+        return self._rate_limiters[route].check(*client_keys)
+
+    def concurrency(self, route: str) -> ConcurrencyLimiter:
+        return self._concurrency_limiters[route]
+
+    def status(self) -> Dict[str, Dict]:
+        """Current queue depth and shed counts per route"""
+        return {
+            route: {
+                "in_flight": limiter.in_flight,
+                "waiting": limiter.waiting,
+                "shed": limiter.shed,
+                "max_concurrent": limiter.max_concurrent,
+                "max_queue": limiter.max_queue,
+            }
+            for route, limiter in self._concurrency_limiters.items()
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware applying an AdmissionController: a fast 429 for
+    requests over any of their client keys' rates or beyond the route's wait queue. The
+    concurrency slot is held until the response body has been sent, streamed
+    bodies included.
+    """
+
+    def __init__(self, app, controller: AdmissionController,
+                 client_keys: Callable[[dict], Awaitable[Sequence[str]]]):
+        self.app = app
+        self.controller = controller
+        self.client_keys = client_keys
+
+    async def __call__(self, scope, receive, send):
+        route = self.controller.match(scope["path"]) if scope["type"] == "http" else None
+        if route is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = self.controller.check_rate(route, *await self.client_keys(scope))
+        if not allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded. Please slow down."},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        limiter = self.controller.concurrency(route)
+        if not await limiter.acquire():
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Server is busy. Please retry shortly."},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
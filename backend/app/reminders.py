@@ -0,0 +1,264 @@
+"""
+Booking reminder scheduler for the GoodFoods API
+Sends each confirmed booking a reminder at every lead time in
+REMINDER_LEAD_MINUTES (by default a day and two hours ahead), to cut no-shows.
+
+Upcoming reminders sit in a heap ordered by due time. It is filled by two
+incremental range scans, so no poll ever reads the whole Booking table:
+  - a time window: bookings whose reminder falls due in the next
+    REMINDER_LOOKAHEAD_SECONDS, read through the (status, booking_time) index
+    and advanced each poll from where the previous one stopped
+  - new bookings: rows above the highest booking_id seen, which catches
+    bookings made after their reminder's window was already scanned
+Due reminders are claimed in the BookingReminder ledger (cancelled bookings
+are dropped at that point) and handed to the notifier in batches. The ledger
+makes each reminder go out once even with several workers running a scheduler.
+"""
+
+import asyncio
+import heapq
+import importlib
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .database import DatabaseManager
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() == "true"
+REMINDER_LEAD_MINUTES = [int(lead) for lead in os.getenv("REMINDER_LEAD_MINUTES", "1440,120").split(",") if lead.strip()]
+REMINDER_POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", "30"))
+REMINDER_LOOKAHEAD_SECONDS = float(os.getenv("REMINDER_LOOKAHEAD_SECONDS", "120"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+# On start, reminders that fell due this long ago are still sent (bookings still ahead only)
+REMINDER_CATCHUP_MINUTES = float(os.getenv("REMINDER_CATCHUP_MINUTES", "60"))
+REMINDER_RETRY_SECONDS = float(os.getenv("REMINDER_RETRY_SECONDS", "60"))
+# "log", or "package.module:factory" returning an object with send(reminders)
+REMINDER_NOTIFIER = os.getenv("REMINDER_NOTIFIER", "log")
+
+BOOKING_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass
+class Reminder:
+    """One reminder for one booking, with what a message needs"""
+    booking_id: int
+    lead_minutes: int
+    due: datetime
+    booking_time: str
+    party_size: int
+    user_name: str
+    phone_number: str
+    restaurant_name: str
+
+    @property
+    def kind(self) -> str:
+        return f"reminder_{self.lead_minutes}m"
+
+
+class LogNotifier:
+    """Local stand-in for an SMS/WhatsApp gateway: prints the messages it would send"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, reminders: List[Reminder]):
+        for reminder in reminders:
+            print(f"[reminder] to {reminder.phone_number}: Hi {reminder.user_name}, a reminder of your table for "
+                  f"{reminder.party_size} at {reminder.restaurant_name} on {reminder.booking_time[:16]} "
+                  f"(booking GF{reminder.booking_id:06d}).")
+        self.sent += len(reminders)
+
+
+def load_notifier(spec: str = REMINDER_NOTIFIER):
+    """The notifier named by REMINDER_NOTIFIER"""
+    if spec == "log":
+        return LogNotifier()
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+class ReminderScheduler:
+    """Finds due reminders with incremental index scans and dispatches them in batches"""
+
+    def __init__(self, notifier=None, lead_minutes: Optional[List[int]] = None,
+                 lookahead_seconds: float = REMINDER_LOOKAHEAD_SECONDS, batch_size: int = REMINDER_BATCH_SIZE,
+                 catchup_minutes: float = REMINDER_CATCHUP_MINUTES):
+        self.notifier = notifier if notifier is not None else load_notifier()
+        self.leads = sorted(lead_minutes or REMINDER_LEAD_MINUTES, reverse=True)
+        self.lookahead = timedelta(seconds=lookahead_seconds)
+        self.batch_size = batch_size
+        self.catchup = timedelta(minutes=catchup_minutes)
+        self.db = DatabaseManager()
+        self._heap: List[Tuple[datetime, int, int]] = []
+        self._queued: Set[Tuple[int, int]] = set()
+        # Reminders due up to here have been read from the time window
+        self.scanned_until: Optional[datetime] = None
+        self.last_booking_id: Optional[int] = None
+        self.stats: Dict[str, Any] = {"sent": 0, "skipped": 0, "failed": 0, "scanned_rows": 0,
+                                      "last_poll_ms": 0.0, "polls": 0}
+        self._task: Optional[asyncio.Task] = None
+        self.db.execute_query("""
+            CREATE TABLE IF NOT EXISTS BookingReminder (
+                booking_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                sent_at DATETIME NOT NULL,
+                PRIMARY KEY (booking_id, kind)
+            ) WITHOUT ROWID
+        """)
+        # Also created by setup_database; built here for databases that predate it
+        self.db.execute_query("CREATE INDEX IF NOT EXISTS idx_booking_status_time ON Booking (status, booking_time)")
+
+    def _push(self, booking_id: int, booking_time: datetime, lead: int):
+        if (booking_id, lead) not in self._queued:
+            self._queued.add((booking_id, lead))
+            heapq.heappush(self._heap, (booking_time - timedelta(minutes=lead), booking_id, lead))
+
+    def _scan_window(self, start: datetime, end: datetime):
+        """Queue reminders falling due in (start, end]: one index range scan per lead time"""
+        for lead in self.leads:
+            offset = timedelta(minutes=lead)
+            rows = self.db.execute_query(
+                """
+                SELECT booking_id, booking_time FROM Booking
+                WHERE status = 'confirmed' AND booking_time > ? AND booking_time <= ?
+                """,
+                [(start + offset).strftime(BOOKING_TIME_FORMAT), (end + offset).strftime(BOOKING_TIME_FORMAT)]
+            )
+            self.stats["scanned_rows"] += len(rows)
+            for booking_id, booking_time in rows:
+                self._push(booking_id, datetime.fromisoformat(booking_time), lead)
+
+    def _scan_new_bookings(self, now: datetime):
+        """Queue reminders of bookings made since the last poll that are already due or overdue"""
+        rows = self.db.execute_query(
+            "SELECT booking_id, booking_time, status FROM Booking WHERE booking_id > ? ORDER BY booking_id",
+            [self.last_booking_id]
+        )
+        self.stats["scanned_rows"] += len(rows)
+        for booking_id, booking_time, status in rows:
+            self.last_booking_id = booking_id
+            booking_time = datetime.fromisoformat(booking_time)
+            if status != "confirmed" or booking_time <= now:
+                continue
+            for lead in self.leads:
+                # Later due times are still ahead of the window and will be scanned then
+                if booking_time - timedelta(minutes=lead) <= self.scanned_until:
+                    self._push(booking_id, booking_time, lead)
+
+    def refresh(self, now: datetime):
+        """Advance both scans up to `now` plus the lookahead"""
+        if self.scanned_until is None:
+            self.scanned_until = now - self.catchup
+            rows = self.db.execute_query("SELECT COALESCE(MAX(booking_id), 0) FROM Booking")
+            self.last_booking_id = rows[0][0] if rows else 0
+        else:
+            self._scan_new_bookings(now)
+        until = now + self.lookahead
+        if until > self.scanned_until:
+            self._scan_window(self.scanned_until, until)
+            self.scanned_until = until
+
+    def _claim(self, due: List[Tuple[datetime, int, int]], now: datetime) -> List[Reminder]:
+        """Record the reminders as sent and return those still to send (confirmed, not sent before)"""
+        reminders = []
+        with self.db.transaction() as conn:
+            for due_at, booking_id, lead in due:
+                kind = f"reminder_{lead}m"
+                row = conn.execute(
+                    """
+                    SELECT b.booking_time, b.num_guests, u.name, u.phone_number, r.name
+                    FROM Booking b
+                    JOIN User u ON u.user_id = b.user_id
+                    JOIN Restaurant r ON r.restaurant_id = b.restaurant_id
+                    WHERE b.booking_id = ? AND b.status = 'confirmed' AND b.booking_time > ?
+                    AND NOT EXISTS (SELECT 1 FROM BookingReminder WHERE booking_id = ? AND kind = ?)
+                    """,
+                    [booking_id, now.strftime(BOOKING_TIME_FORMAT), booking_id, kind]
+                ).fetchone()
+                if row is None:
+                    self.stats["skipped"] += 1
+                    continue
+                conn.execute("INSERT INTO BookingReminder (booking_id, kind, sent_at) VALUES (?, ?, ?)",
+                             [booking_id, kind, now.strftime(BOOKING_TIME_FORMAT)])
+                reminders.append(Reminder(booking_id, lead, due_at, *row))
+        return reminders
+
+    def _release(self, reminders: List[Reminder], now: datetime):
+        """Undo the claims of a batch the notifier failed to send, and retry it later"""
+        with self.db.transaction() as conn:
+            conn.executemany("DELETE FROM BookingReminder WHERE booking_id = ? AND kind = ?",
+                             [(reminder.booking_id, reminder.kind) for reminder in reminders])
+        retry_at = now + timedelta(seconds=REMINDER_RETRY_SECONDS)
+        for reminder in reminders:
+            self._queued.add((reminder.booking_id, reminder.lead_minutes))
+            heapq.heappush(self._heap, (retry_at, reminder.booking_id, reminder.lead_minutes))
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """One poll: refresh the queue, then claim and send everything due. Returns the number sent."""
+        now = now or datetime.now()
+        start = time.perf_counter()
+        self.refresh(now)
+        sent = 0
+        while self._heap and self._heap[0][0] <= now:
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard((entry[1], entry[2]))
+                due.append(entry)
+            reminders = self._claim(due, now)
+            if not reminders:
+                continue
+            try:
+                self.notifier.send(reminders)
+            except Exception as e:
+                print(f"Reminder notifier failed for {len(reminders)} reminders: {e}")
+                self.stats["failed"] += len(reminders)
+                self._release(reminders, now)
+                break
+            sent += len(reminders)
+        self.stats["sent"] += sent
+        self.stats["polls"] += 1
+        self.stats["last_poll_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return sent
+
+    def next_due(self) -> Optional[datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    async def run(self, poll_seconds: float = REMINDER_POLL_SECONDS):
+        """Poll forever: at least every `poll_seconds`, sooner when a queued reminder falls due"""
+        while True:
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                print(f"Reminder scheduler poll failed: {e}")
+            delay = poll_seconds
+            next_due = self.next_due()
+            if next_due is not None:
+                delay = min(delay, max(0.0, (next_due - datetime.now()).total_seconds()))
+            await asyncio.sleep(delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": len(self._heap),
+            "next_due": self.next_due().strftime(BOOKING_TIME_FORMAT) if self._heap else None,
+            "scanned_until": self.scanned_until.strftime(BOOKING_TIME_FORMAT) if self.scanned_until else None,
+            "lead_minutes": self.leads,
+        }
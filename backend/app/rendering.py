@@ -0,0 +1,178 @@
+"""
+Response rendering for the GoodFoods AI Agent
+Turns tool results into user-facing messages. Each tool has one renderer,
+registered once at import with its message templates; date and time
+formatting is cached and follows the configured locale (RESPONSE_LOCALE).
+"""
+
+import os
+from datetime import date as date_type
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Dict
+
+# Date/time conventions per locale. Formats are applied by hand rather than
+# through the `locale` module, which is process-wide and not thread-safe.
+LOCALES = {
+    "en_US": {"date": "{month} {day:02d}, {year}", "clock": 12},
+    "en_IN": {"date": "{day:02d} {month} {year}", "clock": 12},
+    "en_GB": {"date": "{day:02d} {month} {year}", "clock": 24},
+}
+RESPONSE_LOCALE = os.getenv("RESPONSE_LOCALE", "en_US")
+
+MONTHS = ("January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December")
+
+# How many items list replies show before summarizing the rest
+MAX_RESTAURANTS_SHOWN = 3
+MAX_ALTERNATIVE_TIMES = 5
+
+
+@lru_cache(maxsize=1024)
+def format_time(value: str, locale: str = RESPONSE_LOCALE) -> str:
+    """'19:00' -> '07:00 PM' (12-hour locales) or '19:00'; unparseable values pass through"""
+    try:
+        hour_text, minute_text = value.split(":")
+        hour, minute = int(hour_text), int(minute_text)
+    except (AttributeError, ValueError):
+        return value
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return value
+    if LOCALES.get(locale, LOCALES["en_US"])["clock"] == 24:
+        return value
+    return f"{(hour - 1) % 12 + 1:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+@lru_cache(maxsize=1024)
+def format_date(value: str, locale: str = RESPONSE_LOCALE) -> str:
+    """'2025-08-02' -> 'August 02, 2025' (en_US); unparseable values pass through"""
+    try:
+        parsed = date_type.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    template = LOCALES.get(locale, LOCALES["en_US"])["date"]
+    return template.format(month=MONTHS[parsed.month - 1], day=parsed.day, year=parsed.year)
+
+
+class ResponseRenderer:
+    """Registry of per-tool renderers: tool name -> function(result) -> message"""
+
+    def __init__(self):
+        self._renderers: Dict[str, Callable[[Any], str]] = {}
+
+    def register(self, tool_name: str):
+        """Decorator registering the renderer for a tool"""
+        def decorator(function: Callable[[Any], str]) -> Callable[[Any], str]:
+            self._renderers[tool_name] = function
+            return function
+        return decorator
+
+    def render(self, tool_name: str, result: Any) -> str:
+        renderer = self._renderers.get(tool_name)
+        if renderer is None:
+            return f"Tool {tool_name} executed successfully."
+        return renderer(result)
+
+
+response_renderer = ResponseRenderer()
+
+
+@response_renderer.register("find_restaurants")
+def render_restaurants(result) -> str:
+    if not result:
+        return "I couldn't find any restaurants matching your criteria. Could you try a different location or cuisine type?"
+    if len(result) == 1:
+        restaurant = result[0]
+        return (f"I found {restaurant['name']} in {restaurant['address']}. "
+                f"They serve {restaurant['cuisine_type']} cuisine. Would you like to book a table there?")
+
+    lines = "".join(
+        f"\n{i}. {restaurant['name']} - {restaurant['address']} ({restaurant['cuisine_type']})"
+        for i, restaurant in enumerate(islice(result, MAX_RESTAURANTS_SHOWN), 1)
+    )
+    more = f"\n... and {len(result) - MAX_RESTAURANTS_SHOWN} more" if len(result) > MAX_RESTAURANTS_SHOWN else ""
+    return f"I found {len(result)} restaurants:{lines}{more}\n\nWhich one would you like to book?"
+
+
+@response_renderer.register("check_availability")
+def render_availability(result) -> str:
+    if not result:
+        return ("I'm sorry, but there are no tables available at that time. Would you like me to check for alternative times, "
+                "or add you to the waitlist in case a table frees up?")
+    if len(result) == 1:
+        return f"Great! A table is available at {format_time(result[0])}. Would you like me to proceed with the booking?"
+
+    lines = "".join(f"\n- {format_time(slot)}" for slot in islice(result, MAX_ALTERNATIVE_TIMES))
+    return f"The requested time isn't available, but I found these alternative times:{lines}\n\nWhich time would you prefer?"
+
+
+@response_renderer.register("create_booking")
+def render_booking(result) -> str:
+    if not result.get("success"):
+        return f"I'm sorry, I couldn't complete the booking: {result.get('error', 'Unknown error')}"
+    return (f"Excellent! Your booking is confirmed. Your booking reference is {result['booking_id']}. "
+            f"We look forward to seeing you at {result['restaurant_name']} on {format_date(result.get('date', ''))} "
+            f"at {format_time(result.get('time', ''))} for {result['party_size']} people.")
+
+
+@response_renderer.register("cancel_booking")
+def render_cancellation(result) -> str:
+    if result:
+        return "Your booking has been cancelled successfully. Thank you for letting us know."
+    return "I'm sorry, I couldn't find that booking to cancel. Please check your booking reference number."
+
+
+@response_renderer.register("get_booking_details")
+def render_booking_details(result) -> str:
+    if not result.get("success"):
+        return f"I'm sorry, I couldn't find that booking: {result.get('error', 'Unknown error')}"
+    return (f"Here are your booking details:\n- Booking ID: {result['booking_id']}\n"
+            f"- Restaurant: {result['restaurant_name']}\n- Date: {format_date(result['date'])}\n"
+            f"- Time: {format_time(result['time'])}\n- Party Size: {result['party_size']}\n- Status: {result['status']}")
+
+
+@response_renderer.register("join_waitlist")
+def render_waitlist(result) -> str:
+    if not result.get("success"):
+        return f"I'm sorry, I couldn't add you to the waitlist: {result.get('error', 'Unknown error')}"
+    if result["status"] == "booked":
+        return (f"Good news! A table just freed up, so you're booked: your booking reference is {result['booking_id']}, "
+                f"at {result['restaurant_name']} on {format_date(result['date'])} at {format_time(result['time'])} "
+                f"for {result['party_size']} people.")
+    return (f"You're on the waitlist for {result['restaurant_name']} on {format_date(result['date'])} at "
+            f"{format_time(result['time'])}, number {result['position']} in line. Your waitlist reference is "
+            f"{result['waitlist_id']}. If a table frees up we'll book it for you and send the details to {result['phone_number']}.")
+
+
+@response_renderer.register("leave_waitlist")
+def render_leave_waitlist(result) -> str:
+    if result:
+        return "You've been taken off the waitlist."
+    return "I'm sorry, I couldn't find a waiting entry with that reference. Please check your waitlist reference number."
+
+
+@response_renderer.register("get_waitlist_status")
+def render_waitlist_status(result) -> str:
+    if not result.get("success"):
+        return f"I'm sorry, I couldn't find that waitlist entry: {result.get('error', 'Unknown error')}"
+    slot = f"{result['restaurant_name']} on {format_date(result['date'])} at {format_time(result['time'])}"
+    if result["status"] == "waiting":
+        return f"You're number {result['position']} on the waitlist for {slot}."
+    if result["status"] == "booked":
+        return f"A table freed up and you're booked for {slot}. Your booking reference is {result['booking_id']}."
+    return f"Your waitlist entry for {slot} is {result['status']}."
+
+
+@response_renderer.register("get_menu_specials")
+def render_specials(result) -> str:
+    if not result:
+        return "I'm sorry, but I couldn't find any menu specials at the moment. Please check back later or ask about our regular menu items."
+    if len(result) == 1:
+        special = result[0]
+        return f"Our current special is the {special['name']} - {special['description']} for {special['price']}."
+
+    lines = "".join([
+        f"\n{i}. {special['name']} - {special['description']} ({special['price']})"
+        for i, special in enumerate(result, 1)
+    ])
+    return f"Here are our current menu specials:{lines}\n\nThese are our chef's recommendations for today!"
@@ -0,0 +1,214 @@
+"""
+Response encoding for the GoodFoods API
+orjson-backed JSON responses for the hot endpoints, and gzip/brotli
+compression negotiated from Accept-Encoding for anything large enough to be
+worth it
+"""
+
+import gzip
+import os
+import zlib
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this go out uncompressed: headers and CPU outweigh the savings
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Brotli's higher qualities cost far more CPU for little gain on small JSON bodies
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "text/")
+
+# Falls back to the standard encoder when orjson isn't installed
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def supported_encodings() -> Dict[str, int]:
+    """Encodings this server can produce, in order of preference"""
+    return {"br": 0, "gzip": 1} if brotli is not None else {"gzip": 1}
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best encoding from an Accept-Encoding header: highest q-value
+    first, brotli over gzip on ties. Returns None for identity.
+    """
+    supported = supported_encodings()
+    wildcard = None
+    offers = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name == "*":
+            wildcard = quality
+        elif name in supported:
+            offers[name] = quality
+    if wildcard is not None:
+        for name in supported:
+            offers.setdefault(name, wildcard)
+
+    candidates = [(quality, -supported[name], name) for name, quality in offers.items() if quality > 0]
+    return max(candidates)[2] if candidates else None
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder with a common interface"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._encoder = brotli.Compressor(quality=brotli_quality)
+            self._compress, self._finish = self._encoder.process, self._encoder.finish
+        else:
+            self._encoder = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress, self._finish = self._encoder.compress, self._encoder.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> bytes:
+    """One-shot compression of a complete body"""
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing HTTP responses with the client's preferred
+    encoding. Complete bodies are compressed only from `minimum_size` bytes;
+    streamed bodies (exports) are compressed chunk by chunk as they go out.
+    Responses that already carry a Content-Encoding, or whose type isn't
+    text-like, pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSender(self, encoding, send))
+
+
+class _CompressingSender:
+    """Wraps `send` for one response, deciding on compression once enough of the body is seen"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.pending = []
+        self.pending_size = 0
+
+    def _compressible(self) -> bool:
+        if self.start_message["status"] in (204, 304):
+            return False
+        content_type = ""
+        for name, value in self.start_message["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _set_headers(self, content_length: Optional[int]):
+        headers = [(name, value) for name, value in self.start_message["headers"]
+                   if name not in (b"content-length", b"vary")]
+        vary = [value.decode("latin-1") for name, value in self.start_message["headers"] if name == b"vary"]
+        vary.append("Accept-Encoding")
+        headers.append((b"vary", ", ".join(vary).encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        self.start_message["headers"] = headers
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until the body shows what to do
+            self.start_message = dict(message)
+            self.start_message["headers"] = list(message.get("headers", []))
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        middleware = self.middleware
+
+        if self.compressor is None:
+            if not self._compressible():
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            # Buffer until the threshold is reached: responses routed through
+            # call_next() arrive in several chunks even when they are small
+            self.pending.append(body)
+            self.pending_size += len(body)
+            if more_body and self.pending_size < middleware.minimum_size:
+                return
+            body, self.pending = b"".join(self.pending), []
+            if not more_body:
+                if len(body) < middleware.minimum_size:
+                    self.passthrough = True
+                    await self.send(self.start_message)
+                    await self.send({"type": "http.response.body", "body": body})
+                    return
+                compressed = compress(body, self.encoding, middleware.gzip_level, middleware.brotli_quality)
+                self._set_headers(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            # Streaming: the final length is unknown, so drop Content-Length
+            self.compressor = _Compressor(self.encoding, middleware.gzip_level, middleware.brotli_quality)
+            self._set_headers(None)
+            self.start_message["headers"].append((b"content-encoding", self.encoding.encode("latin-1")))
+            await self.send(self.start_message)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,285 @@
+"""
+Conversation sessions for the GoodFoods chat API
+Each conversation gets its own agent, kept server-side under a session id,
+so clients send only the new message and receive only the new reply.
+A per-session version counter detects clients that fell out of sync.
+With SESSION_BACKEND=database, transcripts (and the booking state the
+agent tracked) are kept in the shared database so every worker process can
+serve every conversation.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .booking_context import BookingState
+from .database import DatabaseManager
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+# "memory" (one process) or "database" (sessions shared between workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+
+
+class VersionConflict(Exception):
+    """The client's version doesn't match the session's; it should resend its history"""
+
+    def __init__(self, version: int):
+        super().__init__(f"Conversation is at version {version}")
+        self.version = version
+
+
+class ChatSession:
+    """One conversation: its agent, a turn counter and a lock serializing its turns"""
+
+    def __init__(self, session_id: str, agent, store: Optional["SessionStore"] = None):
+        self.session_id = session_id
+        self.agent = agent
+        agent.session_id = session_id
+        self.store = store
+        self.version = 0
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def restore(self, history: List[Dict[str, str]]):
+        """Replace the conversation with a client's copy of it"""
+        self.agent.restore_conversation(history)
+        self.version = sum(1 for message in history if message.get("role") == "assistant")
+
+    def run_turn(self, message: str, version: Optional[int] = None,
+                 history: Optional[List[Dict[str, str]]] = None,
+                 listener: Optional[Callable[[str, Dict], None]] = None) -> str:
+        """
+        Answer one message. With `history`, the conversation is first reset
+        to it; otherwise `version`, if given, must match the session's.
+        `listener` receives the agent's tool events during this turn.
+        """
+        with self.lock:
+            if self.store is not None and history is None:
+                self.store.load(self)
+            if history is not None:
+                self.restore(history)
+            elif version is not None and version != self.version:
+                raise VersionConflict(self.version)
+            # A client-supplied transcript replaces whatever is stored
+            previous_version = None if history is not None else self.version
+            self.agent.event_listener = listener
+            try:
+                response = self.agent.get_response(message)
+            finally:
+                self.agent.event_listener = None
+            self.version += 1
+            self.last_used = time.monotonic()
+            if self.store is not None:
+                self.store.save(self, previous_version)
+            return response
+
+
+class SessionStore:
+    """
+    Sessions by id, least recently used first. Sessions idle for longer than
+    `ttl` seconds, and the oldest ones beyond `max_sessions`, are dropped;
+    clients recover by resending their history.
+    """
+
+    def __init__(self, agent_factory: Callable, ttl: float = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX):
+        self.agent_factory = agent_factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+
+    def _evict(self, now: float):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_used < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def exists(self, session_id: str) -> bool:
+        """Whether the id names a live session, without touching it"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is not None and time.monotonic() - session.last_used < self.ttl
+
+    def create(self) -> ChatSession:
+        """A new, empty session under a fresh unguessable id"""
+        session = self._new_session(secrets.token_urlsafe(16))
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            self.created += 1
+            self._evict(time.monotonic())
+        return session
+
+    def _new_session(self, session_id: str) -> ChatSession:
+        return ChatSession(session_id, self.agent_factory())
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "ttl_seconds": self.ttl,
+                "max_sessions": self.max_sessions,
+            }
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Sessions kept in the ChatSession table, for several worker processes on
+    one database. Each worker caches agents for the conversations it served
+    (the in-memory store's LRU); before a turn the cached agent is brought up
+    to date from the stored transcript if another worker answered in between,
+    and the new transcript is written back only if the version it started from
+    is still current, so a turn raced by another worker ends in a conflict.
+    """
+
+    def __init__(self, agent_factory: Callable, ttl: float = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX):
+        super().__init__(agent_factory, ttl, max_sessions)
+        self.db = DatabaseManager()
+        self.db.execute_query("""
+            CREATE TABLE IF NOT EXISTS ChatSession (
+                session_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                history TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                booking_state TEXT
+            ) WITHOUT ROWID
+        """)
+        # Tables created before booking state was stored with the transcript
+        columns = [column[1] for column in self.db.execute_query("PRAGMA table_info(ChatSession)")]
+        if "booking_state" not in columns:
+            self.db.execute_query("ALTER TABLE ChatSession ADD COLUMN booking_state TEXT")
+
+    @staticmethod
+    def _restore_stored(session: ChatSession, version: int, history: str, booking_state: Optional[str]):
+        """Bring a session to a stored transcript, with the booking state its tool results left"""
+        session.restore(json.loads(history))
+        session.version = version
+        if booking_state:
+            session.agent.current_booking_context = BookingState.from_dict(json.loads(booking_state))
+
+    def _new_session(self, session_id: str) -> ChatSession:
+        return ChatSession(session_id, self.agent_factory(), store=self)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        session = super().get(session_id)
+        if session is not None:
+            return session
+        # Started on (or last served by) another worker
+        rows = self.db.execute_query(
+            "SELECT version, history, booking_state FROM ChatSession WHERE session_id = ? AND updated_at >= ?",
+            [session_id, time.time() - self.ttl]
+        )
+        if not rows:
+            return None
+        session = self._new_session(session_id)
+        self._restore_stored(session, *rows[0])
+        with self._lock:
+            self._sessions[session_id] = session
+            self._evict(time.monotonic())
+        return session
+
+    def exists(self, session_id: str) -> bool:
+        if super().exists(session_id):
+            return True
+        return bool(self.db.execute_query(
+            "SELECT 1 FROM ChatSession WHERE session_id = ? AND updated_at >= ?", [session_id, time.time() - self.ttl]
+        ))
+
+    def create(self) -> ChatSession:
+        session = super().create()
+        now = time.time()
+        self.db.execute_query(
+            "INSERT INTO ChatSession (session_id, version, history, updated_at) VALUES (?, 0, '[]', ?)",
+            [session.session_id, now]
+        )
+        # Expired conversations are swept now and then rather than on every read
+        if self.created % 100 == 1:
+            self.db.execute_query("DELETE FROM ChatSession WHERE updated_at < ?", [now - self.ttl])
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        with self.db.transaction() as conn:
+            stored = conn.execute("DELETE FROM ChatSession WHERE session_id = ?", [session_id]).rowcount > 0
+        return super().delete(session_id) or stored
+
+    def load(self, session: ChatSession):
+        """Catch the session's agent up with turns other workers answered"""
+        rows = self.db.execute_query(
+            "SELECT version, history, booking_state FROM ChatSession WHERE session_id = ?", [session.session_id]
+        )
+        if not rows:
+            # Reset or expired on another worker: the conversation starts over
+            if session.version:
+                session.restore([])
+        elif rows[0][0] != session.version:
+            self._restore_stored(session, *rows[0])
+
+    def save(self, session: ChatSession, previous_version: Optional[int]):
+        """
+        Store the transcript after a turn that started from `previous_version`
+        (None: overwrite), unless another worker got there first
+        """
+        with self.db.transaction() as conn:
+            updated = conn.execute(
+                """
+                INSERT INTO ChatSession (session_id, version, history, updated_at, booking_state)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    version = excluded.version, history = excluded.history, updated_at = excluded.updated_at,
+                    booking_state = excluded.booking_state
+                WHERE ? IS NULL OR ChatSession.version = ?
+                """,
+                [session.session_id, session.version, json.dumps(session.agent.conversation_history),
+                 time.time(), json.dumps(session.agent.current_booking_context.to_dict()),
+                 previous_version, previous_version]
+            ).rowcount
+            current = None if updated else conn.execute(
+                "SELECT version FROM ChatSession WHERE session_id = ?", [session.session_id]
+            ).fetchone()
+        if current is not None:
+            # This worker's copy diverged from the stored one; drop it so the
+            # next turn starts from the stored transcript
+            super().delete(session.session_id)
+            raise VersionConflict(current[0])
+
+    def stats(self) -> Dict[str, float]:
+        stats = super().stats()
+        stats["cached"] = stats.pop("active")
+        rows = self.db.execute_query(
+            "SELECT COUNT(*) FROM ChatSession WHERE updated_at >= ?", [time.time() - self.ttl]
+        )
+        stats["active"] = rows[0][0] if rows else 0
+        stats["backend"] = "database"
+        return stats
+
+
+def create_session_store(agent_factory: Callable) -> SessionStore:
+    """The session store selected by SESSION_BACKEND"""
+    if SESSION_BACKEND == "database":
+        return SharedSessionStore(agent_factory)
+    return SessionStore(agent_factory)
@@ -0,0 +1,135 @@
+"""
+Speculative tool prefetch for the GoodFoods AI Agent
+While the model is generating, read-only tool calls that the booking context
+makes likely are executed in parallel. If the model then asks for the same
+call, the prefetched result is used; otherwise it is discarded.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from .tool_registry import ToolRegistry, ToolValidationError
+
+# Only side-effect free tools are ever run speculatively
+SPECULATIVE_TOOLS = ("check_availability", "get_booking_details")
+
+
+def predict_tool_calls(context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Likely next read-only tool calls given the booking context"""
+    predictions = []
+    if all(context.get(slot) for slot in ("restaurant_id", "date", "time", "party_size")):
+        predictions.append({
+            "name": "check_availability",
+            "arguments": {
+                "restaurant_id": context["restaurant_id"],
+                "date": context["date"],
+                "time": context["time"],
+                "party_size": context["party_size"],
+            },
+        })
+    if context.get("booking_id"):
+        predictions.append({"name": "get_booking_details", "arguments": {"booking_id": context["booking_id"]}})
+    return predictions
+
+
+def _call_key(name: str, arguments: Dict[str, Any]) -> Tuple:
+    return name, tuple(sorted(arguments.items()))
+
+
+class Speculation:
+    """Prefetches started for one agent turn"""
+
+    def __init__(self, executor: "SpeculativeExecutor"):
+        self._executor = executor
+        self._prefetches: Dict[Tuple, Tuple[Future, float]] = {}
+        self._claimed = set()
+
+    def add(self, key: Tuple, future: Future, started: float):
+        self._prefetches[key] = (future, started)
+
+    def claim(self, name: str, arguments: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Return (True, result) if this validated call was prefetched successfully"""
+        key = _call_key(name, arguments)
+        prefetch = self._prefetches.get(key)
+        if prefetch is None or key in self._claimed:
+            return False, None
+
+        future, started = prefetch
+        claimed_at = time.perf_counter()
+        try:
+            result, finished = future.result()
+        except Exception:
+            return False, None
+
+        self._claimed.add(key)
+        # Time the real call would have taken from here, bounded by the prefetch duration
+        saved_ms = (min(finished, claimed_at) - started) * 1000
+        self._executor.record_hit(saved_ms)
+        return True, result
+
+    def finish(self):
+        """Discard prefetches the model did not ask for"""
+        for key, (future, _) in self._prefetches.items():
+            if key not in self._claimed:
+                future.cancel()
+                self._executor.record_discard()
+
+
+class SpeculativeExecutor:
+    """Runs predicted read-only tool calls on a small thread pool and tracks the hit rate"""
+
+    def __init__(self, registry: ToolRegistry, max_workers: int = 4):
+        self.registry = registry
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-tool")
+        self._lock = threading.Lock()
+        self.prefetched = 0
+        self.hits = 0
+        self.discarded = 0
+        self.saved_ms = 0.0
+
+    def start(self, context: Dict[str, Any]) -> Speculation:
+        """Kick off prefetches for the current context"""
+        speculation = Speculation(self)
+        for call in predict_tool_calls(context):
+            if call["name"] not in SPECULATIVE_TOOLS:
+                continue
+            try:
+                arguments = self.registry.validate(call["name"], call["arguments"])
+            except ToolValidationError:
+                continue
+            function = self.registry.tools[call["name"]].function
+            started = time.perf_counter()
+            speculation.add(
+                _call_key(call["name"], arguments),
+                self._pool.submit(self._run, function, arguments),
+                started
+            )
+            with self._lock:
+                self.prefetched += 1
+        return speculation
+
+    @staticmethod
+    def _run(function, arguments: Dict[str, Any]) -> Tuple[Any, float]:
+        result = function(**arguments)
+        return result, time.perf_counter()
+
+    def record_hit(self, saved_ms: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+
+    def record_discard(self):
+        with self._lock:
+            self.discarded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prefetched": self.prefetched,
+                "hits": self.hits,
+                "discarded": self.discarded,
+                "hit_rate": round(self.hits / self.prefetched, 3) if self.prefetched else 0.0,
+                "latency_saved_ms": round(self.saved_ms, 1),
+            }
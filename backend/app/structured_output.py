@@ -0,0 +1,219 @@
+"""
+Structured tool-call output for the GoodFoods AI Agent
+Derives a JSON schema for tool calls from tool_definitions.tools, used for
+grammar-guided decoding on local backends, and validates/repairs free-text
+model output (Vertex AI) so malformed JSON does not cost another turn.
+"""
+
+import ast
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PYTHON_LITERALS = re.compile(r"\b(True|False|None)\b")
+_JSON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# Double-quoted JSON strings, kept as they are by the repairs
+_JSON_STRING = re.compile(r'("(?:[^"\\]|\\.)*")')
+
+
+def build_tool_call_schema(tools: List[Dict]) -> Dict:
+    """
+    JSON schema for one model turn: either {"tool_calls": [...]} with each call
+    constrained to a known tool and its parameters, or {"message": "..."}.
+    """
+    call_schemas = []
+    for tool in tools:
+        function = tool["function"]
+        parameters = dict(function.get("parameters", {"type": "object", "properties": {}}))
+        parameters["additionalProperties"] = False
+        call_schemas.append({
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "enum": [function["name"]]},
+                "arguments": parameters,
+            },
+            "required": ["name", "arguments"],
+            "additionalProperties": False,
+        })
+
+    return {
+        "anyOf": [
+            {
+                "type": "object",
+                "properties": {
+                    "tool_calls": {"type": "array", "items": {"anyOf": call_schemas}, "minItems": 1}
+                },
+                "required": ["tool_calls"],
+                "additionalProperties": False,
+            },
+            {
+                "type": "object",
+                "properties": {"message": {"type": "string"}},
+                "required": ["message"],
+                "additionalProperties": False,
+            },
+        ]
+    }
+
+
+def _balanced_json(text: str, start: int) -> Tuple[str, bool]:
+    """
+    Scan from the '{' at `start`, tracking strings and nesting. Returns the
+    object text and whether it was complete; truncated output is closed off.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:i + 1], True
+
+    # Output was cut off: close the open string and brackets
+    tail = '"' if in_string else ""
+    return text[start:] + tail + "".join(reversed(stack)), False
+
+
+def _loads_with_repair(candidate: str) -> Tuple[Optional[Any], bool]:
+    """json.loads, falling back to common repairs. Returns (value, repaired)."""
+    try:
+        return json.loads(candidate), False
+    except json.JSONDecodeError:
+        pass
+
+    # Trailing commas and Python literals, fixed outside string values only
+    # (a special request may well say "None")
+    parts = _JSON_STRING.split(candidate)
+    for i in range(0, len(parts), 2):
+        parts[i] = _PYTHON_LITERALS.sub(lambda match: _JSON_LITERALS[match.group(1)],
+                                        _TRAILING_COMMA.sub(r"\1", parts[i]))
+    try:
+        return json.loads("".join(parts)), True
+    except json.JSONDecodeError:
+        pass
+
+    # A Python dict/list literal (single quotes, True/None)
+    try:
+        value = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None, True
+    return (value, True) if isinstance(value, (dict, list)) else (None, True)
+
+
+def _normalize_call(raw: Any) -> Optional[Dict]:
+    """Accept the common shapes models emit for a single call"""
+    if not isinstance(raw, dict):
+        return None
+    if "function" in raw and isinstance(raw["function"], dict):
+        raw = raw["function"]
+    name = raw.get("name")
+    arguments = raw.get("arguments", raw.get("args", raw.get("parameters", {})))
+    if isinstance(arguments, str):
+        arguments, _ = _loads_with_repair(arguments)
+    if not isinstance(name, str) or not isinstance(arguments, dict):
+        return None
+    return {"name": name, "arguments": arguments}
+
+
+class ToolCallParser:
+    """Extracts and validates tool calls from model output against the tool definitions"""
+
+    def __init__(self, tools: List[Dict]):
+        self.schema = build_tool_call_schema(tools)
+        self._tools = {}
+        for tool in tools:
+            function = tool["function"]
+            parameters = function.get("parameters", {})
+            self._tools[function["name"]] = (
+                set(parameters.get("properties", {})),
+                list(parameters.get("required", [])),
+            )
+        self._lock = threading.Lock()
+        self.stats = {"tool_calls": 0, "messages": 0, "repaired": 0, "text": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _validate(self, call: Dict) -> Optional[str]:
+        """Drop unknown arguments; return an error if the call cannot be executed"""
+        if call["name"] not in self._tools:
+            return f"Unknown tool '{call['name']}'"
+        allowed, required = self._tools[call["name"]]
+        call["arguments"] = {k: v for k, v in call["arguments"].items() if k in allowed and v is not None}
+        missing = [arg for arg in required if arg not in call["arguments"]]
+        if missing:
+            return f"Missing arguments for {call['name']}: {', '.join(missing)}"
+        return None
+
+    def parse(self, content: str) -> Dict:
+        """
+        Returns {"type": "tool_call", "data": [...]}, {"type": "text", "data": str}
+        or {"type": "error", "data": str} when output looked like a call but was unusable.
+        """
+        text = content.strip()
+        fenced = _CODE_FENCE.search(text)
+        if fenced:
+            text = fenced.group(1).strip()
+
+        start = text.find("{")
+        if start == -1:
+            self._count("text")
+            return {"type": "text", "data": content}
+
+        candidate, complete = _balanced_json(text, start)
+        value, repaired = _loads_with_repair(candidate)
+        repaired = repaired or not complete or bool(fenced) or start > 0
+
+        if not isinstance(value, dict):
+            # Prose that merely contains a brace
+            if "tool_calls" not in candidate and '"name"' not in candidate:
+                self._count("text")
+                return {"type": "text", "data": content}
+            self._count("failed")
+            return {"type": "error", "data": "Model returned a malformed tool call"}
+
+        # {"message": "..."} is the structured form of a plain reply
+        if "message" in value and isinstance(value["message"], str) and "tool_calls" not in value:
+            self._count("messages")
+            return {"type": "text", "data": value["message"]}
+
+        raw_calls = value.get("tool_calls")
+        if raw_calls is None and "name" in value:
+            raw_calls = [value]
+        if isinstance(raw_calls, dict):
+            raw_calls = [raw_calls]
+        if not isinstance(raw_calls, list) or not raw_calls:
+            self._count("text")
+            return {"type": "text", "data": content}
+
+        calls = []
+        for raw in raw_calls:
+            call = _normalize_call(raw)
+            error = "Unrecognized tool call format" if call is None else self._validate(call)
+            if error:
+                print(f"Rejected tool call {raw}: {error}")
+                self._count("failed")
+                return {"type": "error", "data": error}
+            calls.append(call)
+
+        self._count("repaired" if repaired else "tool_calls")
+        return {"type": "tool_call", "data": calls}
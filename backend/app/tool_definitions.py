@@ -19,6 +19,27 @@ tools = [
                     "cuisine": {
                         "type": "string", 
                         "description": "The type of cuisine to filter restaurants by. Examples: 'Italian', 'Chinese', 'North Indian', 'South Indian', 'Continental', 'Multi-cuisine'. If not provided, will return restaurants of all cuisines."
+                    },
+                    "order_by": {
+                        "type": "string",
+                        "enum": ["rating", "distance", "name"],
+                        "description": "How to order the results: 'rating' for the best rated first, 'distance' for the nearest first (requires latitude and longitude), or 'name'."
+                    },
+                    "latitude": {
+                        "type": "number",
+                        "description": "Latitude of the user's location, used for ordering by distance."
+                    },
+                    "longitude": {
+                        "type": "number",
+                        "description": "Longitude of the user's location, used for ordering by distance."
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of restaurants to return, between 1 and 50. Defaults to 10."
+                    },
+                    "open_at": {
+                        "type": "string",
+                        "description": "Only return restaurants open at this time. Examples: 'now', '7pm' (today), 'Friday 19:00', '2024-08-15 20:00'."
                     }
                 },
                 "required": []
@@ -133,6 +154,81 @@ tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "join_waitlist",
+            "description": "Adds the customer to the waitlist for a time slot that is fully booked. Use this when check_availability shows the requested time is not available and the customer prefers to wait for that exact time instead of taking an alternative. If a table frees up, the customer is booked automatically and the booking reference is sent to them.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "restaurant_id": {
+                        "type": "integer",
+                        "description": "The unique identifier of the restaurant. This should be obtained from the find_restaurants tool results."
+                    },
+                    "user_name": {
+                        "type": "string",
+                        "description": "The full name of the person joining the waitlist."
+                    },
+                    "phone_number": {
+                        "type": "string",
+                        "description": "The contact phone number, used to confirm the booking if a table frees up. Should be in Indian format: +91-XXXXXXXXXX or 10-digit number."
+                    },
+                    "date": {
+                        "type": "string",
+                        "description": "The date of the fully booked slot. Accepts formats: 'YYYY-MM-DD' (e.g., '2024-08-15'), 'today', 'tomorrow', or specific days like 'Friday'."
+                    },
+                    "time": {
+                        "type": "string",
+                        "description": "The time of the fully booked slot. Accepts formats: 'HH:MM' (24-hour, e.g., '19:00'), 'H:MM AM/PM' (12-hour, e.g., '7:00 PM'), or relative times like '7pm'."
+                    },
+                    "party_size": {
+                        "type": "integer",
+                        "description": "The number of guests. Must be between 1 and 10 guests."
+                    },
+                    "special_requests": {
+                        "type": "string",
+                        "description": "Any special requests, kept for the booking if a table frees up."
+                    }
+                },
+                "required": ["restaurant_id", "user_name", "phone_number", "date", "time", "party_size"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "leave_waitlist",
+            "description": "Takes the customer off a waitlist. Use this when customers no longer want to wait for a table they joined the waitlist for.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "waitlist_id": {
+                        "type": "string",
+                        "description": "The waitlist reference number. Format: 'WL' followed by 6 digits (e.g., 'WL000123'). This is provided to customers when they join the waitlist."
+                    }
+                },
+                "required": ["waitlist_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_waitlist_status",
+            "description": "Retrieves a waitlist entry: the customer's place in the queue while they are waiting, or their booking reference once a table freed up for them.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "waitlist_id": {
+                        "type": "string",
+                        "description": "The waitlist reference number. Format: 'WL' followed by 6 digits (e.g., 'WL000123')."
+                    }
+                },
+                "required": ["waitlist_id"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -3,58 +3,218 @@ Tool functions for the GoodFoods AI Agent
 Implements the actual Python functions that correspond to the tool definitions
 """
 
+import base64
 import json
+import math
+import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+from . import booking_events
+from .cache import CoalescingCache
 from .database import DatabaseManager
+from .opening_hours import MINUTES_PER_DAY, opening_hours_index
 
-def find_restaurants(location: str = None, cuisine: str = None) -> List[Dict]:
+# Concurrent identical availability lookups share one DB computation; results are
+# cached briefly and invalidated per (restaurant_id, date) when bookings change
+availability_cache = CoalescingCache(ttl=float(os.getenv("AVAILABILITY_CACHE_TTL", "5")))
+
+def _availability_group(key: tuple) -> tuple:
+    """Cache group of an availability key: (restaurant_id, date)"""
+    return key[0], key[1]
+
+def invalidate_availability(restaurant_id: int, date: str):
+    """Forget cached availability for a restaurant on a given date"""
+    availability_cache.invalidate((restaurant_id, date), _availability_group)
+
+# Restaurant fields a search can return, with the SQL that produces each one
+RESTAURANT_FIELDS = {
+    "id": "restaurant_id",
+    "name": "name",
+    "address": "address",
+    "cuisine_type": "cuisine_type",
+    "rating": "rating",
+    "latitude": "latitude",
+    "longitude": "longitude",
+    "opening_hours": "opening_hours",
+}
+DEFAULT_RESTAURANT_FIELDS = ("id", "name", "address", "cuisine_type", "rating")
+RESTAURANT_ORDERS = ("rating", "distance", "name")
+MAX_PAGE_SIZE = 100
+KM_PER_DEGREE = 111.32
+
+# Databases created before ratings existed get the old fixed rating
+_rating_columns: Dict[str, bool] = {}
+
+def _rating_sql(db: DatabaseManager) -> str:
+    from . import database
+    if database.DB_PATH not in _rating_columns:
+        columns = db.execute_query("PRAGMA table_info(Restaurant)")
+        _rating_columns[database.DB_PATH] = any(column[1] == "rating" for column in columns)
+    return "rating" if _rating_columns[database.DB_PATH] else "4.5"
+
+def _encode_cursor(order_by: Optional[str], values: list) -> str:
+    payload = json.dumps([order_by] + values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, order_by: Optional[str]) -> list:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) < 2 or payload[0] != order_by:
+        raise ValueError("Cursor does not match this ordering")
+    return payload[1:]
+
+def search_restaurants(location: str = None, cuisine: str = None, order_by: str = None,
+                       latitude: float = None, longitude: float = None, fields: List[str] = None,
+                       limit: int = 20, cursor: str = None, open_at: str = None) -> Dict:
+    """
+    One page of restaurants matching location and/or cuisine.
+    
+    Ordering is by rating (best first), distance from latitude/longitude or
+    name, falling back to id; restaurant_id breaks ties so the keyset cursor
+    is stable. Only the requested fields are read from the database.
+    open_at ('YYYY-MM-DD HH:MM') keeps restaurants open at that time.
+    
+    Returns:
+        {"restaurants": [...], "next_cursor": str or None}
+    
+    Raises:
+        ValueError for an unknown field or ordering, a missing reference point or a bad cursor
+    """
+    if order_by is not None and order_by not in RESTAURANT_ORDERS:
+        raise ValueError(f"order_by must be one of: {', '.join(RESTAURANT_ORDERS)}")
+    has_point = latitude is not None and longitude is not None
+    if order_by == "distance" and not has_point:
+        raise ValueError("Ordering by distance needs latitude and longitude")
+    fields = list(fields or DEFAULT_RESTAURANT_FIELDS)
+    unknown = [field for field in fields if field not in RESTAURANT_FIELDS and field != "distance_km"]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if "distance_km" in fields and not has_point:
+        raise ValueError("distance_km needs latitude and longitude")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    
+    with DatabaseManager() as db:
+        columns = dict(RESTAURANT_FIELDS, rating=_rating_sql(db))
+        select = [columns[field] for field in fields if field != "distance_km"]
+        params = []
+        
+        # Squared distance on an equirectangular projection: cheap, and orders
+        # the same as the great-circle distance over city-sized areas
+        if has_point:
+            scale = math.cos(math.radians(latitude))
+            select.append("((latitude - ?) * (latitude - ?) + (longitude - ?) * (longitude - ?) * ? * ?) AS distance_sq")
+            params.extend([latitude, latitude, longitude, longitude, scale, scale])
+        
+        sort_key, descending = {
+            "rating": (columns["rating"], True),
+            "distance": ("distance_sq", False),
+            "name": ("name", False),
+        }.get(order_by, (None, False))
+        if sort_key and sort_key != "distance_sq":
+            select.append(f"{sort_key} AS sort_key")
+        select.append("restaurant_id AS row_id")
+        
+        query = f"SELECT {', '.join(select)} FROM Restaurant WHERE 1=1"
+        
+        if location:
+            query += " AND (address LIKE ? OR name LIKE ?)"
+            location_pattern = f"%{location}%"
+            params.extend([location_pattern, location_pattern])
+        
+        if cuisine:
+            query += " AND cuisine_type LIKE ?"
+            params.append(f"%{cuisine}%")
+        
+        if open_at:
+            open_ids = opening_hours_index.open_restaurants(datetime.strptime(open_at, "%Y-%m-%d %H:%M"))
+            if not open_ids:
+                return {"restaurants": [], "next_cursor": None}
+            query += f" AND restaurant_id IN ({', '.join('?' * len(open_ids))})"
+            params.extend(open_ids)
+        
+        # Keyset pagination: continue strictly after the last row of the previous page.
+        # The outer query sees the computed columns by name, so nothing is bound twice.
+        sort_column = "distance_sq" if sort_key == "distance_sq" else "sort_key"
+        query = f"SELECT * FROM ({query})"
+        if cursor:
+            values = _decode_cursor(cursor, order_by)
+            if sort_key:
+                query += f" WHERE ({sort_column} {'<' if descending else '>'} ? OR ({sort_column} = ? AND row_id > ?))"
+                params.extend([values[0], values[0], values[-1]])
+            else:
+                query += " WHERE row_id > ?"
+                params.append(values[-1])
+        
+        order = [f"{sort_column} {'DESC' if descending else 'ASC'}"] if sort_key else []
+        query += f" ORDER BY {', '.join(order + ['row_id ASC'])} LIMIT ?"
+        params.append(limit + 1)
+        
+        rows = db.execute_query(query, params)
+    
+    restaurants = []
+    for row in rows[:limit]:
+        restaurant = {}
+        position = 0
+        for field in fields:
+            if field == "distance_km":
+                continue
+            restaurant[field] = row[position]
+            position += 1
+        if "opening_hours" in restaurant:
+            restaurant["opening_hours"] = json.loads(restaurant["opening_hours"])
+        if "distance_km" in fields:
+            restaurant["distance_km"] = round(math.sqrt(row[position]) * KM_PER_DEGREE, 2)
+        restaurants.append(restaurant)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(order_by, ([last[-2]] if sort_key else []) + [last[-1]])
+    return {"restaurants": restaurants, "next_cursor": next_cursor}
+
+def find_restaurants(location: str = None, cuisine: str = None, order_by: str = None,
+                     latitude: float = None, longitude: float = None, limit: int = 10,
+                     open_at: str = None) -> List[Dict]:
     """
     Search for restaurants based on location and/or cuisine type.
     
     Args:
         location: Location or area to search for
         cuisine: Type of cuisine to search for
+        order_by: "rating", "distance" (needs latitude/longitude) or "name"
+        limit: Maximum number of restaurants to return
+        open_at: Only restaurants open at this time ('YYYY-MM-DD HH:MM')
     
     Returns:
         List of matching restaurants
     """
     try:
-        with DatabaseManager() as db:
-            # Build query based on provided parameters
-            query = "SELECT * FROM Restaurant WHERE 1=1"
-            params = []
-            
-            if location:
-                query += " AND (address LIKE ? OR name LIKE ?)"
-                location_pattern = f"%{location}%"
-                params.extend([location_pattern, location_pattern])
-            
-            if cuisine:
-                query += " AND cuisine_type LIKE ?"
-                cuisine_pattern = f"%{cuisine}%"
-                params.append(cuisine_pattern)
-            
-            # Execute query
-            restaurants = db.execute_query(query, params)
-            
-            # Format results
-            result = []
-            for restaurant in restaurants:
-                result.append({
-                    "id": restaurant[0],
-                    "name": restaurant[1],
-                    "address": restaurant[2],
-                    "cuisine_type": restaurant[5],  # cuisine_type is at index 5
-                    "rating": 4.5  # Mock rating for now
-                })
-            
-            return result
+        fields = list(DEFAULT_RESTAURANT_FIELDS)
+        if latitude is not None and longitude is not None:
+            fields.append("distance_km")
+        return search_restaurants(
+            location=location, cuisine=cuisine, order_by=order_by,
+            latitude=latitude, longitude=longitude, fields=fields, limit=limit, open_at=open_at
+        )["restaurants"]
             
     except Exception as e:
         print(f"Error in find_restaurants: {e}")
         return []
 
+def get_restaurant(restaurant_id: int) -> Optional[Dict]:
+    """A single restaurant by id, or None"""
+    with DatabaseManager() as db:
+        rating = _rating_sql(db)
+        rows = db.execute_query(
+            f"SELECT restaurant_id, name, address, cuisine_type, {rating} FROM Restaurant WHERE restaurant_id = ?",
+            [restaurant_id]
+        )
+    if not rows:
+        return None
+    return dict(zip(DEFAULT_RESTAURANT_FIELDS, rows[0]))
+
 def check_availability(restaurant_id: int, date: str, time: str, party_size: int) -> List[str]:
     """
     Check for available tables at a specific restaurant.
@@ -68,16 +228,27 @@ def check_availability(restaurant_id: int, date: str, time: str, party_size: int
     Returns:
         List of available time slots
     """
+    key = (restaurant_id, date, time, party_size)
+    available_times = availability_cache.get_or_compute(
+        key,
+        _availability_group(key),
+        lambda: _compute_availability(restaurant_id, date, time, party_size)
+    )
+    # Callers get their own copy of the shared result
+    return list(available_times)
+
+def _compute_availability(restaurant_id: int, date: str, time: str, party_size: int) -> List[str]:
+    """Uncached availability computation against the database"""
     try:
         with DatabaseManager() as db:
-            # Check if restaurant exists
-            restaurant = db.execute_query(
-                "SELECT * FROM Restaurant WHERE restaurant_id = ?", 
-                [restaurant_id]
-            )
-            
-            if not restaurant:
+            # Check if restaurant exists; its opening hours come from the prebuilt index
+            hours = opening_hours_index.mask(restaurant_id)
+            if hours is None:
                 return []
+            day_start = datetime.strptime(date, "%Y-%m-%d").weekday() * MINUTES_PER_DAY
+            
+            def is_open(slot: datetime) -> bool:
+                return bool(hours >> (day_start + slot.hour * 60 + slot.minute) & 1)
             
             # Get all tables for this restaurant
             tables = db.execute_query(
@@ -98,18 +269,22 @@ def check_availability(restaurant_id: int, date: str, time: str, party_size: int
             total_booked = existing_bookings[0][0] if existing_bookings[0][0] else 0
             total_capacity = sum(table[2] for table in tables)  # table[2] is capacity
             
-            # Check if we have enough capacity
-            if total_capacity - total_booked >= party_size:
+            base_time = datetime.strptime(time, "%H:%M")
+            
+            # Check if we have enough capacity while the restaurant is open
+            if total_capacity - total_booked >= party_size and is_open(base_time):
                 return [time]  # Return the requested time if available
             
             # If exact time not available, suggest alternatives
             alternative_times = []
-            base_time = datetime.strptime(time, "%H:%M")
             
             for i in range(-2, 3):  # Check 2 hours before and after
                 if i == 0:
                     continue
                 check_time = base_time + timedelta(hours=i)
+                # Only same-day slots inside opening hours
+                if check_time.date() != base_time.date() or not is_open(check_time):
+                    continue
                 check_time_str = check_time.strftime("%H:%M")
                 
                 # Check availability for this alternative time
@@ -161,38 +336,16 @@ def create_booking(restaurant_id: int, user_name: str, phone_number: str,
             if not restaurant:
                 return {"success": False, "error": "Restaurant not found"}
             
-            # Check availability
-            available_times = check_availability(restaurant_id, date, time, party_size)
-            if not available_times or time not in available_times:
-                return {"success": False, "error": "Requested time not available"}
-            
-            # Create or get user
-            user = db.execute_query(
-                "SELECT * FROM User WHERE phone_number = ?", 
-                [phone_number]
-            )
-            
-            if user:
-                user_id = user[0][0]
-            else:
-                # Create new user
-                db.execute_query(
-                    "INSERT INTO User (name, phone_number) VALUES (?, ?)",
-                    [user_name, phone_number]
-                )
-                user_id = db.get_last_insert_id()
-            
-            # Create booking
-            booking_time = f"{date} {time}:00"
-            db.execute_query(
-                """
-                INSERT INTO Booking (restaurant_id, user_id, booking_time, num_guests, status, special_requests)
-                VALUES (?, ?, ?, ?, 'confirmed', ?)
-                """,
-                [restaurant_id, user_id, booking_time, party_size, special_requests]
-            )
-            
-            booking_id = db.get_last_insert_id()
+            # Holding the write lock, no other booking can take the seats between check and insert
+            with db.transaction() as conn:
+                # Check availability against the live data, never a cached result
+                available_times = _compute_availability(restaurant_id, date, time, party_size)
+                if not available_times or time not in available_times:
+                    return {"success": False, "error": "Requested time not available"}
+                
+                booking_id = _insert_booking(conn, restaurant_id, user_name, phone_number,
+                                             f"{date} {time}:00", party_size, special_requests, "create_booking")
+            invalidate_availability(restaurant_id, date)
             
             return {
                 "success": True,
@@ -209,6 +362,20 @@ def create_booking(restaurant_id: int, user_name: str, phone_number: str,
         print(f"Error in create_booking: {e}")
         return {"success": False, "error": str(e)}
 
+def _insert_booking(conn, restaurant_id: int, user_name: str, phone_number: str, booking_time: str,
+                    party_size: int, special_requests: Optional[str], source: str) -> int:
+    """Insert a confirmed booking (and its user, if new) and its created event inside a transaction; returns the booking id"""
+    conn.execute("INSERT OR IGNORE INTO User (name, phone_number) VALUES (?, ?)", [user_name, phone_number])
+    cursor = conn.execute(
+        """
+        INSERT INTO Booking (restaurant_id, user_id, booking_time, num_guests, status, special_requests)
+        VALUES (?, (SELECT user_id FROM User WHERE phone_number = ?), ?, ?, 'confirmed', ?)
+        """,
+        [restaurant_id, phone_number, booking_time, party_size, special_requests]
+    )
+    booking_events.record(conn, cursor.lastrowid, "created", source)
+    return cursor.lastrowid
+
 def cancel_booking(booking_id: str) -> bool:
     """
     Cancel an existing booking.
@@ -219,34 +386,51 @@ def cancel_booking(booking_id: str) -> bool:
     Returns:
         True if cancellation successful, False otherwise
     """
+    return cancel_and_backfill(booking_id)["success"]
+
+def cancel_and_backfill(booking_id: str) -> Dict:
+    """
+    Cancel a booking and hand the freed seats to the waitlist, in one transaction.
+    
+    Returns:
+        {"success": bool, "waitlist_promoted": [...]} with the waitlist entries
+        that were turned into bookings
+    """
     try:
+        # Extract numeric ID from booking reference
+        if not booking_id.startswith("GF"):
+            return {"success": False, "waitlist_promoted": []}
+        numeric_id = int(booking_id[2:])
+        
         with DatabaseManager() as db:
-            # Extract numeric ID from booking reference
-            if not booking_id.startswith("GF"):
-                return False
-            
-            numeric_id = int(booking_id[2:])
-            
-            # Check if booking exists and is confirmed
-            booking = db.execute_query(
-                "SELECT * FROM Booking WHERE booking_id = ? AND status = 'confirmed'",
-                [numeric_id]
-            )
-            
-            if not booking:
-                return False
-            
-            # Cancel the booking
-            db.execute_query(
-                "UPDATE Booking SET status = 'cancelled' WHERE booking_id = ?",
-                [numeric_id]
-            )
-            
-            return True
+            with db.transaction() as conn:
+                # Check if booking exists and is confirmed
+                booking = conn.execute(
+                    "SELECT restaurant_id, booking_time, num_guests, status FROM Booking "
+                    "WHERE booking_id = ? AND status = 'confirmed'",
+                    [numeric_id]
+                ).fetchone()
+                if not booking:
+                    return {"success": False, "waitlist_promoted": []}
+                
+                restaurant_id, booking_time = booking[:2]
+                conn.execute("UPDATE Booking SET status = 'cancelled' WHERE booking_id = ?", [numeric_id])
+                booking_events.record(conn, numeric_id, "cancelled", "cancel_booking", previous=tuple(booking))
+                
+                # Past slots have nobody left to seat
+                promoted = []
+                if str(booking_time) > datetime.now().strftime("%Y-%m-%d %H:%M:%S"):
+                    promoted = _backfill_slot(conn, restaurant_id, str(booking_time))
+        
+        invalidate_availability(restaurant_id, str(booking_time).split()[0])
+        for entry in promoted:
+            print(f"Waitlist {entry['waitlist_id']} promoted to booking {entry['booking_id']} "
+                  f"after {booking_id} was cancelled")
+        return {"success": True, "waitlist_promoted": promoted}
             
     except Exception as e:
         print(f"Error in cancel_booking: {e}")
-        return False
+        return {"success": False, "waitlist_promoted": []}
 
 def get_booking_details(booking_id: str, phone_number: str = None) -> Dict:
     """
@@ -291,9 +475,9 @@ def get_booking_details(booking_id: str, phone_number: str = None) -> Dict:
             return {
                 "success": True,
                 "booking_id": f"GF{booking_data[0]:06d}",
-                "restaurant_name": booking_data[8],  # restaurant_name
-                "user_name": booking_data[9],        # user_name
-                "phone_number": booking_data[10],    # phone_number
+                "restaurant_name": booking_data[7],  # restaurant_name
+                "user_name": booking_data[8],        # user_name
+                "phone_number": booking_data[9],     # phone_number
                 "date": booking_data[3].split()[0],  # booking_time date part
                 "time": booking_data[3].split()[1][:5],  # booking_time time part
                 "party_size": booking_data[4],
@@ -305,6 +489,215 @@ def get_booking_details(booking_id: str, phone_number: str = None) -> Dict:
         print(f"Error in get_booking_details: {e}")
         return {"success": False, "error": str(e)}
 
+# Waitlist entries are served by priority (higher first), then in the order they joined.
+# The partial index on waiting entries keeps each slot's queue in that order, so the
+# next party is found with one B-tree descent rather than a scan of the slot's entries.
+WAITLIST_ORDER = "priority DESC, waitlist_id ASC"
+
+def _waitlist_reference(waitlist_id: int) -> str:
+    return f"WL{waitlist_id:06d}"
+
+def _free_seats(conn, restaurant_id: int, booking_time: str) -> int:
+    """Seats left at a slot: table capacity less confirmed guests"""
+    return conn.execute(
+        """
+        SELECT (SELECT COALESCE(SUM(capacity), 0) FROM RestaurantTable WHERE restaurant_id = ?)
+             - (SELECT COALESCE(SUM(num_guests), 0) FROM Booking
+                WHERE restaurant_id = ? AND booking_time = ? AND status = 'confirmed')
+        """,
+        [restaurant_id, restaurant_id, booking_time]
+    ).fetchone()[0]
+
+def _backfill_slot(conn, restaurant_id: int, booking_time: str) -> List[Dict]:
+    """
+    Turn waiting entries into bookings while the slot has seats for them, inside
+    the caller's transaction. Each round takes the first entry in queue order
+    that fits the seats left, so a large party at the head doesn't block
+    smaller ones behind it.
+    """
+    promoted = []
+    seats = _free_seats(conn, restaurant_id, booking_time)
+    while seats > 0:
+        entry = conn.execute(
+            f"""
+            SELECT w.waitlist_id, w.num_guests, w.special_requests, u.name, u.phone_number
+            FROM Waitlist w JOIN User u ON u.user_id = w.user_id
+            WHERE w.restaurant_id = ? AND w.booking_time = ? AND w.status = 'waiting' AND w.num_guests <= ?
+            ORDER BY {WAITLIST_ORDER} LIMIT 1
+            """,
+            [restaurant_id, booking_time, seats]
+        ).fetchone()
+        if entry is None:
+            break
+        waitlist_id, party_size, special_requests, user_name, phone_number = entry
+        booking_id = _insert_booking(conn, restaurant_id, user_name, phone_number, booking_time,
+                                     party_size, special_requests, "waitlist")
+        conn.execute("UPDATE Waitlist SET status = 'booked', booking_id = ? WHERE waitlist_id = ?",
+                     [booking_id, waitlist_id])
+        seats -= party_size
+        promoted.append({
+            "waitlist_id": _waitlist_reference(waitlist_id),
+            "booking_id": f"GF{booking_id:06d}",
+            "user_name": user_name,
+            "phone_number": phone_number,
+            "party_size": party_size,
+        })
+    return promoted
+
+def _waitlist_entry(query, waitlist_id: int) -> Optional[Dict]:
+    """A waitlist entry with its place in the queue; `query(sql, params)` returns rows"""
+    rows = query(
+        """
+        SELECT w.waitlist_id, w.restaurant_id, r.name, w.booking_time, w.num_guests, w.priority,
+               w.status, w.booking_id, u.name, u.phone_number
+        FROM Waitlist w
+        JOIN Restaurant r ON r.restaurant_id = w.restaurant_id
+        JOIN User u ON u.user_id = w.user_id
+        WHERE w.waitlist_id = ?
+        """,
+        [waitlist_id]
+    )
+    if not rows:
+        return None
+    waitlist_id, restaurant_id, restaurant_name, booking_time, party_size, priority, status, booking_id, \
+        user_name, phone_number = rows[0]
+    
+    # Entries ahead in the same slot's queue: a range of the waiting-entries index
+    position = None
+    if status == "waiting":
+        position = query(
+            """
+            SELECT COUNT(*) + 1 FROM Waitlist
+            WHERE restaurant_id = ? AND booking_time = ? AND status = 'waiting'
+            AND (priority > ? OR (priority = ? AND waitlist_id < ?))
+            """,
+            [restaurant_id, booking_time, priority, priority, waitlist_id]
+        )[0][0]
+    
+    return {
+        "success": True,
+        "waitlist_id": _waitlist_reference(waitlist_id),
+        "restaurant_name": restaurant_name,
+        "date": booking_time.split()[0],
+        "time": booking_time.split()[1][:5],
+        "party_size": party_size,
+        "status": status,
+        "position": position,
+        "booking_id": f"GF{booking_id:06d}" if booking_id else None,
+        "user_name": user_name,
+        "phone_number": phone_number,
+    }
+
+def join_waitlist(restaurant_id: int, user_name: str, phone_number: str,
+                  date: str, time: str, party_size: int,
+                  special_requests: str = None, priority: int = 0) -> Dict:
+    """
+    Put a party on the waitlist for a full slot.
+    
+    Args:
+        restaurant_id: ID of the restaurant
+        user_name: Name of the person waiting
+        phone_number: Contact phone number
+        date: Date in YYYY-MM-DD format
+        time: Time in HH:MM format
+        party_size: Number of guests
+        special_requests: Any special requests, kept for the booking
+        priority: Higher is served first (staff use; the agent always joins at 0)
+    
+    Returns:
+        Dictionary with the waitlist entry, including its place in the queue.
+        If seats turned up meanwhile the entry is booked straight away and
+        carries the booking_id.
+    """
+    try:
+        with DatabaseManager() as db:
+            restaurant = db.execute_query("SELECT name FROM Restaurant WHERE restaurant_id = ?", [restaurant_id])
+            if not restaurant:
+                return {"success": False, "error": "Restaurant not found"}
+            if not opening_hours_index.is_open(restaurant_id, datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")):
+                return {"success": False, "error": "The restaurant is closed at that time"}
+            if time in _compute_availability(restaurant_id, date, time, party_size):
+                return {"success": False, "error": "A table is available at that time, so it can be booked directly"}
+            
+            booking_time = f"{date} {time}:00"
+            promoted = []
+            with db.transaction() as conn:
+                conn.execute("INSERT OR IGNORE INTO User (name, phone_number) VALUES (?, ?)", [user_name, phone_number])
+                existing = conn.execute(
+                    """
+                    SELECT waitlist_id FROM Waitlist
+                    WHERE restaurant_id = ? AND booking_time = ? AND status = 'waiting'
+                    AND user_id = (SELECT user_id FROM User WHERE phone_number = ?)
+                    """,
+                    [restaurant_id, booking_time, phone_number]
+                ).fetchone()
+                if existing:
+                    waitlist_id = existing[0]
+                else:
+                    waitlist_id = conn.execute(
+                        """
+                        INSERT INTO Waitlist (restaurant_id, user_id, booking_time, num_guests, priority,
+                                              status, special_requests, created_at)
+                        VALUES (?, (SELECT user_id FROM User WHERE phone_number = ?), ?, ?, ?, 'waiting', ?, ?)
+                        """,
+                        [restaurant_id, phone_number, booking_time, party_size, priority, special_requests,
+                         datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+                    ).lastrowid
+                    # Seats freed since the availability check go to the queue, this entry included
+                    promoted = _backfill_slot(conn, restaurant_id, booking_time)
+                entry = _waitlist_entry(lambda sql, params: conn.execute(sql, params).fetchall(), waitlist_id)
+            if promoted:
+                invalidate_availability(restaurant_id, date)
+            return entry
+            
+    except Exception as e:
+        print(f"Error in join_waitlist: {e}")
+        return {"success": False, "error": str(e)}
+
+def leave_waitlist(waitlist_id: str) -> bool:
+    """
+    Take a party off the waitlist.
+    
+    Args:
+        waitlist_id: Waitlist reference number (format: WL123456)
+    
+    Returns:
+        True if the entry was waiting and is now cancelled, False otherwise
+    """
+    try:
+        if not waitlist_id.startswith("WL"):
+            return False
+        with DatabaseManager() as db:
+            with db.transaction() as conn:
+                cursor = conn.execute(
+                    "UPDATE Waitlist SET status = 'cancelled' WHERE waitlist_id = ? AND status = 'waiting'",
+                    [int(waitlist_id[2:])]
+                )
+                return cursor.rowcount == 1
+    except Exception as e:
+        print(f"Error in leave_waitlist: {e}")
+        return False
+
+def get_waitlist_status(waitlist_id: str) -> Dict:
+    """
+    Get a waitlist entry: its place in the queue while waiting, or the booking it became.
+    
+    Args:
+        waitlist_id: Waitlist reference number (format: WL123456)
+    
+    Returns:
+        Dictionary with the waitlist entry
+    """
+    try:
+        if not waitlist_id.startswith("WL"):
+            return {"success": False, "error": "Invalid waitlist ID format"}
+        with DatabaseManager() as db:
+            entry = _waitlist_entry(db.execute_query, int(waitlist_id[2:]))
+        return entry or {"success": False, "error": "Waitlist entry not found"}
+    except Exception as e:
+        print(f"Error in get_waitlist_status: {e}")
+        return {"success": False, "error": str(e)}
+
 def get_menu_specials(dietary_preference: str = None, restaurant_id: int = None) -> List[Dict]:
     """
     Get menu specials and featured dishes.
@@ -0,0 +1,328 @@
+"""
+Compiled tool registry for the GoodFoods AI Agent
+Each tool's JSON schema from tool_definitions is compiled once into a list of
+argument coercers, so calls are validated and normalized ("tomorrow" -> date,
+"7pm" -> "19:00", "4 people" -> 4) before any database work happens.
+"""
+
+import re
+import threading
+import time
+from datetime import date as date_type, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import tool_functions
+from .tool_definitions import tools as tool_definitions
+
+# Bounds that the tool descriptions promise but JSON schema does not express
+PARAMETER_BOUNDS = {
+    "party_size": (1, 10),
+    "restaurant_id": (1, None),
+    "limit": (1, 50),
+    "latitude": (-90, 90),
+    "longitude": (-180, 180),
+}
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DATE_FORMATS = ["%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y", "%B %d", "%d %B"]
+
+_TIME_PATTERN = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?$")
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+_BOOKING_ID_PATTERN = re.compile(r"^(?:GF)?0*(\d{1,6})$")
+_WAITLIST_ID_PATTERN = re.compile(r"^(?:WL)?0*(\d{1,6})$")
+
+
+class ToolValidationError(Exception):
+    """A tool call was rejected before execution; the message is safe to show users"""
+
+
+def parse_date(value: Any, today: Optional[date_type] = None) -> str:
+    """Normalize a date ('2024-08-15', 'today', 'tomorrow', 'Friday', '15/08/2024') to YYYY-MM-DD"""
+    today = today or date_type.today()
+    text = str(value).strip().lower()
+
+    if text in ("today", "tonight"):
+        return today.isoformat()
+    if text == "tomorrow":
+        return (today + timedelta(days=1)).isoformat()
+    if text == "day after tomorrow":
+        return (today + timedelta(days=2)).isoformat()
+
+    words = text.split()
+    if words and words[-1] in WEEKDAYS and len(words) <= 2 and words[0] in (words[-1], "this", "next", "on"):
+        days_ahead = (WEEKDAYS.index(words[-1]) - today.weekday()) % 7
+        if days_ahead == 0 and words[0] == "next":
+            days_ahead = 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            continue
+        if "%Y" not in date_format:
+            # No year given: the next occurrence of that day
+            parsed = parsed.replace(year=today.year)
+            if parsed < today:
+                parsed = parsed.replace(year=today.year + 1)
+        return parsed.isoformat()
+
+    raise ToolValidationError(f"I couldn't understand the date '{value}'. Please use a date like 2024-08-15, 'tomorrow' or 'Friday'.")
+
+
+def parse_time(value: Any) -> str:
+    """Normalize a time ('19:00', '7:00 PM', '7pm', 'noon') to 24-hour HH:MM"""
+    text = str(value).strip().lower()
+    if text == "noon":
+        return "12:00"
+    if text == "midnight":
+        return "00:00"
+
+    match = _TIME_PATTERN.match(text)
+    if match:
+        hour = int(match.group(1))
+        minute = int(match.group(2) or 0)
+        meridiem = match.group(3)
+        if meridiem:
+            if not 1 <= hour <= 12:
+                match = None
+            elif meridiem == "p" and hour != 12:
+                hour += 12
+            elif meridiem == "a" and hour == 12:
+                hour = 0
+        if match and 0 <= hour <= 23 and 0 <= minute <= 59:
+            return f"{hour:02d}:{minute:02d}"
+
+    raise ToolValidationError(f"I couldn't understand the time '{value}'. Please use a time like 7:00 PM or 19:00.")
+
+
+def parse_moment(value: Any, now: Optional[datetime] = None) -> str:
+    """Normalize a point in time ('now', '7pm', 'Friday 19:00', '2024-08-15 7:30 PM') to 'YYYY-MM-DD HH:MM'"""
+    now = now or datetime.now()
+    text = str(value).strip()
+    if text.lower() in ("now", "right now", "open now"):
+        return now.strftime("%Y-%m-%d %H:%M")
+
+    words = text.replace("T", " ").split() if re.match(r"^\d{4}-\d{2}-\d{2}T", text) else text.split()
+    # The time is the last one or two words ("7:30 PM"); whatever precedes it is the date
+    for size in (2, 1):
+        if len(words) < size:
+            continue
+        try:
+            time_part = parse_time(" ".join(words[-size:]))
+        except ToolValidationError:
+            continue
+        date_words = " ".join(words[:-size])
+        date_part = parse_date(date_words, now.date()) if date_words else now.date().isoformat()
+        return f"{date_part} {time_part}"
+
+    raise ToolValidationError(f"I couldn't understand the time '{value}'. Please use something like 'now', '7pm' or 'Friday 19:00'.")
+
+
+def _integer(name: str, schema: Dict) -> Callable[[Any], int]:
+    # A schema's own minimum/maximum take precedence over the name's usual bounds
+    if "minimum" in schema or "maximum" in schema:
+        low, high = schema.get("minimum"), schema.get("maximum")
+    else:
+        low, high = PARAMETER_BOUNDS.get(name, (None, None))
+    label = name.replace("_", " ")
+
+    def coerce(value: Any) -> int:
+        if isinstance(value, bool):
+            raise ToolValidationError(f"The {label} must be a number.")
+        if isinstance(value, (int, float)):
+            number = value
+        else:
+            match = _NUMBER_PATTERN.search(str(value))
+            if not match:
+                raise ToolValidationError(f"The {label} must be a number.")
+            number = float(match.group())
+        # "4.5 people" is a mistake to ask about, not 4
+        if not float(number).is_integer():
+            raise ToolValidationError(f"The {label} must be a whole number.")
+        number = int(number)
+        if low is not None and number < low or high is not None and number > high:
+            if high is None:
+                raise ToolValidationError(f"The {label} must be at least {low}.")
+            raise ToolValidationError(f"The {label} must be between {low} and {high}.")
+        return number
+
+    return coerce
+
+
+def _number(name: str) -> Callable[[Any], float]:
+    low, high = PARAMETER_BOUNDS.get(name, (None, None))
+    label = name.replace("_", " ")
+
+    def coerce(value: Any) -> float:
+        if isinstance(value, bool):
+            raise ToolValidationError(f"The {label} must be a number.")
+        if isinstance(value, (int, float)):
+            number = float(value)
+        else:
+            match = _NUMBER_PATTERN.search(str(value))
+            if not match:
+                raise ToolValidationError(f"The {label} must be a number.")
+            number = float(match.group())
+        if low is not None and number < low or high is not None and number > high:
+            raise ToolValidationError(f"The {label} must be between {low} and {high}.")
+        return number
+
+    return coerce
+
+
+def _future_date(value: Any) -> str:
+    normalized = parse_date(value)
+    if normalized < date_type.today().isoformat():
+        raise ToolValidationError(f"The date {normalized} is in the past. Please choose an upcoming date.")
+    return normalized
+
+
+def _booking_id(value: Any) -> str:
+    match = _BOOKING_ID_PATTERN.match(str(value).strip().upper())
+    if not match:
+        raise ToolValidationError(f"'{value}' doesn't look like a booking reference. It should look like GF000123.")
+    return f"GF{int(match.group(1)):06d}"
+
+
+def _waitlist_id(value: Any) -> str:
+    match = _WAITLIST_ID_PATTERN.match(str(value).strip().upper())
+    if not match:
+        raise ToolValidationError(f"'{value}' doesn't look like a waitlist reference. It should look like WL000123.")
+    return f"WL{int(match.group(1)):06d}"
+
+
+def _string(value: Any) -> str:
+    text = str(value).strip()
+    if not text:
+        raise ToolValidationError("Please provide a value.")
+    return text
+
+
+def _enum(name: str, choices: List[str]) -> Callable[[Any], str]:
+    lookup = {choice.lower(): choice for choice in choices}
+
+    def coerce(value: Any) -> str:
+        choice = lookup.get(str(value).strip().lower())
+        if choice is None:
+            raise ToolValidationError(f"The {name.replace('_', ' ')} must be one of: {', '.join(choices)}.")
+        return choice
+
+    return coerce
+
+
+def compile_parameter(name: str, schema: Dict, tool_name: str) -> Callable[[Any], Any]:
+    """Pick the coercer for one parameter from its name and JSON schema"""
+    if "enum" in schema:
+        return _enum(name, schema["enum"])
+    if schema.get("type") == "integer":
+        return _integer(name, schema)
+    if schema.get("type") == "number":
+        return _number(name)
+    if name == "date":
+        # Only reservations need an upcoming date
+        return _future_date if tool_name in ("check_availability", "create_booking", "join_waitlist") else parse_date
+    if name == "time":
+        return parse_time
+    if name == "open_at":
+        return parse_moment
+    if name == "booking_id":
+        return _booking_id
+    if name == "waitlist_id":
+        return _waitlist_id
+    return _string
+
+
+class CompiledTool:
+    """A tool function with its compiled argument coercers and call counters"""
+
+    def __init__(self, definition: Dict, function: Callable):
+        spec = definition["function"]
+        parameters = spec.get("parameters", {})
+        self.name = spec["name"]
+        self.function = function
+        self.required = list(parameters.get("required", []))
+        self.coercers: Dict[str, Callable[[Any], Any]] = {
+            name: compile_parameter(name, schema, self.name)
+            for name, schema in parameters.get("properties", {}).items()
+        }
+        self.calls = 0
+        self.rejected = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+    def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce arguments; unknown and empty optional ones are dropped"""
+        if not isinstance(arguments, dict):
+            raise ToolValidationError("Invalid arguments.")
+
+        missing = [name for name in self.required if arguments.get(name) in (None, "")]
+        if missing:
+            labels = ", ".join(name.replace("_", " ") for name in missing)
+            raise ToolValidationError(f"I still need the following details: {labels}.")
+
+        validated = {}
+        for name, value in arguments.items():
+            coerce = self.coercers.get(name)
+            if coerce is None or value in (None, ""):
+                continue
+            validated[name] = coerce(value)
+        return validated
+
+
+class ToolRegistry:
+    """Registry of compiled tools, built once from the tool definitions"""
+
+    def __init__(self, definitions: List[Dict], module):
+        self.tools: Dict[str, CompiledTool] = {}
+        for definition in definitions:
+            name = definition["function"]["name"]
+            self.tools[name] = CompiledTool(definition, getattr(module, name))
+        self._lock = threading.Lock()
+
+    def validate(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        tool = self.tools.get(name)
+        if tool is None:
+            raise ToolValidationError(f"Tool '{name}' not found.")
+        try:
+            return tool.validate(arguments)
+        except ToolValidationError:
+            with self._lock:
+                tool.rejected += 1
+            raise
+
+    def execute(self, name: str, arguments: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        """Validate, then run the tool. Returns (result, validated arguments)."""
+        validated = self.validate(name, arguments)
+        return self.run(name, validated), validated
+
+    def run(self, name: str, validated: Dict[str, Any]) -> Any:
+        """Run the tool with arguments validate() already returned"""
+        tool = self.tools[name]
+        start = time.perf_counter()
+        try:
+            return tool.function(**validated)
+        except Exception:
+            with self._lock:
+                tool.errors += 1
+            raise
+        finally:
+            with self._lock:
+                tool.calls += 1
+                tool.total_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": tool.calls,
+                    "rejected": tool.rejected,
+                    "errors": tool.errors,
+                    "mean_ms": round(tool.total_ms / tool.calls, 3) if tool.calls else 0.0,
+                }
+                for name, tool in self.tools.items()
+            }
+
+
+# Compiled once at import
+tool_registry = ToolRegistry(tool_definitions, tool_functions)
@@ -0,0 +1,75 @@
+"""
+Start-up warm-up for the GoodFoods API
+Pays one-off initialization costs (the Vertex AI client libraries, date
+parsing, the restaurant catalog, NumPy) while the server starts, before it
+takes traffic, instead of on the first user's request. Each step is timed
+and reported by /agent/status; WARMUP=false skips them all.
+"""
+
+import os
+import time
+from datetime import date as date_type, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+WARMUP = os.getenv("WARMUP", "true").lower() == "true"
+
+# Step name -> milliseconds, or the error that stopped the step
+warmup_report: Dict[str, Any] = {}
+
+
+def warm_llm_client():
+    """Import the Vertex AI and protobuf modules and build the shared prediction client"""
+    from .agent import LOCAL_LLM_BASE_URL, GoodFoodsAgent
+    agent = GoodFoodsAgent()
+    if agent.dev_mode or LOCAL_LLM_BASE_URL or not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+        # These configurations never reach the Vertex AI client
+        return
+    from google.cloud import aiplatform  # noqa: F401 - seconds of imports
+    from google.protobuf import json_format  # noqa: F401
+    from google.protobuf.struct_pb2 import Value  # noqa: F401
+    agent._get_prediction_client()
+
+
+def warm_tools():
+    """Run the argument validators once: the first strptime call imports and compiles its parser"""
+    from .agent import tool_call_parser
+    from .tool_registry import tool_registry
+    tomorrow = (date_type.today() + timedelta(days=1)).isoformat()
+    tool_registry.validate("check_availability", {"restaurant_id": 1, "date": tomorrow, "time": "7pm", "party_size": 2})
+    tool_call_parser.parse('{"tool_calls": [{"name": "find_restaurants", "arguments": {"location": "Bangalore"}}]}')
+
+
+def warm_catalog():
+    """Load the opening-hours index and read a page of restaurants into SQLite's cache"""
+    from . import tool_functions
+    from .opening_hours import opening_hours_index
+    opening_hours_index.mask(1)
+    tool_functions.search_restaurants(order_by="rating", limit=tool_functions.MAX_PAGE_SIZE)
+
+
+def warm_availability_grid():
+    """Import NumPy, which only the availability grid uses"""
+    from . import availability_grid  # noqa: F401
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("llm_client", warm_llm_client),
+    ("tools", warm_tools),
+    ("catalog", warm_catalog),
+    ("availability_grid", warm_availability_grid),
+]
+
+
+def warm_up() -> Dict[str, Any]:
+    """Run every warm-up step; a failing step is reported and skipped, never fatal"""
+    started = time.perf_counter()
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+            warmup_report[name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {e}")
+            warmup_report[name] = f"failed: {e}"
+    warmup_report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return warmup_report
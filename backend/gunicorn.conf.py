@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for running the GoodFoods API with several workers
+Usage (from backend/): gunicorn app.main:app -c gunicorn.conf.py
+
+Each worker is a separate process with its own agent cache, availability
+cache and admission limits, sharing the SQLite database at DATABASE_PATH.
+Set SESSION_BACKEND=database so conversations survive moving between workers.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# LLM turns can run for tens of seconds
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """Create the schema and sample data once, before any worker starts, if the database is new"""
+    import setup_database
+    setup_database.main()
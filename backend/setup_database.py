@@ -4,15 +4,23 @@ Database setup script for GoodFoods AI Agent
 Creates SQLite database with schema and sample data for development
 """
 
+import os
 import sqlite3
 import json
 from datetime import datetime, timedelta
 
-def create_database():
-    """Create the SQLite database with schema"""
-    conn = sqlite3.connect('./goodfoods.db')
+def create_database(path=None):
+    """Create the SQLite database with schema (at DATABASE_PATH by default)"""
+    path = path or os.getenv("DATABASE_PATH", "./goodfoods.db")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
     cursor = conn.cursor()
     
+    # WAL lets readers run alongside a writer, so several API workers can share
+    # the file; the mode is stored in the database and persists
+    cursor.execute("PRAGMA journal_mode=WAL")
+    
     # Create tables
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS Restaurant (
@@ -22,10 +30,20 @@ def create_database():
             latitude REAL NOT NULL,
             longitude REAL NOT NULL,
             cuisine_type TEXT NOT NULL,
-            opening_hours TEXT NOT NULL
+            opening_hours TEXT NOT NULL,
+            rating REAL NOT NULL DEFAULT 4.5
         )
     ''')
     
+    # Databases created before ratings existed
+    cursor.execute("PRAGMA table_info(Restaurant)")
+    if "rating" not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE Restaurant ADD COLUMN rating REAL NOT NULL DEFAULT 4.5")
+    
+    # Keyset pagination of restaurant listings by rating and by name
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_restaurant_rating ON Restaurant (rating DESC, restaurant_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_restaurant_name ON Restaurant (name, restaurant_id)")
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS RestaurantTable (
             table_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -57,6 +75,80 @@ def create_database():
         )
     ''')
     
+    # Slot lookups: availability checks and bulk-import capacity validation
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_slot ON Booking (restaurant_id, booking_time)")
+    # Time-ordered scans of upcoming confirmed bookings (reminder scheduler)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_status_time ON Booking (status, booking_time)")
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Waitlist (
+            waitlist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            restaurant_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            booking_time DATETIME NOT NULL,
+            num_guests INTEGER NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'waiting',
+            special_requests TEXT,
+            created_at DATETIME NOT NULL,
+            booking_id INTEGER,
+            FOREIGN KEY (restaurant_id) REFERENCES Restaurant (restaurant_id),
+            FOREIGN KEY (user_id) REFERENCES User (user_id),
+            FOREIGN KEY (booking_id) REFERENCES Booking (booking_id)
+        )
+    ''')
+    
+    # Each slot's queue of waiting parties, in serving order (see tool_functions.WAITLIST_ORDER)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_waitlist_queue
+        ON Waitlist (restaurant_id, booking_time, priority DESC, waitlist_id)
+        WHERE status = 'waiting'
+    ''')
+    
+    # Append-only history of every booking change (see app/booking_events.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS BookingEvent (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            restaurant_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            booking_time DATETIME NOT NULL,
+            num_guests INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            source TEXT NOT NULL,
+            occurred_at DATETIME NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_event_booking ON BookingEvent (booking_id, event_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_booking_event_user ON BookingEvent (user_id, event_id)")
+    for action in ("UPDATE", "DELETE"):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS booking_event_no_{action.lower()} BEFORE {action} ON BookingEvent
+            BEGIN SELECT RAISE(ABORT, 'BookingEvent is append-only'); END
+        ''')
+    
+    # Views maintained from the events in the same transaction
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS SlotOccupancy (
+            restaurant_id INTEGER NOT NULL,
+            booking_time DATETIME NOT NULL,
+            guests INTEGER NOT NULL,
+            bookings INTEGER NOT NULL,
+            PRIMARY KEY (restaurant_id, booking_time)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS UserBookingStats (
+            user_id INTEGER PRIMARY KEY,
+            bookings INTEGER NOT NULL,
+            cancelled INTEGER NOT NULL,
+            seated INTEGER NOT NULL,
+            no_shows INTEGER NOT NULL,
+            last_booking_time DATETIME NOT NULL
+        )
+    ''')
+    
     conn.commit()
     return conn, cursor
 
@@ -71,6 +163,7 @@ def insert_sample_data(conn, cursor):
             "latitude": 12.9352,
             "longitude": 77.6245,
             "cuisine_type": "Multi-cuisine, North Indian, Chinese",
+            "rating": 4.5,
             "opening_hours": json.dumps({
                 "monday": "12:00-23:00",
                 "tuesday": "12:00-23:00", 
@@ -87,6 +180,7 @@ def insert_sample_data(conn, cursor):
             "latitude": 12.9789,
             "longitude": 77.6417,
             "cuisine_type": "Multi-cuisine, Italian, Continental",
+            "rating": 4.3,
             "opening_hours": json.dumps({
                 "monday": "11:30-22:30",
                 "tuesday": "11:30-22:30",
@@ -103,6 +197,7 @@ def insert_sample_data(conn, cursor):
             "latitude": 12.9279,
             "longitude": 77.5871,
             "cuisine_type": "South Indian, North Indian, Chinese",
+            "rating": 4.6,
             "opening_hours": json.dumps({
                 "monday": "11:00-22:00",
                 "tuesday": "11:00-22:00",
@@ -119,6 +214,7 @@ def insert_sample_data(conn, cursor):
             "latitude": 12.9716,
             "longitude": 77.5946,
             "cuisine_type": "Multi-cuisine, Continental, Italian",
+            "rating": 4.2,
             "opening_hours": json.dumps({
                 "monday": "12:00-22:00",
                 "tuesday": "12:00-22:00",
@@ -135,6 +231,7 @@ def insert_sample_data(conn, cursor):
             "latitude": 12.8458,
             "longitude": 77.6658,
             "cuisine_type": "Multi-cuisine, Chinese, North Indian",
+            "rating": 4.4,
             "opening_hours": json.dumps({
                 "monday": "12:00-23:00",
                 "tuesday": "12:00-23:00",
@@ -150,15 +247,16 @@ def insert_sample_data(conn, cursor):
     # Insert restaurants
     for restaurant in restaurants:
         cursor.execute('''
-            INSERT INTO Restaurant (name, address, latitude, longitude, cuisine_type, opening_hours)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO Restaurant (name, address, latitude, longitude, cuisine_type, opening_hours, rating)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (
             restaurant["name"],
             restaurant["address"], 
             restaurant["latitude"],
             restaurant["longitude"],
             restaurant["cuisine_type"],
-            restaurant["opening_hours"]
+            restaurant["opening_hours"],
+            restaurant["rating"]
         ))
     
     # Insert tables for each restaurant
@@ -204,6 +302,31 @@ def insert_sample_data(conn, cursor):
     
     conn.commit()
 
+def seed_event_log(conn):
+    """Log bookings that have no events yet (made before the event log existed); returns how many"""
+    from app import booking_events
+    # Under the write lock, so workers starting together don't log the same bookings twice
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        seeded = booking_events.seed(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return seeded
+
+def migrate(path=None):
+    """
+    Bring an existing database up to the current schema (tables added since it
+    was created, such as Waitlist and the booking event log) without touching
+    its data. Safe to run at every start; returns the bookings newly logged.
+    """
+    conn, _ = create_database(path)
+    try:
+        return seed_event_log(conn)
+    finally:
+        conn.close()
+
 def main():
     """Main function to set up the database"""
     print("Setting up GoodFoods database...")
@@ -224,6 +347,11 @@ def main():
         else:
             print("✓ Database already contains data")
         
+        # Bookings made before the event log existed get their created events
+        seeded = seed_event_log(conn)
+        if seeded:
+            print(f"✓ Booking event log seeded with {seeded} bookings")
+        
         # Verify setup
         cursor.execute("SELECT COUNT(*) FROM Restaurant")
         restaurant_count = cursor.fetchone()[0]
@@ -237,7 +365,7 @@ def main():
         cursor.execute("SELECT COUNT(*) FROM Booking")
         booking_count = cursor.fetchone()[0]
         
-        print(f"\nDatabase setup complete!")
+        print("\nDatabase setup complete!")
         print(f"Restaurants: {restaurant_count}")
         print(f"Tables: {table_count}")
         print(f"Users: {user_count}")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the day-view availability grid against per-slot availability checks
+Builds a scratch database with the sample restaurants plus random bookings
+on one day, then computes the whole day's availability for restaurant 1
+with one grid call and with one check per slot (both uncached), checking
+that they agree.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append('backend')
+
+import setup_database
+from app import database
+from app.availability_grid import _compute_grid
+from app.tool_functions import _compute_availability
+
+
+def build_database(directory: str, bookings: int, day: str) -> str:
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        conn, cursor = setup_database.create_database()
+        setup_database.insert_sample_data(conn, cursor)
+        rows = [
+            (1, 1, f"{day} {random.choice(range(11, 23)):02d}:{random.choice(['00', '30']):s}:00",
+             random.randint(1, 4), random.choice(["confirmed"] * 9 + ["cancelled"]), None)
+            for _ in range(bookings)
+        ]
+        cursor.executemany(
+            "INSERT INTO Booking (restaurant_id, user_id, booking_time, num_guests, status, special_requests) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.commit()
+        conn.close()
+    finally:
+        os.chdir(cwd)
+    return os.path.join(directory, "goodfoods.db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, nargs="+", default=[0, 100, 1000])
+    parser.add_argument("--party-size", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=30, choices=[15, 30, 60])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    day = (date.today() + timedelta(days=7)).isoformat()
+    print(f"Restaurant 1 on {day}, party of {args.party_size}, {args.interval}-minute slots")
+    print(f"{'bookings':>9} {'slots':>6} {'per-slot ms':>12} {'grid ms':>8} {'speedup':>8}")
+    for count in args.bookings:
+        with tempfile.TemporaryDirectory() as directory:
+            database.DB_PATH = build_database(directory, count, day)
+            grid = _compute_grid(1, day, args.party_size, args.interval)
+            start_minute = int(grid["start"][:2]) * 60 + int(grid["start"][3:])
+            slots = [
+                f"{(start_minute + i * args.interval) // 60:02d}:{(start_minute + i * args.interval) % 60:02d}"
+                for i, status in enumerate(grid["available"]) if status != "-"
+            ]
+
+            # Both paths must give the same answer for every open slot
+            for slot, status in zip(slots, (s for s in grid["available"] if s != "-")):
+                assert (_compute_availability(1, day, slot, args.party_size) == [slot]) == (status == "1"), slot
+
+            per_slot = grid_time = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for slot in slots:
+                    _compute_availability(1, day, slot, args.party_size)
+                per_slot = min(per_slot, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                _compute_grid(1, day, args.party_size, args.interval)
+                grid_time = min(grid_time, time.perf_counter() - start)
+
+            print(f"{count:>9} {len(slots):>6} {per_slot * 1000:>12.1f} {grid_time * 1000:>8.2f} "
+                  f"{per_slot / grid_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark the booking event log and its views
+On a copy of the database: logs the existing bookings (seed), then compares
+reads from the SlotOccupancy and UserBookingStats views with the aggregates
+they replace on the live Booking table, times bookings and cancellations
+(which now also append an event and update both views), and times a full
+replay of the views from the log with the check against Booking.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def median_ms(conn, sql, params_list):
+    return statistics.median(timed(lambda params: conn.execute(sql, params).fetchall(), params)[0]
+                             for params in params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=os.path.join(BACKEND_DIR, "goodfoods.db"),
+                        help="Database to copy (see python -m app.generate_data)")
+    parser.add_argument("--lookups", type=int, default=200, help="Random days and users read from each side")
+    parser.add_argument("--bookings", type=int, default=200, help="Bookings made, then cancelled")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="booking-events-")
+    try:
+        database = os.path.join(workdir, "goodfoods.db")
+        shutil.copyfile(args.database, database)
+        os.environ["DATABASE_PATH"] = database
+        os.environ["AVAILABILITY_CACHE_TTL"] = "0"
+        sys.path.insert(0, BACKEND_DIR)
+        import setup_database
+        from app import booking_events, tool_functions
+
+        conn = setup_database.create_database(database)[0]
+        with conn:
+            seed_ms, seeded = timed(booking_events.seed, conn)
+        print(f"seed: {seeded:,} bookings logged in {seed_ms:,.0f} ms")
+
+        rng = random.Random(0)
+        restaurants = [row[0] for row in conn.execute("SELECT restaurant_id FROM Restaurant")]
+        users = [row[0] for row in conn.execute("SELECT user_id FROM User")]
+        days = [row[0] for row in conn.execute("SELECT DISTINCT substr(booking_time, 1, 10) FROM Booking")]
+        slot_params = []
+        for _ in range(args.lookups):
+            day = rng.choice(days)
+            slot_params.append([rng.choice(restaurants), day, f"{day} 99"])
+        user_params = [[rng.choice(users)] for _ in range(args.lookups)]
+
+        print(f"\n{'read':<34} {'view ms':>8} {'live ms':>8}")
+        view = median_ms(conn, "SELECT booking_time, bookings, guests FROM SlotOccupancy "
+                               "WHERE restaurant_id = ? AND booking_time >= ? AND booking_time < ?", slot_params)
+        live = median_ms(conn, "SELECT booking_time, COUNT(*), SUM(num_guests) FROM Booking "
+                               "WHERE restaurant_id = ? AND booking_time >= ? AND booking_time < ? "
+                               "AND status = 'confirmed' GROUP BY booking_time", slot_params)
+        print(f"{'a restaurant day occupancy':<34} {view:>8.3f} {live:>8.3f}")
+        view = median_ms(conn, "SELECT bookings, cancelled, seated, no_shows, last_booking_time "
+                               "FROM UserBookingStats WHERE user_id = ?", user_params)
+        live = median_ms(conn, "SELECT COUNT(*), SUM(status = 'cancelled'), MAX(booking_time) "
+                               "FROM Booking WHERE user_id = ?", user_params)
+        print(f"{'a user booking stats':<34} {view:>8.3f} {live:>8.3f}")
+
+        created, cancelled = [], []
+        for number in range(args.bookings):
+            day = (date.today() + timedelta(days=1 + number % 60)).isoformat()
+            took, result = timed(tool_functions.create_booking, restaurants[number % len(restaurants)],
+                                 f"Guest {number}", f"+91-6{number:09d}", day, f"{12 + number % 3}:00", 2)
+            if result.get("success"):
+                created.append(took)
+                cancelled.append(timed(tool_functions.cancel_booking, result["booking_id"])[0])
+        if created:
+            print(f"\ncreate_booking median {statistics.median(created):.2f} ms, cancel_booking median "
+                  f"{statistics.median(cancelled):.2f} ms ({len(created)} of each, event and views included)")
+
+        with conn:
+            replay_ms, counts = timed(booking_events.replay, conn)
+            verify_ms, report = timed(booking_events.verify, conn)
+        print(f"\nreplay: {counts['events']:,} events into {counts['slots']:,} slots and {counts['users']:,} users "
+              f"in {replay_ms:,.0f} ms")
+        print(f"verify: {report} in {verify_ms:,.0f} ms")
+        try:
+            size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name IN ('BookingEvent', "
+                                "'idx_booking_event_booking', 'idx_booking_event_user')").fetchone()[0]
+            print(f"log size: {size / counts['events']:.0f} bytes per event with its indexes")
+        except sqlite3.OperationalError:
+            pass
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
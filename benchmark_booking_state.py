@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Measure LLM round trips per completed booking with the booking state tracker
+Replays the user turns of the training conversations that end in a booking.
+Without the tracker every user turn is one LLM call. With it, a turn only
+costs an LLM call when BookingState cannot act on its own; model tool calls
+from the dataset stand in for those LLM turns.
+"""
+
+import argparse
+import ast
+import json
+import sys
+
+sys.path.append('backend')
+
+from app.booking_context import BookingState
+from app.tool_registry import ToolValidationError, tool_registry
+
+
+def parse_tool_call(content: str):
+    """print(restaurant_tools.name(arg=...)) -> (name, arguments), or None for a text reply"""
+    try:
+        node = ast.parse(content.strip(), mode="eval").body
+    except SyntaxError:
+        return None
+    if not (isinstance(node, ast.Call) and node.args and isinstance(node.args[0], ast.Call)):
+        return None
+    call = node.args[0]
+    if not isinstance(call.func, ast.Attribute):
+        return None
+    try:
+        arguments = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords}
+    except ValueError:
+        return None
+    return call.func.attr, arguments
+
+
+def turns(messages):
+    """(user message, model reply, tool output or None) for each real user turn"""
+    result = []
+    for i, message in enumerate(messages):
+        if message["role"] != "user" or message["content"].startswith("tool_outputs:"):
+            continue
+        reply = messages[i + 1]["content"] if i + 1 < len(messages) else ""
+        output = None
+        if i + 2 < len(messages) and messages[i + 2]["content"].startswith("tool_outputs:"):
+            try:
+                output = ast.literal_eval(messages[i + 2]["content"][len("tool_outputs:"):].strip())
+            except (ValueError, SyntaxError):
+                output = None
+            # The dataset lists generic slots where check_availability returns just the
+            # requested time when it is free; go by what the model told the user
+            call = parse_tool_call(reply)
+            summary = messages[i + 3]["content"] if i + 3 < len(messages) else ""
+            if call and call[0] == "check_availability" and "is available" in summary:
+                output = "available"
+        result.append((message["content"], reply, output))
+    return result
+
+
+def replay(messages):
+    """Returns (baseline LLM calls, tracker LLM calls, booked directly, direct booking matches dataset)"""
+    state = BookingState()
+    baseline = tracked = 0
+    for user_message, reply, output in turns(messages):
+        baseline += 1
+        state.update_from_message(user_message)
+        action = state.next_action()
+        model_call = parse_tool_call(reply)
+
+        if action is not None and action[0] == "create_booking":
+            expected = None
+            if model_call and model_call[0] == "create_booking":
+                try:
+                    expected = tool_registry.validate("create_booking", model_call[1])
+                except ToolValidationError:
+                    pass
+            matches = expected is None or tool_registry.validate("create_booking", action[1]) == expected
+            return baseline + remaining_turns(messages, user_message), tracked, True, matches
+        if action is not None and model_call is None:
+            # The tracker asked for the missing details itself, as the model did
+            continue
+
+        tracked += 1
+        if model_call:
+            name, arguments = model_call
+            try:
+                arguments = tool_registry.validate(name, arguments)
+            except ToolValidationError:
+                continue
+            if output == "available":
+                output = [arguments["time"]]
+            state.update_from_tool(name, arguments, output)
+    return baseline, tracked, False, True
+
+
+def remaining_turns(messages, user_message):
+    """User turns after `user_message` that the baseline still spends an LLM call on"""
+    contents = [content for content, _, _ in turns(messages)]
+    return len(contents) - contents.index(user_message) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datasets", nargs="*", default=["training.jsonl", "training_100.jsonl"])
+    args = parser.parse_args()
+
+    print(f"{'dataset':>20} {'bookings':>9} {'baseline':>9} {'tracker':>8} {'direct':>7} {'agree':>6}")
+    for path in args.datasets:
+        with open(path) as f:
+            conversations = [json.loads(line)["messages"] for line in f if line.strip()]
+        bookings = [
+            messages for messages in conversations
+            if any(parse_tool_call(m["content"]) and parse_tool_call(m["content"])[0] == "create_booking"
+                   for m in messages if m["role"] == "model")
+        ]
+        if not bookings:
+            print(f"{path:>20} {0:>9}")
+            continue
+
+        baseline = tracked = direct = agree = 0
+        for messages in bookings:
+            calls, tracker_calls, booked_directly, matches = replay(messages)
+            baseline += calls
+            tracked += tracker_calls
+            direct += booked_directly
+            agree += booked_directly and matches
+        print(f"{path:>20} {len(bookings):>9} {baseline / len(bookings):>9.2f} {tracked / len(bookings):>8.2f} "
+              f"{direct:>7} {agree:>6}")
+    print("baseline/tracker: LLM round trips per completed booking; direct: bookings made by the tracker; "
+          "agree: direct bookings with the same arguments as the dataset")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-turn overhead of the chat transports
+Runs multi-turn conversations three ways and reports latency and bytes per
+turn, overall and for the last turns (where history is longest):
+  post+history  POST /chat resending the whole transcript every turn (the old protocol)
+  post          POST /chat with only the new message, session id and version
+  websocket     one /ws/chat connection for the whole conversation
+In-process (default) the agent is replaced by an echo agent so only the
+transport is measured; with --url a running backend and its real agent are
+used (needs websocket-client).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append('backend')
+
+# Admission limits would otherwise throttle the benchmark itself
+os.environ.setdefault("CHAT_RATE_LIMIT_PER_MINUTE", "1000000")
+os.environ.setdefault("CHAT_RATE_LIMIT_BURST", "1000000")
+
+
+class EchoAgent:
+    """Stands in for GoodFoodsAgent: fixed-size replies, one tool event per turn"""
+
+    reply = "Great! A table is available at 07:00 PM. Would you like me to proceed with the booking? " * 3
+
+    def __init__(self):
+        self.conversation_history = []
+        self.event_listener = None
+
+    def restore_conversation(self, history):
+        self.conversation_history = [dict(message) for message in history]
+
+    def get_response(self, message):
+        self.conversation_history.append({"role": "user", "content": message})
+        if self.event_listener:
+            self.event_listener("tool_call", {"name": "check_availability", "arguments": {"time": "19:00"}})
+            self.event_listener("tool_result", {"name": "check_availability", "ok": True, "text": self.reply})
+        self.conversation_history.append({"role": "assistant", "content": self.reply})
+        return self.reply
+
+
+class InProcessClient:
+    def __init__(self):
+        from fastapi.testclient import TestClient
+        from app import main
+        main.session_store.agent_factory = EchoAgent
+        self.client = TestClient(main.app)
+
+    def post(self, payload):
+        body = json.dumps(payload)
+        response = self.client.post("/chat", content=body, headers={"Content-Type": "application/json"})
+        return response.json(), len(body), len(response.content)
+
+    def connect(self):
+        socket = self.client.websocket_connect("/ws/chat")
+        socket.__enter__()
+        return socket, lambda text: socket.send_text(text), socket.receive_text, lambda: socket.__exit__(None, None, None)
+
+
+class LiveClient:
+    def __init__(self, url):
+        import requests
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+
+    def post(self, payload):
+        body = json.dumps(payload)
+        response = self.session.post(f"{self.url}/chat", data=body, headers={"Content-Type": "application/json"}, timeout=60)
+        return response.json(), len(body), len(response.content)
+
+    def connect(self):
+        import websocket
+        socket = websocket.create_connection(self.url.replace("http", "ws", 1) + "/ws/chat", timeout=60)
+        return socket, socket.send, socket.recv, socket.close
+
+
+def run_post(client, turns, with_history):
+    latencies, sizes = [], []
+    history, session_id, version = [], None, 0
+    for turn in range(turns):
+        message = f"Turn {turn}: is there a table for 4 tomorrow at 7pm?"
+        payload = {"message": message}
+        if with_history:
+            payload["conversation_history"] = history
+        else:
+            payload.update(session_id=session_id, version=version)
+        start = time.perf_counter()
+        data, sent, received = client.post(payload)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(sent + received)
+        session_id, version = data["session_id"], data["version"]
+        history = history + [{"role": "user", "content": message}, {"role": "assistant", "content": data["response"]}]
+    return latencies, sizes
+
+
+def run_websocket(client, turns):
+    latencies, sizes = [], []
+    socket, send, receive, close = client.connect()
+    json.loads(receive())  # session
+    try:
+        for turn in range(turns):
+            text = json.dumps({"type": "message", "id": str(turn),
+                               "message": f"Turn {turn}: is there a table for 4 tomorrow at 7pm?"})
+            start = time.perf_counter()
+            send(text)
+            size = len(text)
+            while True:
+                frame = receive()
+                size += len(frame)
+                event = json.loads(frame)
+                if event["type"] == "ping":
+                    send('{"type": "pong"}')
+                elif event.get("id") == str(turn) and event["type"] in ("done", "error"):
+                    break
+            latencies.append(time.perf_counter() - start)
+            sizes.append(size)
+    finally:
+        close()
+    return latencies, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running backend instead of an in-process app")
+    parser.add_argument("--turns", type=int, default=100, help="Turns per conversation")
+    parser.add_argument("--conversations", type=int, default=3)
+    args = parser.parse_args()
+
+    client = LiveClient(args.url) if args.url else InProcessClient()
+    tail = max(1, args.turns // 10)
+    modes = [
+        ("post+history", lambda: run_post(client, args.turns, with_history=True)),
+        ("post", lambda: run_post(client, args.turns, with_history=False)),
+        ("websocket", lambda: run_websocket(client, args.turns)),
+    ]
+    print(f"{args.conversations} conversations x {args.turns} turns ({'live ' + args.url if args.url else 'in-process, echo agent'})")
+    print(f"{'transport':>13} {'mean ms':>8} {'p95 ms':>7} {f'last {tail} ms':>11} {'bytes/turn':>11} {f'last {tail} bytes':>14}")
+    for name, run in modes:
+        latencies, sizes = [], []
+        run()  # warm-up
+        for _ in range(args.conversations):
+            turn_latencies, turn_sizes = run()
+            latencies.extend(turn_latencies)
+            sizes.extend(turn_sizes)
+        # Tail figures over the last turns of every conversation
+        tail_latencies = [latency for i, latency in enumerate(latencies) if i % args.turns >= args.turns - tail]
+        tail_sizes = [size for i, size in enumerate(sizes) if i % args.turns >= args.turns - tail]
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+        print(f"{name:>13} {statistics.mean(latencies) * 1000:>8.2f} {p95 * 1000:>7.2f} "
+              f"{statistics.mean(tail_latencies) * 1000:>11.2f} {statistics.mean(sizes):>11.0f} "
+              f"{statistics.mean(tail_sizes):>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark backend cold start
+Writes a `python -X importtime` profile of `import app.main` (sorted by
+cumulative time) to --report, then starts the app in fresh processes with
+the start-up warm-up off and on, and reports:
+  import      importing app.main
+  startup     the lifespan hook (the warm-up, when on)
+  ready       process start to accepting requests
+  first ms    the first /restaurants, /availability and grid requests, plus
+              the Vertex AI imports the first /chat turn needs
+  to first    process start to the first /restaurants response
+The LLM client can't be built without credentials, so the runs point
+GOOGLE_APPLICATION_CREDENTIALS at a missing file: the warm-up still does
+the imports, and only the client construction fails.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+COLD_START = r"""
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+client.__enter__()
+ready = time.perf_counter()
+
+first = {}
+for name, path in [("restaurants", "/restaurants?open_at=now&limit=20"),
+                   ("availability", "/availability/1?date=tomorrow&time=7pm&party_size=2"),
+                   ("grid", "/availability/1/grid?date=tomorrow&party_size=2")]:
+    start = time.perf_counter()
+    assert client.get(path).status_code == 200, path
+    first[name] = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+from google.cloud import aiplatform
+from google.protobuf import json_format
+first["llm_imports"] = (time.perf_counter() - start) * 1000
+client.__exit__(None, None, None)
+print(json.dumps({"import": (imported - started) * 1000, "startup": (ready - imported) * 1000,
+                  "ready": (ready - started) * 1000, "first": first}))
+"""
+
+
+def importtime_report(path, env):
+    """Profile `import app.main` and write the modules by cumulative import time"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), int(self_us), module.rstrip()))
+    entries.sort(reverse=True)
+    with open(path, "w") as report:
+        report.write(f"{'cumulative ms':>13} {'self ms':>8}  module\n")
+        for cumulative_us, self_us, module in entries:
+            report.write(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {module}\n")
+    return entries
+
+
+def cold_start(env):
+    started = subprocess.run([sys.executable, "-c", COLD_START], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True)
+    if started.returncode != 0:
+        raise RuntimeError(started.stderr[-2000:])
+    return json.loads(started.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=os.path.join(BACKEND_DIR, "goodfoods.db"))
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per mode (medians are reported)")
+    parser.add_argument("--report", default="startup_importtime.txt", help="Where to write the import-time profile")
+    parser.add_argument("--top", type=int, default=12, help="Modules of the profile to print")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_PATH=os.path.abspath(args.database), DEV_MODE="false",
+               GOOGLE_APPLICATION_CREDENTIALS="/nonexistent/credentials.json", PYTHONDONTWRITEBYTECODE="1")
+
+    entries = importtime_report(args.report, env)
+    print(f"import app.main: {entries[0][0] / 1000:.0f} ms; slowest imports (full profile in {args.report}):")
+    for cumulative_us, self_us, module in entries[1:args.top + 1]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {module.strip()}")
+
+    print(f"\nCold start, median of {args.runs} runs (ms)")
+    print(f"{'warm-up':>8} {'import':>7} {'startup':>8} {'ready':>7}   first: {'restaurants':>11} {'availability':>12} "
+          f"{'grid':>6} {'llm':>7}   {'to first':>8}")
+    for warmup in ("false", "true"):
+        runs = [cold_start(dict(env, WARMUP=warmup)) for _ in range(args.runs)]
+        median = lambda key: statistics.median(run[key] for run in runs)
+        first = {name: statistics.median(run["first"][name] for run in runs) for name in runs[0]["first"]}
+        print(f"{'on' if warmup == 'true' else 'off':>8} {median('import'):>7.0f} {median('startup'):>8.0f} "
+              f"{median('ready'):>7.0f}          {first['restaurants']:>11.1f} {first['availability']:>12.1f} "
+              f"{first['grid']:>6.1f} {first['llm_imports']:>7.1f}   {median('ready') + first['restaurants']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
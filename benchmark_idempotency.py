@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark idempotent booking retries
+On a copy of the database, makes --bookings bookings through the idempotency
+store, each under its own key, then retries every one of them, and reports
+the time per first attempt and per replay, the duplicate bookings the
+retries would have made without keys (none should be made with them), and
+the IdempotencyKey table's size per key.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+
+def median_ms(timings):
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=os.path.join(BACKEND_DIR, "goodfoods.db"),
+                        help="Database to copy (see python -m app.generate_data)")
+    parser.add_argument("--bookings", type=int, default=2000, help="Bookings made, then retried once each")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="idempotency-")
+    try:
+        database = os.path.join(workdir, "goodfoods.db")
+        shutil.copyfile(args.database, database)
+        os.environ["DATABASE_PATH"] = database
+        sys.path.insert(0, BACKEND_DIR)
+        from app import tool_functions
+        from app.idempotency import client_key, idempotency_store
+
+        with sqlite3.connect(database) as conn:
+            restaurants = [row[0] for row in conn.execute("SELECT restaurant_id FROM Restaurant LIMIT 50")]
+            before = conn.execute("SELECT COUNT(*) FROM Booking").fetchone()[0]
+
+        requests = []
+        for number in range(args.bookings):
+            day = (date.today() + timedelta(days=1 + number % 60)).isoformat()
+            arguments = dict(restaurant_id=restaurants[number % len(restaurants)], user_name=f"Guest {number}",
+                             phone_number=f"+91-7{number:09d}", date=day, time=f"{12 + number % 10}:00", party_size=2)
+            requests.append((client_key(str(uuid.uuid4())), arguments))
+
+        def book(key, arguments):
+            start = time.perf_counter()
+            result, replayed = idempotency_store.run(
+                "create_booking", key, arguments, lambda: tool_functions.create_booking(**arguments)
+            )
+            return time.perf_counter() - start, result, replayed
+
+        first = [book(key, arguments) for key, arguments in requests]
+        retries = [book(key, arguments) for key, arguments in requests]
+
+        with sqlite3.connect(database) as conn:
+            made = conn.execute("SELECT COUNT(*) FROM Booking").fetchone()[0] - before
+            keys = conn.execute("SELECT COUNT(*) FROM IdempotencyKey").fetchone()[0]
+            try:
+                key_bytes = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                                         "('IdempotencyKey', 'idx_idempotency_expires')").fetchone()[0]
+            except sqlite3.OperationalError:
+                key_bytes = None
+
+        succeeded = sum(1 for _, result, _ in first if result.get("success"))
+        print(f"{args.bookings} bookings ({succeeded} succeeded), each retried once")
+        print(f"  first attempt   median {median_ms([timing for timing, result, _ in first if result.get('success')]):.2f} ms")
+        replays = [timing for timing, _, replayed in retries if replayed]
+        print(f"  replay          median {median_ms(replays):.2f} ms, {len(replays)} replayed "
+              f"(failed bookings aren't kept and run again)")
+        print(f"  bookings made   {made} (without keys the retries would have made {succeeded} more)")
+        if key_bytes:
+            print(f"  key table       {keys} keys, {key_bytes / max(keys, 1):.0f} bytes per key with its index")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark micro-batching of LLM predictions
+Simulates an endpoint with a fixed per-request overhead and limited replica
+concurrency, then drives it from 10/50/200 concurrent chat sessions with and
+without the PredictionBatcher.
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('backend')
+
+from app.llm_batcher import PredictionBatcher
+
+
+class SimulatedEndpoint:
+    """Predict endpoint: `overhead` per request + `per_instance` per prompt, `replicas` requests at a time"""
+
+    def __init__(self, overhead: float, per_instance: float, replicas: int):
+        self.overhead = overhead
+        self.per_instance = per_instance
+        self.replicas = threading.Semaphore(replicas)
+        self.calls = 0
+
+    def predict_batch(self, prompts, timeout):
+        with self.replicas:
+            self.calls += 1
+            time.sleep(self.overhead + self.per_instance * len(prompts))
+            return [f"response to {prompt}" for prompt in prompts]
+
+
+def run(sessions: int, turns: int, batched: bool, args) -> dict:
+    endpoint = SimulatedEndpoint(args.overhead_ms / 1000, args.per_instance_ms / 1000, args.replicas)
+    batcher = None
+    if batched:
+        batcher = PredictionBatcher(
+            endpoint.predict_batch,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+            max_in_flight=args.replicas,
+            name=f"bench-{sessions}"
+        )
+
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def session(session_id: int):
+        for turn in range(turns):
+            prompt = f"session {session_id} turn {turn}"
+            start = time.perf_counter()
+            if batcher:
+                batcher.predict(prompt, timeout=60)
+            else:
+                endpoint.predict_batch([prompt], timeout=60)
+            with latencies_lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(session, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "endpoint_calls": endpoint.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--overhead-ms", type=float, default=300, help="fixed cost of one predict request")
+    parser.add_argument("--per-instance-ms", type=float, default=20, help="extra cost per prompt in a request")
+    parser.add_argument("--replicas", type=int, default=4, help="requests the endpoint serves concurrently")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"Endpoint: {args.overhead_ms:.0f}ms/request + {args.per_instance_ms:.0f}ms/prompt, "
+          f"{args.replicas} replicas; {args.turns} turns per session")
+    print(f"{'sessions':>8} {'mode':>9} {'turns/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'calls':>7}")
+    for sessions in args.sessions:
+        for batched in (False, True):
+            result = run(sessions, args.turns, batched, args)
+            print(f"{sessions:>8} {'batched' if batched else 'single':>9} {result['throughput']:>9.1f} "
+                  f"{result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} {result['endpoint_calls']:>7}")
+
+
+if __name__ == "__main__":
+    main()
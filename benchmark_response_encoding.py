@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark response serialization and compression
+For representative payloads of the hot endpoints (a full /restaurants page,
+an /availability answer, a day grid and a /chat reply) reports:
+  - serialization CPU: the previous path (FastAPI's jsonable_encoder or the
+    response model, then json.dumps) against orjson
+  - bytes on the wire and compression CPU for identity, gzip and brotli
+Payloads are synthetic, so no database is needed.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+sys.path.append('backend')
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.main import ChatResponse, RestaurantPage
+from app.responses import BROTLI_QUALITY, COMPRESSION_MIN_SIZE, GZIP_LEVEL, FastJSONResponse, brotli, compress
+
+CUISINES = ["North Indian", "South Indian", "Chinese", "Italian", "Continental", "Fusion", "Mughlai"]
+HOURS = [{"Mon-Fri": "11:00-22:00", "Sat-Sun": "10:30-23:00"}, {"Mon-Sun": "12:00-23:30"}]
+
+
+def restaurant_page(count):
+    return {
+        "restaurants": [{
+            "id": i,
+            "name": f"GoodFoods Outlet {i}",
+            "address": f"{random.randint(1, 999)} {random.choice(['MG Road', 'Park Street', 'Linking Road'])}, Mumbai",
+            "cuisine_type": random.choice(CUISINES),
+            "rating": round(random.uniform(3.5, 5.0), 1),
+            "latitude": random.uniform(18.9, 19.3),
+            "longitude": random.uniform(72.8, 73.0),
+            "opening_hours": random.choice(HOURS),
+        } for i in range(1, count + 1)],
+        "next_cursor": "eyJyIjo0LjUsImlkIjoxMDB9",
+    }
+
+
+def availability():
+    times = [f"{hour:02d}:{minute:02d}" for hour in range(11, 23) for minute in (0, 30)]
+    return {"restaurant_id": 1, "date": "2026-10-20", "requested_time": "19:00", "party_size": 4,
+            "available_times": random.sample(times, 6), "is_requested_time_available": False}
+
+
+def grid(interval):
+    slots = (23 - 11) * 60 // interval
+    return {"restaurant_id": 1, "date": "2026-10-20", "party_size": 4, "interval_minutes": interval,
+            "start": "11:00", "available": "".join(random.choice("0111") for _ in range(slots)),
+            "remaining_seats": [random.randint(0, 40) for _ in range(slots)]}
+
+
+def chat():
+    reply = ("I found these restaurants for you:\n" +
+             "\n".join(f"{i}. GoodFoods Outlet {i} - North Indian, rated 4.{i}" for i in range(1, 6)))
+    return {"response": reply, "message": "Any north indian places in Bandra?",
+            "session_id": "Jx3b0e1mQ2k9cZ7w0aYt6g", "version": 3}
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100, help="Restaurants on the /restaurants page")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    def model_path(model, data):
+        # What FastAPI does for a route with response_model, before rendering
+        return lambda: model.model_validate(data).model_dump(mode="json", exclude_none=True)
+
+    def restaurants_body(page):
+        # What /restaurants now does instead of validating through RestaurantPage
+        body = {"restaurants": [{key: value for key, value in restaurant.items() if value is not None}
+                                for restaurant in page["restaurants"]]}
+        if page["next_cursor"] is not None:
+            body["next_cursor"] = page["next_cursor"]
+        return body
+
+    page, answer, day, reply = restaurant_page(args.page_size), availability(), grid(15), chat()
+    # name, previous path, new path (both produce the body to render)
+    payloads = [
+        (f"/restaurants ({args.page_size})", model_path(RestaurantPage, page), lambda: restaurants_body(page)),
+        ("/availability", lambda: jsonable_encoder(answer), lambda: answer),
+        ("/availability/grid (15m)", lambda: jsonable_encoder(day), lambda: day),
+        # /chat keeps its response model; only the rendering changes
+        ("/chat", model_path(ChatResponse, reply), model_path(ChatResponse, reply)),
+    ]
+
+    print(f"Serialization, mean over {args.repeat} runs")
+    print(f"{'payload':>26} {'bytes':>7} {'json us':>8} {'orjson us':>10} {'speedup':>8}")
+    bodies = []
+    for name, previous, current in payloads:
+        before, body = timed(lambda: JSONResponse(previous()).body, args.repeat)
+        after, fast_body = timed(lambda: FastJSONResponse(current()).body, args.repeat)
+        bodies.append((name, fast_body))
+        print(f"{name:>26} {len(fast_body):>7} {before * 1e6:>8.1f} {after * 1e6:>10.1f} {before / after:>7.1f}x")
+
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    print(f"\nCompression (gzip level {GZIP_LEVEL}, brotli quality {BROTLI_QUALITY}, "
+          f"threshold {COMPRESSION_MIN_SIZE} bytes)")
+    if brotli is None:
+        print("brotli is not installed; only gzip is measured")
+    print(f"{'payload':>26} {'identity':>9} " + " ".join(f"{e + ' bytes':>10} {e + ' us':>8}" for e in encodings))
+    for name, body in bodies:
+        row = f"{name:>26} {len(body):>9} "
+        for encoding in encodings:
+            elapsed, compressed = timed(lambda: compress(body, encoding), args.repeat)
+            sent = len(compressed) if len(body) >= COMPRESSION_MIN_SIZE else len(body)
+            row += f"{sent:>10} {elapsed * 1e6 if len(body) >= COMPRESSION_MIN_SIZE else 0:>8.1f} "
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark tool-result formatting
+Compares the registered renderers with the previous inline formatting
+(datetime import, nested helper and strptime on every call) for large
+result sets: many bookings rendered one by one, long alternative-slot lists
+and long menu-special lists.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+sys.path.append('backend')
+
+from app.rendering import format_date, format_time, response_renderer
+
+
+def legacy_format_booking(result):
+    from datetime import datetime
+    try:
+        formatted_date = datetime.strptime(result['date'], "%Y-%m-%d").strftime("%B %d, %Y")
+    except:
+        formatted_date = result['date']
+    try:
+        formatted_time = datetime.strptime(result['time'], "%H:%M").strftime("%I:%M %p")
+    except:
+        formatted_time = result['time']
+    return f"Excellent! Your booking is confirmed. Your booking reference is {result['booking_id']}. We look forward to seeing you at {result['restaurant_name']} on {formatted_date} at {formatted_time} for {result['party_size']} people."
+
+
+def legacy_format_availability(result):
+    def format_time_12hr(time_24hr):
+        try:
+            from datetime import datetime
+            return datetime.strptime(time_24hr, "%H:%M").strftime("%I:%M %p")
+        except:
+            return time_24hr
+
+    if len(result) == 1:
+        return f"Great! A table is available at {format_time_12hr(result[0])}. Would you like me to proceed with the booking?"
+    response = "The requested time isn't available, but I found these alternative times:"
+    for time_slot in result[:5]:
+        response += f"\n- {format_time_12hr(time_slot)}"
+    response += "\n\nWhich time would you prefer?"
+    return response
+
+
+def legacy_format_specials(result):
+    response = "Here are our current menu specials:"
+    for i, special in enumerate(result, 1):
+        response += f"\n{i}. {special['name']} - {special['description']} ({special['price']})"
+    response += "\n\nThese are our chef's recommendations for today!"
+    return response
+
+
+def bookings(count):
+    return [{
+        "success": True,
+        "booking_id": f"GF{i:06d}",
+        "restaurant_name": "GoodFoods Koramangala",
+        "date": f"2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+        "time": f"{random.randint(11, 22):02d}:{random.choice(['00', '30'])}",
+        "party_size": random.randint(1, 10),
+    } for i in range(count)]
+
+
+def timed(function, items, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'case':>28} {'size':>7} {'legacy ms':>10} {'renderer ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        results = bookings(size)
+        slots = [[f"{random.randint(11, 22):02d}:00" for _ in range(8)] for _ in range(size)]
+        specials = [[{"name": f"Dish {i}", "description": "Chef's special", "price": f"₹{300 + i}"}
+                     for i in range(size)]]
+        # Each line is sanity-checked so the comparison is like for like
+        assert legacy_format_booking(results[0]) == response_renderer.render("create_booking", results[0])
+        assert legacy_format_availability(slots[0]) == response_renderer.render("check_availability", slots[0])
+        assert legacy_format_specials(specials[0]) == response_renderer.render("get_menu_specials", specials[0])
+
+        cases = [
+            ("create_booking x size", legacy_format_booking, lambda r: response_renderer.render("create_booking", r), results),
+            ("check_availability x size", legacy_format_availability, lambda r: response_renderer.render("check_availability", r), slots),
+            ("get_menu_specials (1 list)", legacy_format_specials, lambda r: response_renderer.render("get_menu_specials", r), specials),
+        ]
+        for name, legacy, renderer, items in cases:
+            format_date.cache_clear()
+            format_time.cache_clear()
+            legacy_seconds = timed(legacy, items, args.repeat)
+            renderer_seconds = timed(renderer, items, args.repeat)
+            print(f"{name:>28} {size:>7} {legacy_seconds * 1000:>10.1f} {renderer_seconds * 1000:>12.1f} "
+                  f"{legacy_seconds / renderer_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark waitlist backfill against queue length
+Fills one slot of a copy of the database, queues --sizes waiting parties for
+it (random priorities and party sizes, plus entries for other slots), then
+cancels bookings one at a time and times cancel_and_backfill: the cancel,
+the search for the best party that fits and its conversion into a booking,
+all in one transaction. With the waiting-entries index the time should stay
+flat as the queue grows; the last column shows the same search without it.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+
+def fill_slot(conn, restaurant_id, booking_time, party_size):
+    """Book the slot up to capacity; returns the booking ids"""
+    capacity = conn.execute("SELECT COALESCE(SUM(capacity), 0) FROM RestaurantTable WHERE restaurant_id = ?",
+                            [restaurant_id]).fetchone()[0]
+    booked = conn.execute("SELECT COALESCE(SUM(num_guests), 0) FROM Booking WHERE restaurant_id = ? "
+                          "AND booking_time = ? AND status = 'confirmed'", [restaurant_id, booking_time]).fetchone()[0]
+    ids = []
+    for _ in range((capacity - booked) // party_size):
+        ids.append(conn.execute(
+            "INSERT INTO Booking (restaurant_id, user_id, booking_time, num_guests, status) VALUES (?, 1, ?, ?, 'confirmed')",
+            [restaurant_id, booking_time, party_size]
+        ).lastrowid)
+    return ids
+
+
+def queue(conn, restaurant_id, booking_time, size, rng, other_slots):
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(restaurant_id, booking_time, rng.randint(2, 8), rng.choice([0, 0, 0, 1, 5])) for _ in range(size)]
+    # Entries for neighbouring slots share the index
+    rows += [(restaurant_id, slot, rng.randint(2, 8), 0) for slot in other_slots for _ in range(size // len(other_slots))]
+    conn.executemany(
+        "INSERT INTO Waitlist (restaurant_id, user_id, booking_time, num_guests, priority, status, created_at) "
+        "VALUES (?, 1, ?, ?, ?, 'waiting', ?)",
+        [row + (now,) for row in rows]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=os.path.join(BACKEND_DIR, "goodfoods.db"),
+                        help="Database to copy (see python -m app.generate_data)")
+    parser.add_argument("--sizes", default="100,10000,100000", help="Comma-separated waiting parties in the slot")
+    parser.add_argument("--cancellations", type=int, default=8, help="Cancellations timed per size")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="waitlist-")
+    try:
+        database = os.path.join(workdir, "goodfoods.db")
+        shutil.copyfile(args.database, database)
+        os.environ["DATABASE_PATH"] = database
+        os.environ["AVAILABILITY_CACHE_TTL"] = "0"
+        sys.path.insert(0, BACKEND_DIR)
+        import setup_database
+        from app import tool_functions
+
+        setup_database.create_database(database)[0].close()
+        day = (date.today() + timedelta(days=7)).isoformat()
+        slot = f"{day} 19:00:00"
+        other_slots = [f"{day} {hour}:00:00" for hour in (18, 20, 21)]
+        rng = random.Random(0)
+
+        print(f"{'queued':>8} {'cancel+backfill ms':>19} {'promoted':>9} {'unindexed search ms':>20}")
+        for size in [int(size) for size in args.sizes.split(",")]:
+            with sqlite3.connect(database) as conn:
+                conn.execute("DELETE FROM Waitlist")
+                conn.execute("UPDATE Booking SET status = 'cancelled' WHERE restaurant_id = 1 AND booking_time = ?", [slot])
+                bookings = fill_slot(conn, 1, slot, 4)
+                queue(conn, 1, slot, size, rng, other_slots)
+
+            timings, promoted = [], 0
+            for booking_id in bookings[:args.cancellations]:
+                start = time.perf_counter()
+                result = tool_functions.cancel_and_backfill(f"GF{booking_id:06d}")
+                timings.append((time.perf_counter() - start) * 1000)
+                assert result["success"], result
+                promoted += len(result["waitlist_promoted"])
+
+            with sqlite3.connect(database) as conn:
+                start = time.perf_counter()
+                conn.execute(
+                    f"SELECT waitlist_id FROM Waitlist NOT INDEXED WHERE restaurant_id = 1 AND booking_time = ? "
+                    f"AND status = 'waiting' AND num_guests <= 4 ORDER BY {tool_functions.WAITLIST_ORDER} LIMIT 1", [slot]
+                ).fetchone()
+                unindexed = (time.perf_counter() - start) * 1000
+            print(f"{size:>8} {statistics.median(timings):>19.2f} {promoted:>9} {unindexed:>20.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark API throughput from 1 to N worker processes
+Starts the backend under gunicorn (backend/gunicorn.conf.py) with each worker
+count in turn, all sharing one database, and drives it with concurrent
+clients for a fixed time. The request mix is availability checks, day grids
+and restaurant listings over random restaurants and dates, so most requests
+miss the per-worker availability cache.
+The load generator runs on the same machine: throughput can only scale up to
+the cores left over for the workers.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, port, database):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), DATABASE_PATH=database,
+               SESSION_BACKEND="database", DEV_MODE="true")
+    # Admission limits are per worker and would otherwise cap the benchmark
+    for prefix in ("CHAT", "AVAILABILITY", "BOOKINGS"):
+        env[f"{prefix}_RATE_LIMIT_PER_MINUTE"] = "100000000"
+        env[f"{prefix}_RATE_LIMIT_BURST"] = "100000000"
+        env[f"{prefix}_MAX_QUEUE"] = "10000"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return server, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"Backend with {workers} workers did not start")
+
+
+def client(url, restaurants, duration, seed, results):
+    rng = random.Random(seed)
+    session = requests.Session()
+    today = date.today()
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        restaurant_id = rng.randint(1, restaurants)
+        day = (today + timedelta(days=rng.randint(1, 60))).isoformat()
+        kind = rng.random()
+        if kind < 0.6:
+            path = f"/availability/{restaurant_id}?date={day}&time=19:00&party_size={rng.randint(1, 8)}"
+        elif kind < 0.8:
+            path = f"/availability/{restaurant_id}/grid?date={day}&party_size={rng.randint(1, 8)}"
+        else:
+            path = f"/restaurants?limit=20&order_by=rating&cuisine={rng.choice(['Italian', 'Chinese', 'North Indian'])}"
+        start = time.perf_counter()
+        try:
+            ok = session.get(url + path, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    results.put((latencies, errors))
+
+
+def run_load(url, clients, restaurants, duration):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, restaurants, duration, seed, results))
+                 for seed in range(clients)]
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in processes:
+        process.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=os.path.join(BACKEND_DIR, "goodfoods.db"),
+                        help="SQLite file shared by the workers (see python -m app.generate_data)")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per worker count")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.database) as conn:
+        restaurants = conn.execute("SELECT COUNT(*) FROM Restaurant").fetchone()[0]
+    print(f"{restaurants:,} restaurants in {args.database}; {args.clients} clients for {args.duration:.0f}s; "
+          f"{multiprocessing.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'errors':>7} {'scaling':>8}")
+
+    baseline = None
+    for workers in [int(count) for count in args.workers.split(",")]:
+        server, url = start_server(workers, free_port(), os.path.abspath(args.database))
+        try:
+            run_load(url, args.clients, restaurants, min(2.0, args.duration))  # warm-up
+            latencies, errors = run_load(url, args.clients, restaurants, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        throughput = len(latencies) / args.duration
+        baseline = baseline or throughput
+        ordered = sorted(latencies)
+        print(f"{workers:>7} {throughput:>8.0f} {statistics.median(ordered) * 1000:>7.1f} "
+              f"{ordered[int(len(ordered) * 0.95)] * 1000:>7.1f} {errors:>7} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
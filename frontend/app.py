@@ -1,7 +1,26 @@
 import streamlit as st
 import requests
+import json
 import os
+import threading
+import time
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+
+try:
+    import websocket  # websocket-client
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+# How often the background thread re-checks backend health (seconds)
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+# Keep-alive connections kept open to the backend, shared by all browser sessions
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "20"))
+# "websocket": one /ws/chat connection per conversation, replies streamed as they are produced;
+# "http": one POST /chat per message (also the fallback when the socket can't be used)
+CHAT_TRANSPORT = os.getenv("CHAT_TRANSPORT", "websocket")
 
 # Page configuration
 st.set_page_config(
@@ -61,6 +80,62 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_backend_session(backend_url: str) -> requests.Session:
+    """One pooled HTTP session per backend URL, shared across reruns and browser sessions."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class BackendHealthMonitor:
+    """
+    Backend health, checked by a background thread every HEALTH_CHECK_INTERVAL
+    seconds so page reruns read the last known status instead of probing
+    /health themselves. Chat requests also report what they observe.
+    """
+    
+    def __init__(self, backend_url: str, session: requests.Session):
+        self.backend_url = backend_url
+        self.session = session
+        self.connected = False
+        self.checked_at = 0.0
+        self.error = None
+        self._lock = threading.Lock()
+        self.check()
+        threading.Thread(target=self._run, name="backend-health", daemon=True).start()
+    
+    def check(self) -> bool:
+        """Probe /health now and record the result."""
+        try:
+            response = self.session.get(f"{self.backend_url}/health", timeout=HEALTH_CHECK_TIMEOUT)
+            connected = response.status_code == 200
+            error = None if connected else f"Backend returned status code: {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            connected, error = False, str(e)
+        self.report(connected, error)
+        return connected
+    
+    def report(self, connected: bool, error: str = None):
+        with self._lock:
+            self.connected = connected
+            self.error = error
+            self.checked_at = time.time()
+    
+    def _run(self):
+        while True:
+            # Check sooner while disconnected so recovery shows up quickly
+            interval = HEALTH_CHECK_INTERVAL if self.connected else min(HEALTH_CHECK_INTERVAL, 5)
+            time.sleep(interval)
+            # Skip the probe if a manual check or a chat request just reported
+            if time.time() - self.checked_at >= interval:
+                self.check()
+
+@st.cache_resource
+def get_health_monitor(backend_url: str) -> BackendHealthMonitor:
+    return BackendHealthMonitor(backend_url, get_backend_session(backend_url))
+
 def initialize_session_state():
     """Initialize Streamlit session state variables."""
     if "messages" not in st.session_state:
@@ -69,14 +144,26 @@ def initialize_session_state():
     # Backend URL - always read from environment variable (not cached)
     st.session_state.backend_url = os.getenv("BACKEND_URL", "http://localhost:8000")
     
-    # Check backend connectivity (always check, not cached)
-    st.session_state.backend_connected = False
-    try:
-        response = requests.get(f"{st.session_state.backend_url}/health", timeout=5)
-        if response.status_code == 200:
-            st.session_state.backend_connected = True
-    except:
-        st.session_state.backend_connected = False
+    # Last known backend status, kept fresh by the background health monitor
+    st.session_state.backend_connected = get_health_monitor(st.session_state.backend_url).connected
+
+def end_backend_session():
+    """Forget the backend conversation; the next message starts a new one."""
+    session_id = st.session_state.pop("session_id", None)
+    st.session_state.chat_version = 0
+    chat_socket = st.session_state.pop("chat_socket", None)
+    if chat_socket is not None:
+        chat_socket.close()
+    if session_id:
+        try:
+            get_backend_session(st.session_state.backend_url).post(
+                f"{st.session_state.backend_url}/agent/reset",
+                headers={"X-Session-Id": session_id},
+                timeout=5
+            )
+        except requests.exceptions.RequestException:
+            # The backend expires idle sessions on its own
+            pass
 
 def display_header():
     """Display the main header and description."""
@@ -106,6 +193,7 @@ def display_sidebar():
         
         st.header("Quick Actions")
         if st.button("Clear Conversation", type="secondary"):
+            end_backend_session()
             st.session_state.messages = []
             st.rerun()
         
@@ -122,6 +210,8 @@ def display_sidebar():
         else:
             st.error("❌ Backend Disconnected")
             st.info(f"Make sure the backend server is running on {st.session_state.backend_url}")
+        checked_ago = time.time() - get_health_monitor(st.session_state.backend_url).checked_at
+        st.caption(f"Checked {checked_ago:.0f}s ago, every {HEALTH_CHECK_INTERVAL:.0f}s")
         
         st.divider()
         
@@ -166,28 +256,125 @@ def display_sample_queries():
             st.session_state.show_samples = False
             st.rerun()
 
-def send_message_to_agent(message: str) -> str:
+def get_chat_socket():
+    """This browser session's /ws/chat connection, (re)connecting and resuming the conversation as needed."""
+    chat_socket = st.session_state.get("chat_socket")
+    if chat_socket is not None and chat_socket.connected:
+        return chat_socket
+    
+    url = st.session_state.backend_url.replace("http", "ws", 1) + "/ws/chat"
+    if st.session_state.get("session_id"):
+        url += f"?session_id={st.session_state.session_id}"
+    chat_socket = websocket.create_connection(url, timeout=30)
+    hello = json.loads(chat_socket.recv())
+    # A server that lost our conversation starts a new one; resend the transcript then
+    st.session_state.needs_resync = hello["version"] != st.session_state.get("chat_version", 0)
+    st.session_state.session_id = hello["session_id"]
+    st.session_state.chat_socket = chat_socket
+    return chat_socket
+
+def send_message_over_websocket(message: str, placeholder=None):
+    """Send a message over the chat socket, showing the reply as it streams in. None if the socket failed."""
+    for attempt in range(2):
+        try:
+            chat_socket = get_chat_socket()
+            message_id = str(time.time_ns())
+            payload = {"type": "message", "id": message_id, "message": message}
+            if st.session_state.get("needs_resync"):
+                payload["conversation_history"] = st.session_state.messages[:-1]
+            else:
+                payload["version"] = st.session_state.get("chat_version", 0)
+            chat_socket.send(json.dumps(payload))
+            
+            text = ""
+            while True:
+                event = json.loads(chat_socket.recv())
+                if event["type"] == "ping":
+                    chat_socket.send(json.dumps({"type": "pong"}))
+                    continue
+                if event.get("id") != message_id:
+                    continue
+                if event["type"] == "tool_call" and placeholder is not None and not text:
+                    placeholder.markdown(f"_Running {event['name'].replace('_', ' ')}..._")
+                elif event["type"] == "delta":
+                    text += event["text"]
+                    if placeholder is not None:
+                        placeholder.markdown(text)
+                elif event["type"] == "done":
+                    st.session_state.chat_version = event["version"]
+                    st.session_state.needs_resync = False
+                    get_health_monitor(st.session_state.backend_url).report(True)
+                    return event["response"]
+                elif event["type"] == "error":
+                    if event["code"] == "conflict":
+                        st.session_state.needs_resync = True
+                        break
+                    if event["code"] == "rate_limited":
+                        return f"Samvaad is helping a lot of guests right now. Please try again in {event.get('retry_after', 'a few')} seconds."
+                    if event["code"] == "busy":
+                        return "Samvaad is helping a lot of guests right now. Please try again in a few seconds."
+                    return f"Error: {event.get('detail', 'Unknown error')}"
+        except (websocket.WebSocketException, OSError, ValueError) as e:
+            # Dropped (e.g. idle timeout between messages): reconnect and resume the session
+            print(f"Chat socket error: {e}")
+            chat_socket = st.session_state.pop("chat_socket", None)
+            if chat_socket is not None:
+                chat_socket.close()
+    return None
+
+def send_message_to_agent(message: str, placeholder=None) -> str:
     """Send a message to the AI agent and get response."""
+    if CHAT_TRANSPORT == "websocket" and WEBSOCKET_AVAILABLE:
+        response = send_message_over_websocket(message, placeholder)
+        if response is not None:
+            return response
+    
     try:
-        # Prepare the request
+        # The backend keeps the conversation; send only the new message, the
+        # session id and how many replies we have seen in it
+        session_id = st.session_state.get("session_id")
         payload = {
             "message": message,
-            "conversation_history": st.session_state.messages
+            "session_id": session_id,
+            "version": st.session_state.get("chat_version", 0)
         }
+        headers = {"X-Session-Id": session_id} if session_id else {}
+        http = get_backend_session(st.session_state.backend_url)
         
-        # Send request to backend
-        response = requests.post(
+        # Send request to backend over the pooled session
+        response = http.post(
             f"{st.session_state.backend_url}/chat",
             json=payload,
+            headers=headers,
             timeout=30
         )
         
+        if response.status_code in (404, 409):
+            # The backend lost the session or is out of sync: resend our transcript once
+            # (without the message being sent, which is already the last entry)
+            payload["conversation_history"] = st.session_state.messages[:-1]
+            response = http.post(
+                f"{st.session_state.backend_url}/chat",
+                json=payload,
+                headers=headers,
+                timeout=30
+            )
+        
         if response.status_code == 200:
+            get_health_monitor(st.session_state.backend_url).report(True)
             data = response.json()
+            st.session_state.session_id = data["session_id"]
+            st.session_state.chat_version = data["version"]
             return data["response"]
+        elif response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "a few")
+            return f"Samvaad is helping a lot of guests right now. Please try again in {retry_after} seconds."
         else:
             return f"Error: Backend returned status code {response.status_code}"
             
+    except requests.exceptions.ConnectionError as e:
+        get_health_monitor(st.session_state.backend_url).report(False, str(e))
+        return f"Error connecting to backend: {str(e)}"
     except requests.exceptions.RequestException as e:
         return f"Error connecting to backend: {str(e)}"
     except Exception as e:
@@ -213,8 +400,9 @@ def display_chat_interface():
         # Get agent response
         with st.chat_message("assistant"):
             with st.spinner("Samvaad is thinking..."):
-                response = send_message_to_agent(user_message)
-                st.markdown(response)
+                placeholder = st.empty()
+                response = send_message_to_agent(user_message, placeholder)
+                placeholder.markdown(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
     
     # Chat input
@@ -229,8 +417,9 @@ def display_chat_interface():
         # Get assistant response
         with st.chat_message("assistant"):
             with st.spinner("Samvaad is thinking..."):
-                response = send_message_to_agent(prompt)
-                st.markdown(response)
+                placeholder = st.empty()
+                response = send_message_to_agent(prompt, placeholder)
+                placeholder.markdown(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
     
     # Auto-scroll to bottom using JavaScript
@@ -290,16 +479,13 @@ def main():
         
         # Show backend status check
         if st.button("Check Backend Connection"):
-            try:
-                response = requests.get(f"{st.session_state.backend_url}/health", timeout=5)
-                if response.status_code == 200:
-                    st.session_state.backend_connected = True
-                    st.success("✅ Backend is now connected!")
-                    st.rerun()
-                else:
-                    st.error(f"Backend returned status code: {response.status_code}")
-            except Exception as e:
-                st.error(f"Connection failed: {str(e)}")
+            monitor = get_health_monitor(st.session_state.backend_url)
+            if monitor.check():
+                st.session_state.backend_connected = True
+                st.success("✅ Backend is now connected!")
+                st.rerun()
+            else:
+                st.error(f"Connection failed: {monitor.error}")
     
     # Display footer
     display_footer()
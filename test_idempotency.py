@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test idempotent bookings: a booking repeated in the same conversation is
+replayed, but one cancelled since is made again
+"""
+
+import sys
+from datetime import date, timedelta
+
+sys.path.append('backend')
+
+import pytest
+
+
+@pytest.fixture
+def booking_db(tmp_path, monkeypatch):
+    """A fresh database with the sample restaurants"""
+    import setup_database
+    from app import database
+
+    path = str(tmp_path / "goodfoods.db")
+    conn, cursor = setup_database.create_database(path)
+    setup_database.insert_sample_data(conn, cursor)
+    setup_database.seed_event_log(conn)
+    conn.close()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    return path
+
+
+def test_book_cancel_rebook_in_one_session(booking_db):
+    from app import tool_functions
+    from app.idempotency import IdempotencyStore, derive_key, still_confirmed
+
+    store = IdempotencyStore()
+    arguments = dict(restaurant_id=1, user_name="Asha", phone_number="+91-9876500001",
+                     date=(date.today() + timedelta(days=3)).isoformat(), time="19:00", party_size=2)
+    key = derive_key("session-1", arguments)
+
+    def book():
+        return store.run("create_booking", key, arguments, lambda: tool_functions.create_booking(**arguments),
+                         replay_if=still_confirmed)
+
+    first, replayed = book()
+    assert first["success"] and not replayed
+
+    # Asked twice in the same conversation: the first booking comes back
+    again, replayed = book()
+    assert replayed and again["booking_id"] == first["booking_id"]
+
+    # Cancelled, then asked for again: a new booking is made
+    assert tool_functions.cancel_booking(first["booking_id"])
+    rebooked, replayed = book()
+    assert rebooked["success"] and not replayed
+    assert rebooked["booking_id"] != first["booking_id"]
+    assert tool_functions.get_booking_details(rebooked["booking_id"])["status"] == "confirmed"
+    assert store.stats["stale"] == 1
+
+
+def test_client_key_replays_whatever_happened_since(booking_db):
+    from app import tool_functions
+    from app.idempotency import IdempotencyStore, client_key
+
+    store = IdempotencyStore()
+    arguments = dict(restaurant_id=1, user_name="Ravi", phone_number="+91-9876500002",
+                     date=(date.today() + timedelta(days=3)).isoformat(), time="20:00", party_size=2)
+
+    def book():
+        return store.run("create_booking", client_key("retry-token"), arguments,
+                         lambda: tool_functions.create_booking(**arguments))
+
+    first, _ = book()
+    assert tool_functions.cancel_booking(first["booking_id"])
+    retried, replayed = book()
+    assert replayed and retried["booking_id"] == first["booking_id"]
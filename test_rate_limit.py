@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test admission control: a client is limited by its address even when it
+rotates through new sessions
+"""
+
+import sys
+
+sys.path.append('backend')
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+
+def _chat_app(controller):
+    from app.main import get_client_keys
+    from app.rate_limit import AdmissionMiddleware
+
+    async def chat(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/chat", chat, methods=["POST"])])
+    app.add_middleware(AdmissionMiddleware, controller=controller, client_keys=get_client_keys)
+    return app
+
+
+def test_rotating_sessions_share_the_address_bucket():
+    from app.main import session_store
+    from app.rate_limit import AdmissionController, RouteLimit
+
+    controller = AdmissionController({
+        "/chat": RouteLimit(requests_per_minute=1, burst=5, max_concurrent=8, max_queue=16, queue_timeout=1)
+    })
+    client = TestClient(_chat_app(controller))
+
+    statuses = []
+    for _ in range(8):
+        session = session_store.create()
+        statuses.append(client.post("/chat", headers={"X-Session-Id": session.session_id}).status_code)
+    assert statuses[:5] == [200] * 5
+    assert statuses[5:] == [429] * 3
+
+
+def test_every_bucket_must_have_a_token():
+    from app.rate_limit import RateLimiter
+
+    limiter = RateLimiter(requests_per_minute=0, burst=2)
+    assert limiter.check("ip:a", "session:1") == (True, 0.0)
+    assert limiter.check("ip:a", "session:1") == (True, 0.0)
+    # The address is spent: a new session doesn't help, and isn't charged either
+    assert not limiter.check("ip:a", "session:2")[0]
+    assert limiter.check("ip:b", "session:2") == (True, 0.0)
+    assert limiter.check("ip:b", "session:2") == (True, 0.0)